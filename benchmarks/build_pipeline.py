@@ -0,0 +1,603 @@
+"""
+pysuitcase 构建流水线的基准测试：端到端的 execute_build 以及逐个阶段，全部针对本地替身运行（见 standins.py），
+不访问网络，也不需要 Visual Studio：
+
+    python benchmarks/build_pipeline.py --sizes small,medium --repeat 3
+    python benchmarks/build_pipeline.py --save-baseline          # 把本次结果记为基线（第一次运行时必需）
+    python benchmarks/build_pipeline.py --max-regression 15      # 与基线比较，有退化时退出码为 1
+
+基线与机器相关，不随仓库提交：在同一台机器上先用 --save-baseline 记录一次，之后的运行才有比较对象。
+每次测量都在独立的子进程中进行，报告耗时（多次取中位数）与峰值内存（本进程，以及 pip 等子进程中最大的一个）。
+端到端场景：cold（空缓存）、warm（缓存已预热的新项目）、noop（输入未变的重复构建）、store-fill / store-hit（--store）。
+逐阶段测量在基准项目的副本上单独调用每个阶段的函数，输入由父进程事先准备好，不计入测量。
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import standins  # noqa: E402
+from pysuitcase.archiver import archive_bundle  # noqa: E402
+from pysuitcase.compiler import precompile_bytecode  # noqa: E402
+from pysuitcase.delta import write_file_manifest  # noqa: E402
+from pysuitcase.launcher import create_launcher  # noqa: E402
+from pysuitcase.lockfile import ensure_lock, get_lock_path  # noqa: E402
+from pysuitcase.packer import build_pack, install_importer  # noqa: E402
+from pysuitcase.script_downloader import fetch_get_pip, get_python_runtime  # noqa: E402
+from pysuitcase.slimming import slim_bundle  # noqa: E402
+from pysuitcase.staging import stage_dependencies  # noqa: E402
+from pysuitcase.store import restore_tree, save_tree  # noqa: E402
+from pysuitcase.wheelhouse import BUILD_ESSENTIALS, fill_wheelhouse, get_wheelhouse_dir  # noqa: E402
+
+# 合成项目的规模：依赖包数量、每个依赖包的模块数、app 自身的模块数
+SIZES = {
+    'small': dict(dependencies=5, modules=10, app_modules=5),
+    'medium': dict(dependencies=25, modules=30, app_modules=30),
+    'large': dict(dependencies=80, modules=60, app_modules=120),
+}
+APP_FOLDER = 'app'
+MAIN_SCRIPT = 'app.py'
+REQUIREMENTS = 'requirements.txt'
+ARCH = 'amd64'
+# 目标版本与宿主一致，暂存模式下 --precompile 才能用宿主解释器生成 .pyc
+PYTHON_VERSION = f"{sys.version_info.major}.{sys.version_info.minor}.{sys.version_info.micro}"
+E2E_FLAGS = ('prune', 'precompile', 'pack')
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+# 低于这些绝对差值的变化视为噪声，不算退化
+MIN_SECONDS_DELTA = 0.05
+MIN_MEMORY_DELTA_MB = 5.0
+MB = 1024 * 1024
+
+
+# --- 合成项目与包索引 ---
+
+def _module_source(index, functions=20):
+    body = ''.join(f"def func{i}(x):\n    return x * {i} + VALUE\n\n" for i in range(functions))
+    return f"import os\n\nVALUE = {index}\n\n{body}class Thing{index}:\n    def method(self):\n        return func1(VALUE)\n"
+
+
+def _dependency_name(size, index):
+    return f"bench-{size}-dep{index}"
+
+
+def generate_wheels(dist_dir, size):
+    """生成 size 规模的依赖 wheel：每个包有若干模块、数据文件与 tests/，每四个包带一个相同的二进制扩展（供 --dedupe-binaries 去重）。"""
+    spec = SIZES[size]
+    wheels = []
+    for i in range(spec['dependencies']):
+        package = _dependency_name(size, i).replace('-', '_')
+        files = {f"{package}/__init__.py": ''.join(f"from . import mod{m}\n" for m in range(spec['modules']))}
+        for m in range(spec['modules']):
+            files[f"{package}/mod{m}.py"] = _module_source(m)
+        for t in range(3):
+            files[f"{package}/tests/test_mod{t}.py"] = f"from {package} import mod{t}\n\ndef test_value():\n    assert mod{t}.VALUE == {t}\n"
+        files[f"{package}/data/payload.txt"] = 'payload\n' * 2000
+        if i % 4 == 0:
+            files[f"{package}/_speedups.pyd"] = standins._random_bytes('speedups', 256 * 1024)
+        # 部分依赖再依赖下一个包，解析器需要处理传递依赖
+        requires = [f"{_dependency_name(size, i + 1)}==1.0"] if i % 5 == 0 and i + 1 < spec['dependencies'] else []
+        wheels.append(standins.make_wheel(dist_dir, _dependency_name(size, i), '1.0', files, requires))
+    return wheels
+
+
+def generate_essential_wheels(dist_dir):
+    """构建必需的 pip / setuptools / wheel 的替身，暂存模式下它们会被装入 site-packages。"""
+    wheels = []
+    for name in BUILD_ESSENTIALS:
+        files = {f"{name}/__init__.py": "__version__ = '99.0'\n"}
+        files.update({f"{name}/_internal/mod{m}.py": _module_source(m, functions=60) for m in range(40)})
+        wheels.append(standins.make_wheel(dist_dir, name, '99.0', files))
+    return wheels
+
+
+def generate_project(project_dir, size):
+    """生成 size 规模的项目：app 目录中的入口脚本、若干模块，以及列出全部依赖的 requirements.txt。"""
+    spec = SIZES[size]
+    app_dir = os.path.join(project_dir, APP_FOLDER)
+    os.makedirs(app_dir)
+    for m in range(spec['app_modules']):
+        with open(os.path.join(app_dir, f"appmod{m}.py"), 'w', encoding='utf-8') as f:
+            f.write(_module_source(m))
+    with open(os.path.join(app_dir, MAIN_SCRIPT), 'w', encoding='utf-8') as f:
+        f.write(''.join(f"import appmod{m}\n" for m in range(spec['app_modules'])))
+        f.write(''.join(f"import {_dependency_name(size, i).replace('-', '_')}\n" for i in range(spec['dependencies'])))
+        f.write("\n\ndef main():\n    print('hello')\n\n\nif __name__ == '__main__':\n    main()\n")
+    with open(os.path.join(app_dir, REQUIREMENTS), 'w', encoding='utf-8') as f:
+        f.write(''.join(f"{_dependency_name(size, i)}==1.0\n" for i in range(spec['dependencies'])))
+    return project_dir
+
+
+def prepare_site(site_root, sizes):
+    """生成本地服务器的全部内容：嵌入式 zip、get-pip.py 以及包含所有规模依赖的 simple 索引。"""
+    dist_dir = os.path.join(site_root, '_dist')
+    standins.make_embed_zip(site_root, PYTHON_VERSION, ARCH)
+    standins.make_get_pip(site_root)
+    wheels = generate_essential_wheels(dist_dir)
+    for size in sizes:
+        wheels += generate_wheels(dist_dir, size)
+    standins.build_index(site_root, wheels)
+    shutil.rmtree(dist_dir)
+
+
+# --- 单独运行的阶段：prepare 在父进程中准备输入（不计入测量），run 在测量子进程中执行 ---
+
+def _layout(spec):
+    project_dir = spec['project_dir']
+    embed_dir = os.path.join(project_dir, f"python-{PYTHON_VERSION}-embed-{ARCH}")
+    return {
+        'project': project_dir,
+        'embed': embed_dir,
+        'site': os.path.join(embed_dir, 'Lib', 'site-packages'),
+        'app': os.path.join(project_dir, APP_FOLDER),
+        'requirements': os.path.join(project_dir, APP_FOLDER, REQUIREMENTS),
+        'lock': get_lock_path(project_dir, REQUIREMENTS, PYTHON_VERSION, ARCH),
+        'exe': os.path.join(project_dir, f"{os.path.basename(project_dir)}.exe"),
+    }
+
+
+def _remove_runtime(spec):
+    shutil.rmtree(_layout(spec)['embed'])
+
+
+def _remove_lock(spec):
+    os.remove(_layout(spec)['lock'])
+
+
+def _empty_site_packages(spec):
+    site = _layout(spec)['site']
+    shutil.rmtree(site)
+    os.makedirs(site)
+
+
+def _precompile(spec):
+    paths = _layout(spec)
+    precompile_bytecode(sys.executable, paths['app'], paths['site'], jobs=spec['jobs'])
+
+
+def _remove_launcher(spec):
+    os.remove(_layout(spec)['exe'])
+
+
+def _run_runtime(spec):
+    get_python_runtime(PYTHON_VERSION, ARCH, spec['project_dir'], jobs=spec['jobs'])
+
+
+def _run_get_pip(spec):
+    fetch_get_pip()
+
+
+def _run_wheels(spec):
+    wheelhouse_dir = get_wheelhouse_dir(PYTHON_VERSION, ARCH)
+    fill_wheelhouse(wheelhouse_dir, PYTHON_VERSION, ARCH, packages=BUILD_ESSENTIALS, mirror=spec['mirror'])
+    fill_wheelhouse(wheelhouse_dir, PYTHON_VERSION, ARCH, requirements_path=_layout(spec)['lock'], mirror=spec['mirror'], pip_args=["--no-deps"])
+
+
+def _run_lock(spec):
+    paths = _layout(spec)
+    ensure_lock(None, paths['requirements'], paths['lock'], PYTHON_VERSION, ARCH, spec['mirror'],
+                wheelhouse_dir=get_wheelhouse_dir(PYTHON_VERSION, ARCH), cross=True)
+
+
+def _run_dependencies(spec, parallel_install=True):
+    paths = _layout(spec)
+    stage_dependencies(paths['site'], paths['requirements'], PYTHON_VERSION, ARCH, spec['mirror'],
+                       wheelhouse_dir=get_wheelhouse_dir(PYTHON_VERSION, ARCH), lock_path=paths['lock'],
+                       parallel_install=parallel_install, jobs=spec['jobs'])
+
+
+def _run_dependencies_pip(spec):
+    _run_dependencies(spec, parallel_install=False)
+
+
+def _store_key(spec):
+    return f"benchmark-{spec['size']}"
+
+
+def _run_store_save(spec):
+    save_tree(_layout(spec)['embed'], [_store_key(spec)], jobs=spec['jobs'])
+
+
+def _run_store_restore(spec):
+    restore_tree(_store_key(spec), _layout(spec)['embed'], jobs=spec['jobs'])
+
+
+def _run_slim(spec):
+    slim_bundle(_layout(spec)['site'], dedupe=True, python_version=PYTHON_VERSION)
+
+
+def _run_bytecode(spec):
+    _precompile(spec)
+
+
+def _run_pack(spec):
+    paths = _layout(spec)
+    build_pack(paths['project'], APP_FOLDER, paths['site'], jobs=spec['jobs'])
+    install_importer(paths['embed'])
+
+
+def _run_launcher(spec):
+    create_launcher(spec['project_dir'], APP_FOLDER, MAIN_SCRIPT, PYTHON_VERSION, ARCH, REQUIREMENTS)
+
+
+def _run_manifest(spec):
+    write_file_manifest(spec['project_dir'], python_version=PYTHON_VERSION, arch=ARCH, jobs=spec['jobs'])
+
+
+def _run_archive(spec):
+    archive_bundle(spec['project_dir'], output_dir=os.path.join(spec['project_dir'], 'dist'), jobs=spec['jobs'])
+
+
+# 名称 -> (是否使用空缓存, prepare, run)；按顺序执行，store_restore 使用 store_save 写入的目录树
+STAGES = {
+    'runtime': (True, _remove_runtime, _run_runtime),
+    'runtime_cached': (False, _remove_runtime, _run_runtime),
+    'get_pip': (True, None, _run_get_pip),
+    'wheels': (True, None, _run_wheels),
+    'lock': (False, _remove_lock, _run_lock),
+    'dependencies_pip': (False, _empty_site_packages, _run_dependencies_pip),
+    'dependencies': (False, _empty_site_packages, _run_dependencies),
+    'store_save': (False, None, _run_store_save),
+    'store_restore': (False, _empty_site_packages, _run_store_restore),
+    'slim': (False, None, _run_slim),
+    'bytecode': (False, None, _run_bytecode),
+    'pack': (False, _precompile, _run_pack),
+    'launcher': (False, _remove_launcher, _run_launcher),
+    'manifest': (False, None, _run_manifest),
+    'archive': (False, None, _run_archive),
+}
+
+
+# --- 测量子进程 ---
+
+def _vm_hwm_mb():
+    """Linux 上本进程的峰值常驻内存（/proc/self/status 的 VmHWM）。"""
+    try:
+        with open('/proc/self/status', 'r', encoding='ascii') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def peak_memory_mb():
+    """
+    返回 (本进程峰值常驻内存, 已结束子进程中最大的峰值常驻内存)，单位 MB；无法获取的项为 None。
+    子进程的值至少是 fork 时本进程的常驻内存：Linux 的 ru_maxrss 在 exec 之后仍然保留。
+    """
+    try:
+        import resource
+    except ImportError:
+        resource = None
+    if resource is not None:
+        # ru_maxrss 在 macOS 上以字节为单位，在 Linux 上以 KB 为单位；它同样跨 exec 保留，因此 Linux 上优先用 VmHWM
+        scale = 1 if sys.platform == 'darwin' else 1024
+        own = _vm_hwm_mb()
+        return (own if own is not None else resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / MB,
+                resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale / MB)
+    if os.name == 'nt':
+        import ctypes
+        from ctypes import wintypes
+
+        class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+            _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD)] + [
+                (name, ctypes.c_size_t) for name in ('PeakWorkingSetSize', 'WorkingSetSize', 'QuotaPeakPagedPoolUsage',
+                                                     'QuotaPagedPoolUsage', 'QuotaPeakNonPagedPoolUsage', 'QuotaNonPagedPoolUsage',
+                                                     'PagefileUsage', 'PeakPagefileUsage')]
+
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(counters)
+        get_process = ctypes.windll.kernel32.GetCurrentProcess
+        get_process.restype = wintypes.HANDLE
+        if ctypes.windll.psapi.GetProcessMemoryInfo(get_process(), ctypes.byref(counters), counters.cb):
+            return counters.PeakWorkingSetSize / MB, None
+    return None, None
+
+
+def _build_params(spec):
+    """按命令行的解析方式得到 execute_build 的参数，与 `pysuitcase build` 使用的完全一致。"""
+    from pysuitcase.cli import build
+    argv = [spec['project_dir'], '--app-folder', APP_FOLDER, '--main-script', MAIN_SCRIPT, '--requirements-file', REQUIREMENTS,
+            '--python-version', PYTHON_VERSION, '--arch', ARCH, '--mirror', spec['mirror'], '--stage-deps']
+    argv += [f"--{flag.replace('_', '-')}" for flag in spec['flags']]
+    if spec['jobs']:
+        argv += ['--jobs', str(spec['jobs'])]
+    params = build.make_context('pysuitcase', argv).params
+    params['_is_interactive'] = False
+    return params
+
+
+def run_worker(spec_path):
+    """测量子进程：执行一次完整构建或一个阶段，把耗时与峰值内存写入 spec['result']。"""
+    with open(spec_path, 'r', encoding='utf-8') as f:
+        spec = json.load(f)
+    result = {}
+    if spec['kind'] == 'build':
+        from pysuitcase.cli import execute_build
+        from pysuitcase.trace import get_trace
+        params = _build_params(spec)
+        started = time.perf_counter()
+        execute_build(params)
+        result['seconds'] = time.perf_counter() - started
+        trace = get_trace()
+        result['stages'] = {name: stage['duration_s'] for name, stage in trace.stages.items()}
+        result['downloaded_mb'] = trace.bytes_downloaded / MB
+    else:
+        started = time.perf_counter()
+        STAGES[spec['stage']][2](spec)
+        result['seconds'] = time.perf_counter() - started
+    result['peak_rss_mb'], result['peak_child_rss_mb'] = peak_memory_mb()
+    with open(spec['result'], 'w', encoding='utf-8') as f:
+        json.dump(result, f)
+
+
+# --- 父进程：编排测量 ---
+
+class Session:
+    """一次基准测试的工作目录、本地服务器与公共环境变量。"""
+
+    def __init__(self, work_root, server, jobs):
+        self.work_root = work_root
+        self.server = server
+        self.jobs = jobs
+        self.mirror = f"{server.url}/simple/"
+        self.logs_dir = os.path.join(work_root, 'logs')
+        self.warm_cache = os.path.join(work_root, 'cache-warm')
+        os.makedirs(self.logs_dir)
+        self.env = dict(os.environ)
+        self.env.pop('PYSUITCASE_STORE_DIR', None)
+        self.env.update({
+            'PYSUITCASE_PYTHON_MIRROR': f"{server.url}/python",
+            'PYSUITCASE_GET_PIP_URL': f"{server.url}/get-pip.py",
+            # 不读取本机的 pip 配置，也不使用 pip 自己的缓存：只测量 pysuitcase 的缓存
+            'PIP_CONFIG_FILE': os.devnull,
+            'PIP_NO_CACHE_DIR': '1',
+            'PIP_DISABLE_PIP_VERSION_CHECK': '1',
+        })
+        self._counter = 0
+
+    def new_dir(self, label):
+        self._counter += 1
+        path = os.path.join(self.work_root, f"{self._counter:04d}-{label}")
+        os.makedirs(path)
+        return path
+
+    def environment(self, cache_dir, store_dir=None):
+        env = dict(self.env, PYSUITCASE_CACHE_DIR=cache_dir)
+        if store_dir:
+            env['PYSUITCASE_STORE_DIR'] = store_dir
+        return env
+
+    @contextlib.contextmanager
+    def activated(self, cache_dir):
+        """让父进程中的准备步骤使用与测量子进程相同的缓存与本地服务器，输出写入日志。"""
+        saved = dict(os.environ)
+        os.environ.clear()
+        os.environ.update(self.environment(cache_dir))
+        try:
+            with open(os.path.join(self.logs_dir, 'prepare.log'), 'a', encoding='utf-8') as log, contextlib.redirect_stdout(log):
+                yield
+        finally:
+            os.environ.clear()
+            os.environ.update(saved)
+
+    def measure(self, label, spec, cache_dir, store_dir=None):
+        """在子进程中执行一次测量；失败时打印日志末尾并退出。"""
+        spec = dict(spec, mirror=self.mirror, jobs=self.jobs)
+        spec_dir = self.new_dir(f"spec-{label}")
+        spec['result'] = os.path.join(spec_dir, 'result.json')
+        spec_path = os.path.join(spec_dir, 'spec.json')
+        with open(spec_path, 'w', encoding='utf-8') as f:
+            json.dump(spec, f)
+        log_path = os.path.join(self.logs_dir, f"{label}.log")
+        with open(log_path, 'a', encoding='utf-8') as log:
+            completed = subprocess.run([sys.executable, os.path.abspath(__file__), '--worker', spec_path],
+                                       env=self.environment(cache_dir, store_dir), stdout=log, stderr=subprocess.STDOUT)
+        if completed.returncode != 0:
+            with open(log_path, 'r', encoding='utf-8', errors='replace') as f:
+                tail = f.read().splitlines()[-30:]
+            print('\n'.join(tail))
+            print(f"\n{label} failed (exit code {completed.returncode}); full log: {log_path}")
+            sys.exit(1)
+        with open(spec['result'], 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+
+def _aggregate(runs):
+    """多次测量的汇总：耗时取中位数，内存取最大值。"""
+    summary = {'seconds': statistics.median(run['seconds'] for run in runs)}
+    for field in ('peak_rss_mb', 'peak_child_rss_mb', 'downloaded_mb'):
+        values = [run[field] for run in runs if run.get(field) is not None]
+        if values:
+            summary[field] = max(values)
+    return summary
+
+
+def _record_builds(metrics, key, runs):
+    metrics[key] = _aggregate(runs)
+    for stage in runs[0].get('stages', {}):
+        durations = [run['stages'][stage] for run in runs if stage in run.get('stages', {})]
+        metrics[f"{key}/{stage}"] = {'seconds': statistics.median(durations)}
+
+
+def run_e2e(session, size, repeat, metrics):
+    """端到端场景。cold 每次使用空缓存；其余场景共用预热过的缓存，store-hit 共用预热过的包仓库。"""
+    def build(label, project_dir, cache_dir, flags=E2E_FLAGS, store_dir=None):
+        spec = {'kind': 'build', 'size': size, 'project_dir': project_dir, 'flags': list(flags)}
+        return session.measure(f"{size}-{label}", spec, cache_dir, store_dir)
+
+    def fresh_project(label):
+        return generate_project(os.path.join(session.new_dir(label), f"Bench{size.title()}"), size)
+
+    print(f"[{size}] end-to-end builds...")
+    runs = [build('cold', fresh_project('cold'), session.new_dir('cache-cold')) for _ in range(repeat)]
+    _record_builds(metrics, f"e2e/{size}/cold", runs)
+
+    # 预热共享缓存与包仓库（不计入结果）
+    warm_store = os.path.join(session.work_root, 'store-warm')
+    build('prime', fresh_project('prime'), session.warm_cache, E2E_FLAGS + ('store',), warm_store)
+
+    runs = []
+    for _ in range(repeat):
+        project_dir = fresh_project('warm')
+        runs.append(build('warm', project_dir, session.warm_cache))
+    _record_builds(metrics, f"e2e/{size}/warm", runs)
+    _record_builds(metrics, f"e2e/{size}/noop", [build('noop', project_dir, session.warm_cache) for _ in range(repeat)])
+
+    runs = [build('store-fill', fresh_project('store-fill'), session.warm_cache, E2E_FLAGS + ('store',), session.new_dir('store'))
+            for _ in range(repeat)]
+    _record_builds(metrics, f"e2e/{size}/store-fill", runs)
+    runs = [build('store-hit', fresh_project('store-hit'), session.warm_cache, E2E_FLAGS + ('store',), warm_store)
+            for _ in range(repeat)]
+    _record_builds(metrics, f"e2e/{size}/store-hit", runs)
+
+
+def run_stages(session, size, repeat, names, metrics):
+    """逐阶段测量：每次复制一份只装好依赖与启动器的基准项目，准备好该阶段的输入后单独执行它。"""
+    print(f"[{size}] individual stages...")
+    reference = generate_project(os.path.join(session.new_dir('reference'), f"Bench{size.title()}"), size)
+    session.measure(f"{size}-reference", {'kind': 'build', 'size': size, 'project_dir': reference, 'flags': []}, session.warm_cache)
+
+    for name in names:
+        cold, prepare, _ = STAGES[name]
+        runs = []
+        for _ in range(repeat):
+            project_dir = os.path.join(session.new_dir(f"stage-{name}"), os.path.basename(reference))
+            shutil.copytree(reference, project_dir, symlinks=True)
+            spec = {'kind': 'stage', 'stage': name, 'size': size, 'project_dir': project_dir, 'jobs': session.jobs, 'mirror': session.mirror}
+            cache_dir = session.new_dir('cache-cold') if cold else session.warm_cache
+            if prepare is not None:
+                with session.activated(cache_dir):
+                    prepare(spec)
+            runs.append(session.measure(f"{size}-stage-{name}", spec, cache_dir))
+            shutil.rmtree(project_dir, ignore_errors=True)
+        metrics[f"stage/{size}/{name}"] = _aggregate(runs)
+
+
+# --- 报告与基线 ---
+
+def _format_mb(value):
+    return f"{value:7.1f}" if value is not None else '      -'
+
+
+def compare(metrics, baseline, max_regression):
+    """返回超过阈值的退化：(指标, 字段, 基线值, 当前值)。绝对差值低于噪声下限的不计。"""
+    regressions = []
+    for key, current in metrics.items():
+        base = baseline.get(key)
+        if not base:
+            continue
+        for field, min_delta in (('seconds', MIN_SECONDS_DELTA), ('peak_rss_mb', MIN_MEMORY_DELTA_MB), ('peak_child_rss_mb', MIN_MEMORY_DELTA_MB)):
+            old, new = base.get(field), current.get(field)
+            if old is None or new is None:
+                continue
+            if new - old > min_delta and new > old * (1 + max_regression / 100):
+                regressions.append((key, field, old, new))
+    return regressions
+
+
+def print_report(metrics, baseline):
+    print(f"\n{'benchmark':<40} {'seconds':>9} {'peak MB':>8} {'child MB':>8} {'baseline':>9} {'change':>8}")
+    for key, value in metrics.items():
+        base = baseline.get(key, {}).get('seconds')
+        change = f"{(value['seconds'] - base) / base * 100:+7.1f}%" if base else ''
+        label = f"  {key.rsplit('/', 1)[1]}" if key.count('/') == 3 else key
+        print(f"{label:<40} {value['seconds']:9.3f} {_format_mb(value.get('peak_rss_mb')):>8} "
+              f"{_format_mb(value.get('peak_child_rss_mb')):>8} {f'{base:9.3f}' if base else '':>9} {change:>8}")
+
+
+def environment_info(args):
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'jobs': args.jobs,
+        'repeat': args.repeat,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark pysuitcase's build pipeline against local stand-ins (no network, no MSVC).")
+    parser.add_argument('--sizes', default='small,medium', help=f"Comma-separated project sizes ({', '.join(SIZES)}).")
+    parser.add_argument('--repeat', type=int, default=3, help='Measurements per benchmark (median time, maximum memory).')
+    parser.add_argument('--only', choices=('all', 'e2e', 'stages'), default='all', help='Run only the end-to-end builds or only the individual stages.')
+    parser.add_argument('--stages', default=','.join(STAGES), help='Comma-separated stages to measure individually.')
+    parser.add_argument('--jobs', '-j', type=int, default=None, help='Passed to pysuitcase as --jobs (default: all CPU cores).')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='Baseline JSON to compare against. None is committed: record one on this machine with --save-baseline first.')
+    parser.add_argument('--save-baseline', action='store_true', help='Write this run to the baseline file instead of comparing.')
+    parser.add_argument('--max-regression', type=float, default=20.0, help='Percent slower (or more memory) than the baseline that fails the run.')
+    parser.add_argument('--output', default=None, help='Also write the results to this JSON file.')
+    parser.add_argument('--keep', action='store_true', help='Keep the work directory (projects, caches, logs).')
+    parser.add_argument('--worker', default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker:
+        run_worker(args.worker)
+        return
+
+    sizes = [size.strip() for size in args.sizes.split(',') if size.strip()]
+    names = [name.strip() for name in args.stages.split(',') if name.strip()]
+    unknown = [size for size in sizes if size not in SIZES] + [name for name in names if name not in STAGES]
+    if unknown:
+        parser.error(f"Unknown size or stage: {', '.join(unknown)}")
+
+    work_root = tempfile.mkdtemp(prefix='pysuitcase-bench-')
+    metrics = {}
+    try:
+        site_root = os.path.join(work_root, 'site')
+        print(f"Generating the local index and runtime in {site_root}...")
+        prepare_site(site_root, sizes)
+        with standins.LocalServer(site_root) as server:
+            session = Session(work_root, server, args.jobs)
+            for size in sizes:
+                if args.only in ('all', 'e2e'):
+                    run_e2e(session, size, args.repeat, metrics)
+                if args.only in ('all', 'stages'):
+                    run_stages(session, size, args.repeat, names, metrics)
+    finally:
+        if args.keep:
+            print(f"Work directory kept at {work_root}")
+        else:
+            shutil.rmtree(work_root, ignore_errors=True)
+
+    results = {'environment': environment_info(args), 'metrics': metrics}
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    baseline = {}
+    if not args.save_baseline and not os.path.exists(args.baseline):
+        print(f"Note: no baseline at {args.baseline}; run once with --save-baseline to record one. Nothing is compared.")
+    elif not args.save_baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            stored = json.load(f)
+        baseline = stored.get('metrics', {})
+        recorded = stored.get('environment', {})
+        if (recorded.get('platform'), recorded.get('cpus'), recorded.get('python')) != (platform.platform(), os.cpu_count(), platform.python_version()):
+            print(f"Note: the baseline was recorded on {recorded.get('platform')} ({recorded.get('cpus')} CPUs, Python {recorded.get('python')}).")
+    print_report(metrics, baseline)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nBaseline written to {args.baseline}")
+        return
+    regressions = compare(metrics, baseline, args.max_regression)
+    for key, field, old, new in regressions:
+        print(f"REGRESSION {key} {field}: {old:.3f} -> {new:.3f} (+{(new - old) / old * 100:.1f}%)")
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""
+比较 --pack 与松散文件两种布局的启动耗时。
+
+生成一个导入密集的合成项目（许多小包、每个包许多模块，外加数据文件），预编译为 unchecked-hash 的 .pyc，
+再用 pysuitcase 的打包代码生成 pysuitcase.pack，然后分别以松散文件和打包方式反复启动宿主解释器并导入全部模块：
+
+    python benchmarks/pack_startup.py --packages 80 --modules 25 --runs 15
+
+宿主解释器以 -S -E 运行，sys.path 的顺序与嵌入式发行包一致（标准库、嵌入式目录、site-packages、app 目录）。
+"""
+import argparse
+import compileall
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pysuitcase.packer import build_pack, install_importer, pack_preload  # noqa: E402
+
+EMBED_DIR = 'python-embed'
+APP_FOLDER = 'app'
+
+
+def generate_project(project_dir, packages, modules):
+    """生成 site-packages 中的 packages 个包（每个 modules 个模块）以及导入它们全部的 app。"""
+    site_packages = os.path.join(project_dir, EMBED_DIR, 'Lib', 'site-packages')
+    app_dir = os.path.join(project_dir, APP_FOLDER)
+    os.makedirs(app_dir)
+    for p in range(packages):
+        package_dir = os.path.join(site_packages, f"benchpkg{p}")
+        os.makedirs(os.path.join(package_dir, 'sub'))
+        with open(os.path.join(package_dir, '__init__.py'), 'w') as f:
+            f.write(''.join(f"from . import mod{m}\n" for m in range(modules)))
+            f.write("from .sub import helpers\n")
+        for m in range(modules):
+            with open(os.path.join(package_dir, f"mod{m}.py"), 'w') as f:
+                f.write(f"import os\n\nVALUE = {m}\n\n")
+                f.write(''.join(f"def func{i}(x):\n    return x * {i} + VALUE\n\n" for i in range(20)))
+                f.write(f"class Thing{m}:\n    def method(self):\n        return func1(VALUE)\n")
+        with open(os.path.join(package_dir, 'sub', '__init__.py'), 'w') as f:
+            f.write('')
+        with open(os.path.join(package_dir, 'sub', 'helpers.py'), 'w') as f:
+            f.write("import os\nDATA = open(os.path.join(os.path.dirname(__file__), 'data.txt')).read()\n")
+        with open(os.path.join(package_dir, 'sub', 'data.txt'), 'w') as f:
+            f.write('payload\n' * 100)
+    with open(os.path.join(app_dir, 'app.py'), 'w') as f:
+        f.write(''.join(f"import benchpkg{p}\n" for p in range(packages)))
+        f.write("def run():\n    pass\n")
+    for path in (app_dir, site_packages):
+        compileall.compile_dir(path, quiet=1, workers=0, invalidation_mode=compileall.py_compile.PycInvalidationMode.UNCHECKED_HASH)
+    return site_packages
+
+
+def startup_command(project_dir, packed):
+    embed_dir = os.path.join(project_dir, EMBED_DIR)
+    site_packages = os.path.join(embed_dir, 'Lib', 'site-packages')
+    statements = [
+        "import os, sys",
+        f"sys.path[1:1] = [{embed_dir!r}, {site_packages!r}]",
+        "sys.path.append(os.getcwd())",
+    ]
+    if packed:
+        statements.append(pack_preload(project_dir, APP_FOLDER).replace('\\', os.sep))
+    statements.append("import app")
+    return [sys.executable, '-S', '-E', '-c', '; '.join(statements)]
+
+
+def time_startup(project_dir, packed, runs):
+    command = startup_command(project_dir, packed)
+    app_dir = os.path.join(project_dir, APP_FOLDER)
+    subprocess.run(command, cwd=app_dir, check=True)  # 预热，并确认导入成功
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run(command, cwd=app_dir, check=True)
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare loose-file and --pack startup on an import-heavy project.")
+    parser.add_argument('--packages', type=int, default=60, help='Packages in site-packages.')
+    parser.add_argument('--modules', type=int, default=20, help='Modules per package.')
+    parser.add_argument('--runs', type=int, default=10, help='Timed runs per layout.')
+    parser.add_argument('--compress', action='store_true', help='Build the pack with --pack-compress.')
+    parser.add_argument('--keep', action='store_true', help='Keep the generated project.')
+    args = parser.parse_args()
+
+    project_dir = tempfile.mkdtemp(prefix='pysuitcase-bench-pack-')
+    try:
+        site_packages = generate_project(project_dir, args.packages, args.modules)
+        build_pack(project_dir, APP_FOLDER, site_packages, compress=args.compress)
+        install_importer(os.path.join(project_dir, EMBED_DIR))
+
+        results = {}
+        for label, packed in (('loose', False), ('packed', True)):
+            results[label] = time_startup(project_dir, packed, args.runs)
+        module_count = args.packages * (args.modules + 3) + 1
+        print(f"\n{module_count} modules, {args.runs} runs each (median / min):")
+        for label, timings in results.items():
+            print(f"  {label:<7} {statistics.median(timings) * 1000:8.1f} ms  {min(timings) * 1000:8.1f} ms")
+        speedup = statistics.median(results['loose']) / statistics.median(results['packed'])
+        print(f"  packed startup is {speedup:.2f}x the speed of loose files")
+    finally:
+        if args.keep:
+            print(f"Project kept at {project_dir}")
+        else:
+            shutil.rmtree(project_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
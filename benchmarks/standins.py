@@ -0,0 +1,208 @@
+"""
+构建流水线基准测试使用的本地替身：不访问网络、不需要 Windows 工具链（启动器使用随包发布的预编译存根）。
+
+- LocalServer：本地 HTTP 服务器（支持 HEAD 与 Range），提供伪造的嵌入式 zip、get-pip.py 以及静态的 PEP 503 包索引；
+- make_embed_zip / make_get_pip：与官方发行包布局一致的伪造运行时与 get-pip.py；
+- make_wheel / build_index：生成 py3-none-any 的合成 wheel，并以静态文件的形式写出 simple 索引；
+"""
+import base64
+import functools
+import hashlib
+import html
+import io
+import os
+import random
+import re
+import shutil
+import threading
+import zipfile
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+# zip 条目使用固定时间戳，同样的输入总是生成同样的文件（哈希稳定，锁文件可复用）
+_ZIP_DATE = (2024, 1, 1, 0, 0, 0)
+
+
+# --- 本地 HTTP 服务器 ---
+
+class _RangeFile:
+    """只读出文件中 [start, start + length) 的部分，供 copyfile 写入响应。"""
+
+    def __init__(self, f, length):
+        self._file = f
+        self._remaining = length
+
+    def read(self, size=-1):
+        if self._remaining <= 0:
+            return b''
+        size = self._remaining if size is None or size < 0 else min(size, self._remaining)
+        data = self._file.read(size)
+        self._remaining -= len(data)
+        return data
+
+    def close(self):
+        self._file.close()
+
+
+class _Handler(SimpleHTTPRequestHandler):
+    """静态文件服务，额外支持单区间的 Range 请求（下载器据此分段与续传）。"""
+
+    def log_message(self, format, *args):
+        pass
+
+    def end_headers(self):
+        self.send_header('Accept-Ranges', 'bytes')
+        super().end_headers()
+
+    def send_head(self):
+        path = self.translate_path(self.path)
+        match = re.match(r'^bytes=(\d+)-(\d*)$', self.headers.get('Range', ''))
+        if not match or not os.path.isfile(path):
+            return super().send_head()
+        size = os.path.getsize(path)
+        start = int(match.group(1))
+        end = min(int(match.group(2)) if match.group(2) else size - 1, size - 1)
+        if start > end:
+            self.send_error(416)
+            return None
+        f = open(path, 'rb')
+        f.seek(start)
+        self.send_response(206)
+        self.send_header('Content-Type', self.guess_type(path))
+        self.send_header('Content-Range', f'bytes {start}-{end}/{size}')
+        self.send_header('Content-Length', str(end - start + 1))
+        self.end_headers()
+        return _RangeFile(f, end - start + 1)
+
+
+class LocalServer:
+    """在后台线程中把 root 目录作为静态站点提供在 127.0.0.1 的随机端口上，可作为上下文管理器使用。"""
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), functools.partial(_Handler, directory=self.root))
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+# --- 伪造的运行时与 get-pip.py ---
+
+def _random_bytes(seed, size):
+    """确定性的不可压缩数据，模拟 DLL/.pyd 这类二进制文件。"""
+    return random.Random(seed).getrandbits(size * 8).to_bytes(size, 'little') if size else b''
+
+
+def _write_zip(path, entries, compression=zipfile.ZIP_DEFLATED):
+    with zipfile.ZipFile(path, 'w', compression) as archive:
+        for name, data in entries:
+            archive.writestr(zipfile.ZipInfo(name, date_time=_ZIP_DATE), data, compress_type=compression)
+
+
+def make_embed_zip(site_root, version, arch, scale=1.0):
+    """
+    在 site_root/python/<version>/ 下生成与官方布局一致的 python-<version>-embed-<arch>.zip：
+    python.exe、DLL、若干 .pyd、pythonXY.zip（标准库）与 pythonXY._pth。scale=1 时大小与真实发行包相当（约 11 MB）。
+    返回 PYSUITCASE_PYTHON_MIRROR 应指向的相对路径 'python'。
+    """
+    major, minor = version.split('.')[:2]
+    tag = f"{major}{minor}"
+    stdlib = io.BytesIO()
+    stdlib_entries = []
+    for i in range(int(1200 * scale)):
+        body = ''.join(f"def f{j}(x):\n    return x + {i * j}\n\n" for j in range(40))
+        stdlib_entries.append((f"stdlib/pkg{i // 50}/mod{i}.pyc", body.encode('utf-8')))
+    _write_zip(stdlib, stdlib_entries)
+
+    binaries = [
+        ('python.exe', 100), ('pythonw.exe', 98), (f'python{tag}.dll', 4500), ('python3.dll', 66),
+        ('vcruntime140.dll', 106), ('vcruntime140_1.dll', 48), ('libcrypto-3.dll', 3200), ('libssl-3.dll', 700),
+        ('sqlite3.dll', 1400), ('libffi-8.dll', 36),
+    ] + [(f'_ext{i}.pyd', 40 + i * 15) for i in range(16)]
+    entries = [(name, _random_bytes(name, int(kb * 1024 * scale))) for name, kb in binaries]
+    entries += [
+        (f'python{tag}.zip', stdlib.getvalue()),
+        (f'python{tag}._pth', f"python{tag}.zip\r\n.\r\n\r\n# Uncomment to run site.main() automatically\r\n#import site\r\n"),
+        ('LICENSE.txt', 'Stand-in runtime for pysuitcase benchmarks.\n'),
+    ]
+    target_dir = os.path.join(site_root, 'python', version)
+    os.makedirs(target_dir, exist_ok=True)
+    _write_zip(os.path.join(target_dir, f"python-{version}-embed-{arch}.zip"), entries)
+    return 'python'
+
+
+def make_get_pip(site_root):
+    """生成占位的 get-pip.py（非 Windows 主机以暂存模式构建，不会执行它）。返回相对路径。"""
+    with open(os.path.join(site_root, 'get-pip.py'), 'w', encoding='utf-8') as f:
+        f.write('"""Stand-in get-pip.py for pysuitcase benchmarks."""\n')
+        f.write('import sys\nsys.exit("The benchmark get-pip.py stand-in cannot install pip.")\n')
+        # 与真实文件同一量级（约 2.5 MB）
+        f.write(''.join(f"# {'x' * 76}\n" for _ in range(32000)))
+    return 'get-pip.py'
+
+
+# --- 合成 wheel 与静态包索引 ---
+
+def canonical_name(name):
+    return re.sub(r'[-_.]+', '-', name).lower()
+
+
+def _record_hash(data):
+    return 'sha256=' + base64.urlsafe_b64encode(hashlib.sha256(data).digest()).rstrip(b'=').decode('ascii')
+
+
+def make_wheel(dist_dir, name, version, files, requires=()):
+    """把 files（相对路径 -> 字节）写成 dist_dir 中的 py3-none-any wheel，带 METADATA、WHEEL 与 RECORD。返回 wheel 路径。"""
+    dist_name = re.sub(r'[-_.]+', '_', name)
+    dist_info = f"{dist_name}-{version}.dist-info"
+    entries = [(path, data if isinstance(data, bytes) else data.encode('utf-8')) for path, data in files.items()]
+    metadata = f"Metadata-Version: 2.1\nName: {name}\nVersion: {version}\n" + ''.join(f"Requires-Dist: {r}\n" for r in requires)
+    entries.append((f"{dist_info}/METADATA", metadata.encode('utf-8')))
+    entries.append((f"{dist_info}/WHEEL", b"Wheel-Version: 1.0\nGenerator: pysuitcase-bench\nRoot-Is-Purelib: true\nTag: py3-none-any\n"))
+    record = ''.join(f"{path},{_record_hash(data)},{len(data)}\n" for path, data in entries) + f"{dist_info}/RECORD,,\n"
+    entries.append((f"{dist_info}/RECORD", record.encode('utf-8')))
+    os.makedirs(dist_dir, exist_ok=True)
+    wheel_path = os.path.join(dist_dir, f"{dist_name}-{version}-py3-none-any.whl")
+    _write_zip(wheel_path, entries)
+    return wheel_path
+
+
+def build_index(site_root, wheel_paths):
+    """把 wheel 复制到 site_root/packages/，并写出 site_root/simple/ 下的 PEP 503 索引页（链接带 #sha256=）。返回相对路径 'simple'。"""
+    packages_dir = os.path.join(site_root, 'packages')
+    os.makedirs(packages_dir, exist_ok=True)
+    projects = {}
+    for wheel_path in wheel_paths:
+        filename = os.path.basename(wheel_path)
+        shutil.copyfile(wheel_path, os.path.join(packages_dir, filename))
+        with open(wheel_path, 'rb') as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+        projects.setdefault(canonical_name(filename.split('-')[0]), []).append((filename, digest))
+
+    simple_dir = os.path.join(site_root, 'simple')
+    for project, files in projects.items():
+        os.makedirs(os.path.join(simple_dir, project), exist_ok=True)
+        links = ''.join(f'<a href="../../packages/{html.escape(name)}#sha256={digest}">{html.escape(name)}</a><br>\n' for name, digest in files)
+        with open(os.path.join(simple_dir, project, 'index.html'), 'w', encoding='utf-8') as f:
+            f.write(f"<!DOCTYPE html>\n<html><body>\n{links}</body></html>\n")
+    links = ''.join(f'<a href="{project}/">{project}</a><br>\n' for project in sorted(projects))
+    with open(os.path.join(simple_dir, 'index.html'), 'w', encoding='utf-8') as f:
+        f.write(f"<!DOCTYPE html>\n<html><body>\n{links}</body></html>\n")
+    return 'simple'
@@ -0,0 +1,343 @@
+import click
+import fnmatch
+import functools
+import hashlib
+import os
+import struct
+import sys
+import tarfile
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from .incremental import BUILD_MANIFEST_NAME
+
+ARCHIVE_FORMATS = ('zip', 'tar.zst')
+
+# 构建中间产物以及归档输出目录本身不进入归档；以 '/' 结尾的模式匹配目录
+ARCHIVE_EXCLUDES = [
+    'dist/', '.git/', 'build/',
+    BUILD_MANIFEST_NAME, 'pysuitcase_launcher.*', 'pysuitcase_build.py', 'app.res', 'resource.rc',
+    '*.cp3*-win*.lock',
+]
+
+# 本身已经压缩过的格式，直接存储
+_COMPRESSED_EXTENSIONS = (
+    '.zip', '.whl', '.jar', '.egg', '.gz', '.tgz', '.bz2', '.xz', '.zst', '.7z', '.rar', '.lzma',
+    '.png', '.jpg', '.jpeg', '.gif', '.webp', '.ico', '.mp3', '.mp4', '.ogg', '.avi', '.mkv', '.woff', '.woff2',
+)
+
+_CHUNK_SIZE = 1024 * 1024
+_DEFLATE_WINDOW = 32 * 1024
+# 压缩后仍大于原大小的这一比例时改为存储
+_STORE_RATIO = 0.97
+_ZIP64_LIMIT = 0xFFFFFFFF
+_ZIP_STORED, _ZIP_DEFLATED = 0, 8
+_FLAG_DATA_DESCRIPTOR, _FLAG_UTF8 = 0x08, 0x800
+
+
+def _archive_timestamp():
+    """归档中统一使用的时间戳：SOURCE_DATE_EPOCH（若设置），否则为 ZIP 可表示的最早时间。"""
+    epoch = os.environ.get('SOURCE_DATE_EPOCH')
+    if epoch and epoch.isdigit():
+        return max(int(epoch), 315532800)
+    return 315532800  # 1980-01-01 00:00:00 UTC
+
+
+def collect_files(root, excludes=ARCHIVE_EXCLUDES):
+    """按归档内路径排序返回 [(归档路径, 绝对路径, 大小)]；空目录以 '/' 结尾、大小为 None。"""
+    dir_patterns = [p.rstrip('/') for p in excludes if p.endswith('/')]
+    file_patterns = [p for p in excludes if not p.endswith('/')]
+    entries = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        rel_dir = os.path.relpath(dirpath, root).replace(os.sep, '/')
+        rel_dir = '' if rel_dir == '.' else rel_dir + '/'
+        dirnames[:] = [d for d in dirnames if not any(fnmatch.fnmatchcase(rel_dir + d, p) for p in dir_patterns)]
+        kept = [f for f in filenames if not any(fnmatch.fnmatchcase(rel_dir + f, p) for p in file_patterns)]
+        for filename in kept:
+            path = os.path.join(dirpath, filename)
+            if os.path.islink(path) and not os.path.exists(path):
+                continue
+            entries.append((rel_dir + filename, path, os.path.getsize(path)))
+        if rel_dir and not dirnames and not kept:
+            entries.append((rel_dir, dirpath, None))
+    entries.sort(key=lambda entry: entry[0])
+    return entries
+
+
+# --- CRC32 合并：并行计算的分块 CRC 按 zlib crc32_combine 的方法拼接 ---
+
+def _gf2_times(matrix, vector):
+    total, index = 0, 0
+    while vector:
+        if vector & 1:
+            total ^= matrix[index]
+        vector >>= 1
+        index += 1
+    return total
+
+
+def _gf2_square(matrix):
+    return [_gf2_times(matrix, row) for row in matrix]
+
+
+@functools.lru_cache(maxsize=None)
+def _crc32_zeros_operator(length):
+    """返回“在数据后追加 length 个零字节”对 CRC 的线性变换矩阵。"""
+    operator = [0xEDB88320] + [1 << n for n in range(31)]  # 一个零比特
+    for _ in range(3):
+        operator = _gf2_square(operator)  # 一个零字节
+    result = None
+    while length:
+        if length & 1:
+            result = operator if result is None else [_gf2_times(operator, row) for row in result]
+        length >>= 1
+        if length:
+            operator = _gf2_square(operator)
+    return result
+
+
+def crc32_combine(crc1, crc2, length2):
+    """由 crc32(A)、crc32(B) 和 len(B) 计算 crc32(A + B)。"""
+    if length2 <= 0:
+        return crc1
+    return _gf2_times(_crc32_zeros_operator(length2), crc1) ^ crc2
+
+
+# --- 压缩任务（在线程池中执行，zlib 会释放 GIL） ---
+
+def _read_range(path, offset, size):
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        return f.read(size)
+
+
+def _compress_small(path, level):
+    """整块压缩小文件；压缩效果不明显时返回原始数据并标记为存储。"""
+    data = _read_range(path, 0, _CHUNK_SIZE)
+    crc = zlib.crc32(data)
+    if not data or path.lower().endswith(_COMPRESSED_EXTENSIONS):
+        return _ZIP_STORED, crc, len(data), data
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    compressed = compressor.compress(data) + compressor.flush()
+    if len(compressed) >= len(data) * _STORE_RATIO:
+        return _ZIP_STORED, crc, len(data), data
+    return _ZIP_DEFLATED, crc, len(data), compressed
+
+
+def _compress_chunk(path, offset, method, level, is_last):
+    """
+    压缩大文件中的一块。以前一块的末尾 32 KB 作为预设字典，非末块以 Z_SYNC_FLUSH 结束，
+    各块首尾相接即为一个完整的 deflate 流（与 pigz 的做法相同），压缩率几乎不受分块影响。
+    """
+    if method == _ZIP_STORED:
+        data = _read_range(path, offset, _CHUNK_SIZE)
+        return method, zlib.crc32(data), len(data), data
+    history = min(offset, _DEFLATE_WINDOW)
+    raw = _read_range(path, offset - history, _CHUNK_SIZE + history)
+    dictionary, data = raw[:history], raw[history:]
+    if dictionary:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15, zdict=dictionary)
+    else:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    compressed = compressor.compress(data) + compressor.flush(zlib.Z_FINISH if is_last else zlib.Z_SYNC_FLUSH)
+    return method, zlib.crc32(data), len(data), compressed
+
+
+def _choose_method(path):
+    """大文件按扩展名以及开头一段数据的试压缩结果决定是否压缩。"""
+    if path.lower().endswith(_COMPRESSED_EXTENSIONS):
+        return _ZIP_STORED
+    sample = _read_range(path, 0, 256 * 1024)
+    compressor = zlib.compressobj(1, zlib.DEFLATED, -15)
+    compressed = compressor.compress(sample) + compressor.flush()
+    return _ZIP_STORED if len(compressed) >= len(sample) * _STORE_RATIO else _ZIP_DEFLATED
+
+
+class _HashingWriter:
+    """顺序写入文件，同时计算 SHA-256 并记录当前偏移。"""
+
+    def __init__(self, f):
+        self._f = f
+        self.sha256 = hashlib.sha256()
+        self.offset = 0
+
+    def write(self, data):
+        self._f.write(data)
+        self.sha256.update(data)
+        self.offset += len(data)
+
+    def flush(self):
+        self._f.flush()
+
+
+def _dos_datetime(timestamp):
+    t = time.gmtime(timestamp)
+    return (t.tm_year - 1980) << 9 | t.tm_mon << 5 | t.tm_mday, t.tm_hour << 11 | t.tm_min << 5 | t.tm_sec // 2
+
+
+def _local_header(name, method, flags, zip64, dos_date, dos_time):
+    extra = struct.pack('<HHQQ', 0x0001, 16, 0, 0) if zip64 else b''
+    size_field = _ZIP64_LIMIT if zip64 else 0
+    version = 45 if zip64 else 20
+    return struct.pack('<IHHHHHIIIHH', 0x04034b50, version, flags, method, dos_time, dos_date,
+                       0, size_field, size_field, len(name), len(extra)) + name + extra
+
+
+def _central_header(name, method, flags, crc, compressed_size, size, offset, is_dir, dos_date, dos_time):
+    zip64_fields = []
+    if size >= _ZIP64_LIMIT:
+        zip64_fields.append(size)
+    if compressed_size >= _ZIP64_LIMIT:
+        zip64_fields.append(compressed_size)
+    if offset >= _ZIP64_LIMIT:
+        zip64_fields.append(offset)
+    extra = struct.pack('<HH', 0x0001, 8 * len(zip64_fields)) + struct.pack(f'<{len(zip64_fields)}Q', *zip64_fields) if zip64_fields else b''
+    version = 45 if zip64_fields else 20
+    return struct.pack(
+        '<IHHHHHHIIIHHHHHII', 0x02014b50, version, version, flags, method, dos_time, dos_date, crc,
+        min(compressed_size, _ZIP64_LIMIT), min(size, _ZIP64_LIMIT), len(name), len(extra), 0, 0, 0,
+        0x10 if is_dir else 0x20, min(offset, _ZIP64_LIMIT)
+    ) + name + extra
+
+
+def write_zip(entries, archive_path, prefix='', level=6, jobs=None):
+    """
+    多线程写入 ZIP：文件按固定顺序写入、时间戳统一，相同输入得到逐字节相同的归档。
+    大文件按 1 MB 分块并行压缩，同时在途的块数有上限，因此内存占用与文件大小无关。
+    返回归档的 SHA-256。
+    """
+    jobs = jobs or os.cpu_count() or 1
+    window = jobs * 2
+    dos_date, dos_time = _dos_datetime(_archive_timestamp())
+    central = []
+
+    def _work_items(executor):
+        """按写入顺序产生 (条目, 块序号, 是否最后一块, future)。"""
+        for arcname, path, size in entries:
+            if size is None:
+                yield (arcname, path, size), 0, True, None
+            elif size <= _CHUNK_SIZE:
+                yield (arcname, path, size), 0, True, executor.submit(_compress_small, path, level)
+            else:
+                method = _choose_method(path)
+                chunk_count = (size + _CHUNK_SIZE - 1) // _CHUNK_SIZE
+                for index in range(chunk_count):
+                    is_last = index == chunk_count - 1
+                    yield (arcname, path, size), index, is_last, executor.submit(_compress_chunk, path, index * _CHUNK_SIZE, method, level, is_last)
+
+    tmp_path = archive_path + '.partial'
+    with open(tmp_path, 'wb') as f, ThreadPoolExecutor(max_workers=jobs) as executor:
+        out = _HashingWriter(f)
+        in_flight = deque()
+        items = _work_items(executor)
+        state = {}
+
+        def _write_next():
+            (arcname, _, size), index, is_last, future = in_flight.popleft()
+            name = (prefix + arcname).encode('utf-8')
+            flags = _FLAG_UTF8 if not name.isascii() else 0
+            if future is None:
+                offset = out.offset
+                out.write(_local_header(name, _ZIP_STORED, flags, False, dos_date, dos_time))
+                central.append(_central_header(name, _ZIP_STORED, flags, 0, 0, 0, offset, True, dos_date, dos_time))
+                return
+            method, crc, raw_size, data = future.result()
+            if index == 0:
+                flags |= _FLAG_DATA_DESCRIPTOR
+                zip64 = size >= _ZIP64_LIMIT * 0.95
+                state.update(offset=out.offset, method=method, flags=flags, zip64=zip64, crc=0, size=0, compressed=0)
+                out.write(_local_header(name, method, flags, zip64, dos_date, dos_time))
+            out.write(data)
+            state['crc'] = crc32_combine(state['crc'], crc, raw_size)
+            state['size'] += raw_size
+            state['compressed'] += len(data)
+            if is_last:
+                if state['zip64']:
+                    out.write(struct.pack('<IIQQ', 0x08074b50, state['crc'], state['compressed'], state['size']))
+                else:
+                    out.write(struct.pack('<IIII', 0x08074b50, state['crc'], state['compressed'], state['size']))
+                central.append(_central_header(name, state['method'], state['flags'], state['crc'], state['compressed'],
+                                               state['size'], state['offset'], False, dos_date, dos_time))
+
+        for item in items:
+            in_flight.append(item)
+            if len(in_flight) >= window:
+                _write_next()
+        while in_flight:
+            _write_next()
+
+        # --- 中央目录与结束记录 ---
+        central_offset = out.offset
+        for record in central:
+            out.write(record)
+        central_size = out.offset - central_offset
+        count = len(central)
+        if count >= 0xFFFF or central_offset >= _ZIP64_LIMIT or central_size >= _ZIP64_LIMIT:
+            zip64_end_offset = out.offset
+            out.write(struct.pack('<IQHHIIQQQQ', 0x06064b50, 44, 45, 45, 0, 0, count, count, central_size, central_offset))
+            out.write(struct.pack('<IIQI', 0x07064b50, 0, zip64_end_offset, 1))
+        out.write(struct.pack('<IHHHHIIH', 0x06054b50, 0, 0, min(count, 0xFFFF), min(count, 0xFFFF),
+                              min(central_size, _ZIP64_LIMIT), min(central_offset, _ZIP64_LIMIT), 0))
+        digest = out.sha256.hexdigest()
+    os.replace(tmp_path, archive_path)
+    return digest
+
+
+def write_tar_zst(entries, archive_path, prefix='', level=6, jobs=None):
+    """用 zstandard 的多线程流式压缩写入 tar.zst；条目顺序、时间戳与属主固定。返回归档的 SHA-256。"""
+    try:
+        import zstandard
+    except ImportError:
+        click.secho("Error: --archive tar.zst requires the 'zstandard' package (pip install zstandard).", fg='red', bold=True)
+        sys.exit(1)
+
+    mtime = _archive_timestamp()
+    tmp_path = archive_path + '.partial'
+    with open(tmp_path, 'wb') as f:
+        out = _HashingWriter(f)
+        compressor = zstandard.ZstdCompressor(level=level, threads=jobs or os.cpu_count() or 1)
+        with compressor.stream_writer(out, closefd=False) as stream, tarfile.open(fileobj=stream, mode='w|', format=tarfile.PAX_FORMAT) as tar:
+            for arcname, path, size in entries:
+                info = tarfile.TarInfo(prefix + arcname.rstrip('/'))
+                info.mtime, info.uid, info.gid, info.uname, info.gname = mtime, 0, 0, '', ''
+                if size is None:
+                    info.type, info.mode = tarfile.DIRTYPE, 0o755
+                    tar.addfile(info)
+                    continue
+                info.size, info.mode = size, 0o644
+                with open(path, 'rb') as source:
+                    tar.addfile(info, source)
+        digest = out.sha256.hexdigest()
+    os.replace(tmp_path, archive_path)
+    return digest
+
+
+def archive_bundle(project_dir, archive_format='zip', output_dir=None, jobs=None, level=6, archive_name=None):
+    """
+    归档阶段：把打包好的项目目录写成 <项目名>.zip 或 .tar.zst，并在旁边写入 sha256sum 格式的校验文件。
+    archive_name 可指定归档文件名（不含扩展名），归档内的顶层目录仍为项目名。返回归档路径。
+    """
+    click.echo("\n-------------------------------------")
+    click.secho(f"Creating {archive_format} archive...", fg='cyan', bold=True)
+    project_name = os.path.basename(os.path.normpath(project_dir))
+    output_dir = output_dir or os.path.join(project_dir, 'dist')
+    os.makedirs(output_dir, exist_ok=True)
+    archive_path = os.path.join(output_dir, f"{archive_name or project_name}.{archive_format}")
+
+    started = time.perf_counter()
+    entries = collect_files(project_dir)
+    total = sum(size or 0 for _, _, size in entries)
+    writer = write_zip if archive_format == 'zip' else write_tar_zst
+    digest = writer(entries, archive_path, prefix=project_name + '/', level=level, jobs=jobs)
+
+    with open(archive_path + '.sha256', 'w', encoding='utf-8', newline='\n') as f:
+        f.write(f"{digest}  {os.path.basename(archive_path)}\n")
+
+    elapsed = time.perf_counter() - started
+    archive_size = os.path.getsize(archive_path)
+    click.secho(f"Archived {len(entries)} entries ({total / 1024 / 1024:.1f} MB -> {archive_size / 1024 / 1024:.1f} MB) "
+                f"in {elapsed:.1f}s: {archive_path}", fg='green')
+    click.echo(f"SHA-256: {digest}")
+    return archive_path
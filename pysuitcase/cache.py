@@ -0,0 +1,153 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+# 运行时缓存的默认容量上限（MB），超过后按最近最少使用（LRU）淘汰
+DEFAULT_CACHE_MAX_SIZE_MB = 2048
+
+MANIFEST_NAME = 'manifest.json'
+
+
+def get_cache_root():
+    """返回 pysuitcase 的用户级缓存根目录，可通过 PYSUITCASE_CACHE_DIR 覆盖。"""
+    root = os.environ.get('PYSUITCASE_CACHE_DIR')
+    if not root:
+        if os.name == 'nt':
+            base = os.environ.get('LOCALAPPDATA') or os.path.expanduser('~')
+            root = os.path.join(base, 'pysuitcase', 'Cache')
+        else:
+            base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+            root = os.path.join(base, 'pysuitcase')
+    os.makedirs(root, exist_ok=True)
+    return root
+
+
+def get_cache_dir(*parts):
+    """返回缓存根目录下的子目录，不存在时自动创建。"""
+    path = os.path.join(get_cache_root(), *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def hash_file(path, chunk_size=1024 * 1024):
+    """计算单个文件的 SHA-256。"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hash_tree(root):
+    """计算目录下每个文件的 SHA-256，返回 {相对路径(/分隔): 哈希}。"""
+    hashes = {}
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            full_path = os.path.join(dirpath, name)
+            rel_path = os.path.relpath(full_path, root).replace(os.sep, '/')
+            hashes[rel_path] = hash_file(full_path)
+    return hashes
+
+
+def tree_digest(file_hashes):
+    """根据 hash_tree 的结果计算整个目录的内容摘要。"""
+    digest = hashlib.sha256()
+    for rel_path in sorted(file_hashes):
+        digest.update(f"{rel_path}\0{file_hashes[rel_path]}\n".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def tree_size(root):
+    """统计目录下所有文件的总字节数。"""
+    total = 0
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            try:
+                total += os.path.getsize(os.path.join(dirpath, name))
+            except OSError:
+                pass
+    return total
+
+
+def link_or_copy(src, dst):
+    """优先使用硬链接放置文件，跨盘或不支持时退回复制。返回是否成功链接。"""
+    try:
+        os.link(src, dst)
+        return True
+    except OSError:
+        shutil.copy2(src, dst)
+        return False
+
+
+def materialize_tree(src_root, dst_root):
+    """把缓存中的目录树放置到目标位置（硬链接优先），返回链接的文件数。"""
+    linked = 0
+    for dirpath, _, filenames in os.walk(src_root):
+        rel_dir = os.path.relpath(dirpath, src_root)
+        target_dir = os.path.normpath(os.path.join(dst_root, rel_dir))
+        os.makedirs(target_dir, exist_ok=True)
+        for name in filenames:
+            if link_or_copy(os.path.join(dirpath, name), os.path.join(target_dir, name)):
+                linked += 1
+    return linked
+
+
+def read_manifest(entry_dir):
+    """读取缓存条目的 manifest.json，损坏或缺失时返回 None。"""
+    try:
+        with open(os.path.join(entry_dir, MANIFEST_NAME), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_json_atomic(path, data):
+    """先写临时文件再替换，避免并发构建读到半截的 JSON。"""
+    directory = os.path.dirname(path) or '.'
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-', suffix='.json')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def touch_entry(entry_dir):
+    """更新缓存条目的最近使用时间，用于 LRU 淘汰。"""
+    manifest = read_manifest(entry_dir)
+    if manifest is None:
+        return
+    manifest['last_used'] = time.time()
+    write_json_atomic(os.path.join(entry_dir, MANIFEST_NAME), manifest)
+
+
+def evict_lru(cache_dir, max_bytes, keep=()):
+    """当缓存目录超过容量上限时，按最近最少使用的顺序删除条目。返回被删除的条目名。"""
+    entries = []
+    for name in os.listdir(cache_dir):
+        entry_dir = os.path.join(cache_dir, name)
+        if name.startswith('.') or not os.path.isdir(entry_dir):
+            continue
+        manifest = read_manifest(entry_dir) or {}
+        size = manifest.get('size')
+        if size is None:
+            size = tree_size(entry_dir)
+        entries.append((manifest.get('last_used', 0), name, size))
+
+    total = sum(size for _, _, size in entries)
+    evicted = []
+    for _, name, size in sorted(entries):
+        if total <= max_bytes:
+            break
+        if name in keep:
+            continue
+        shutil.rmtree(os.path.join(cache_dir, name), ignore_errors=True)
+        total -= size
+        evicted.append(name)
+    return evicted
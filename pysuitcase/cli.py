@@ -3,9 +3,25 @@ import sys
 import os
 import platform
 import shlex
+import shutil
 
-from .script_downloader import download_and_run_ps_script, bootstrap_pip, install_dependencies
-from .compiler import compile_launcher, encrypt_code
+from .script_downloader import get_python_runtime, bootstrap_pip, fetch_get_pip, install_dependencies
+from .archiver import ARCHIVE_FORMATS, archive_bundle
+from .compiler import compile_launcher, compile_resources, encrypt_code, precompile_bytecode
+from .delta import create_delta, write_file_manifest
+from .incremental import fingerprint, hash_optional_file, hash_sources, is_stage_fresh, load_build_manifest, run_stage
+from .launcher import create_launcher, stub_available, stub_source_digest
+from .lockfile import get_lock_path, is_lock_fresh
+from .matrix import parse_target, run_matrix
+from .packer import build_pack, get_pack_path, install_importer, pack_preload, remove_pack
+from .profiler import build_profile, compare_profiles, find_embedded_runtimes, load_profile, print_profile_report, write_profile
+from .scheduler import Stage, run_stages
+from .slimming import DEFAULT_PRUNE_RULES, PRUNE_RULE_SETS, slim_bundle
+from .staging import stage_dependencies
+from .store import gc_store, get_store_dir, load_tree, restore_tree, save_tree, store_status
+from .trace import reset_trace
+from .warm import DEFAULT_IDLE_TIMEOUT, get_warm_client_path, install_warm_client, remove_warm_client, warm_preload
+from .wheelhouse import BUILD_ESSENTIALS, fill_wheelhouse, get_target_tag, get_wheelhouse_dir, prune_wheelhouse
 
 def _print_summary(params):
     """打印格式化的配置摘要。"""
@@ -21,43 +37,372 @@ def _print_summary(params):
         click.secho(f"  - Python Version:       {params['python_version']} (Target)", fg='cyan')
         click.secho(f"  - Architecture:         {params['arch']} (Target)", fg='cyan')
     click.echo(f"  - Requirements File:    {os.path.join(params.get('project_dir', ''), params.get('app_folder', ''), params.get('requirements_file', ''))}")
+    if params.get('no_lock'):
+        click.echo("  - Lock File:            Disabled")
+    else:
+        lock_path = get_lock_path(params.get('_lock_dir') or params.get('project_dir', ''), params.get('requirements_file', ''), params['python_version'], params['arch'])
+        click.echo(f"  - Lock File:            {lock_path}{' (re-resolve)' if params.get('relock') else ''}")
+    if _uses_staging(params):
+        click.echo(f"  - Dependency Install:   Staged by host pip ({get_target_tag(params['python_version'], params['arch'])} wheels only)")
+    else:
+        click.echo("  - Dependency Install:   Target interpreter")
+    if not (params.get('no_lock') or params.get('no_wheelhouse')):
+        click.echo(f"  - Wheel Install:        {'pip' if params.get('no_parallel_install') else 'Parallel unpack of locked wheels (pip fallback)'}")
+    click.echo(f"  - Package Store:        {get_store_dir() if params.get('store') else 'Disabled'}")
     click.echo(f"  - PyPI Mirror:          {params.get('mirror') or 'Not specified'}")
+    if params.get('no_wheelhouse'):
+        click.echo("  - Wheelhouse:           Disabled")
+    else:
+        click.echo(f"  - Wheelhouse:           {params.get('wheelhouse') or 'Shared (' + get_target_tag(params['python_version'], params['arch']) + ')'}")
     click.echo(f"  - Custom Icon:          {params.get('icon') or 'Default'}")
     click.secho(f"  - Launcher Mode:        {'Windowless' if params.get('no_window') else 'Console'}", fg='magenta')
+    click.echo(f"  - Launcher Build:       {'Compiled from C source' if params.get('compile_launcher') else 'Prebuilt stub'}")
+    click.echo(f"  - Runtime Cache:        {'Disabled' if params.get('no_cache') else ('Offline only' if params.get('offline') else 'Enabled')}")
+    click.echo(f"  - Incremental Build:    {'No (forced full rebuild)' if params.get('force') else 'Yes'}")
+    if params.get('prune'):
+        click.echo(f"  - Prune Bundle:         Yes ({', '.join(params.get('prune_rules') or DEFAULT_PRUNE_RULES)}{', dedupe binaries' if params.get('dedupe_binaries') else ''})")
+    if params.get('pack'):
+        click.echo(f"  - Pack Modules:         Yes ({'zlib-compressed' if params.get('pack_compress') else 'uncompressed'}{', excluding ' + ', '.join(params['pack_exclude']) if params.get('pack_exclude') else ''})")
+    if params.get('warm'):
+        click.echo(f"  - Warm Start:           Yes (idle timeout {params.get('warm_idle_timeout') or DEFAULT_IDLE_TIMEOUT}s{', preloading ' + ', '.join(params['warm_preload']) if params.get('warm_preload') else ''})")
+    if params.get('precompile'):
+        strip_note = ', third-party sources stripped' if params.get('strip_sources') else ''
+        click.echo(f"  - Precompile Bytecode:  Yes (optimization level {params.get('optimize') or 0}{strip_note})")
+    else:
+        click.echo("  - Precompile Bytecode:  No")
     click.echo(f"  - Encrypt Source Code:  {'Yes' if params.get('encrypt') else 'No'}")
     if params.get('encrypt'):
         fg_color = 'red' if params.get('delete_source_on_encrypt') else 'green'
         click.secho(f"  - Delete Source Files:  {'YES' if params.get('delete_source_on_encrypt') else 'NO'}", fg=fg_color, bold=True)
+    if params.get('archive'):
+        archive_dir = params.get('_archive_dir') or os.path.join(params.get('project_dir', ''), 'dist')
+        archive_name = params.get('_archive_name') or os.path.basename(params.get('project_dir', ''))
+        click.echo(f"  - Archive:              {os.path.join(archive_dir, archive_name + '.' + params['archive'])}")
     click.echo("-------------------------------------\n")
 
+def _uses_staging(params):
+    """非 Windows 宿主无法运行目标 python.exe，只能用宿主 pip 暂存依赖。"""
+    return params.get('stage_deps', False) or os.name != 'nt'
+
+
+def _check_toolchain(params):
+    """
+    在开始构建前确认最后一步能够完成：启动器需要可用的存根或 cl.exe/rc.exe，--encrypt 需要在 Windows 上编译扩展模块。
+    不满足时立即报错退出，而不是在下载与安装依赖之后才失败。
+    """
+    if params.get('encrypt') and os.name != 'nt':
+        click.secho("Error: --encrypt compiles Windows extension modules with the host's compiler and only works when building on Windows.",
+                    fg='red', bold=True); sys.exit(1)
+    if params.get('compile_launcher'):
+        if not shutil.which("cl.exe") or not shutil.which("rc.exe"):
+            click.secho("Error: --compile-launcher needs 'cl.exe' and 'rc.exe' on PATH (use a Visual Studio Developer Command Prompt).",
+                        fg='red', bold=True); sys.exit(1)
+        return
+    archs = sorted({arch for _, arch in params.get('target') or ()} or {params['arch']})
+    missing = [arch for arch in archs if not stub_available(arch, params.get('no_window', False))]
+    if missing:
+        click.secho(f"Error: No prebuilt launcher stub is available for {', '.join(missing)}, and 'cl.exe'/'rc.exe' are not on PATH.",
+                    fg='red', bold=True)
+        click.secho("Reinstall pysuitcase to restore the shipped stubs, or build from a Visual Studio Developer Command Prompt.", fg='yellow')
+        sys.exit(1)
+
+
 def execute_build(params):
-    """执行核心打包逻辑。"""
+    """
+    执行核心打包逻辑。各阶段按依赖关系并发调度，输入未变化的阶段会根据构建清单被跳过。
+    依赖关系：pip 需要运行时和 get-pip.py；依赖安装需要 pip 和预取的 wheel；启动器在其余阶段之后构建，随后写入内容清单并归档。
+    """
     _print_summary(params)
     if params.get('_is_interactive'):
         if not click.confirm("Proceed with this configuration?", default=True, abort=True):
             return
     click.secho("\nStarting packaging process...", bold=True)
-    python_embed_path = download_and_run_ps_script(version=params['python_version'], arch=params['arch'], project_dir=params['project_dir'])
-    if python_embed_path and os.path.exists(python_embed_path):
-        python_exe = os.path.join(python_embed_path, 'python.exe')
-        app_dir_path = os.path.join(params['project_dir'], params['app_folder'])
-        requirements_path = os.path.join(app_dir_path, params['requirements_file'])
-        bootstrap_pip(python_exe, work_dir=python_embed_path, mirror=params['mirror'])
-        if not install_dependencies(python_exe, requirements_path, params['mirror']):
+    project_dir = params['project_dir']
+    force = params.get('force', False)
+    offline = params.get('offline', False)
+    manifest = load_build_manifest(project_dir)
+    python_embed_path = os.path.join(project_dir, f"python-{params['python_version']}-embed-{params['arch']}")
+    python_exe = os.path.join(python_embed_path, 'python.exe')
+    app_dir_path = os.path.join(project_dir, params['app_folder'])
+    requirements_path = os.path.join(app_dir_path, params['requirements_file'])
+    exe_path = os.path.join(project_dir, f"{os.path.basename(project_dir)}.exe")
+    wheelhouse_dir = None
+    if not params.get('no_wheelhouse'):
+        wheelhouse_dir = get_wheelhouse_dir(params['python_version'], params['arch'], override=params.get('wheelhouse'))
+    lock_path = None
+    if not params.get('no_lock'):
+        lock_path = get_lock_path(params.get('_lock_dir') or project_dir, params['requirements_file'], params['python_version'], params['arch'])
+    staging = _uses_staging(params)
+    lock_fresh = lock_path is not None and not params.get('relock') and is_lock_fresh(lock_path, requirements_path, params['python_version'], params['arch'])
+
+    runtime_fp = fingerprint('runtime', params['python_version'], params['arch'])
+    pip_fp = fingerprint('pip', runtime_fp)
+    def _deps_fp():
+        # 锁文件在依赖安装阶段中才可能被（重新）写入，因此阶段结束后重新计算
+        return fingerprint('dependencies', pip_fp, hash_optional_file(requirements_path), params['mirror'],
+                           params.get('no_wheelhouse', False), wheelhouse_dir, lock_path and hash_optional_file(lock_path), staging,
+                           params.get('no_parallel_install', False))
+
+    deps_fp = _deps_fp()
+    # 仓库中已有相同依赖的目录树时直接硬链接过来，跳过 get-pip.py、pip 与所有下载
+    target_tag = get_target_tag(params['python_version'], params['arch'])
+    store_key = fingerprint('store', deps_fp, target_tag) if params.get('store') else None
+    store_hit = store_key is not None and not params.get('relock') and load_tree(store_key) is not None
+    launcher_fp = fingerprint(
+        'launcher', params['app_folder'], params['main_script'], params['python_version'], params['arch'],
+        hash_optional_file(requirements_path), hash_optional_file(params['icon']), params.get('no_window', False),
+        params.get('optimize') or 0, params.get('compile_launcher', False) or stub_source_digest(), params.get('pack', False),
+        params.get('warm', False) and (list(params.get('warm_preload') or ()), params.get('warm_idle_timeout') or DEFAULT_IDLE_TIMEOUT)
+    )
+
+    # 预判哪些阶段会被跳过，避免为它们做无用的预取
+    runtime_fresh = not force and is_stage_fresh(manifest, 'runtime', runtime_fp, [python_exe])
+    # 暂存模式下不运行 bootstrap_pip，清单中没有它的记录
+    pip_fresh = runtime_fresh and (staging or is_stage_fresh(manifest, 'bootstrap_pip', pip_fp))
+    deps_fresh = pip_fresh and is_stage_fresh(manifest, 'dependencies', deps_fp)
+    launcher_fresh = not force and is_stage_fresh(manifest, 'launcher', launcher_fp, [exe_path])
+
+    # --- 阶段: 获取嵌入式 Python ---
+    def _runtime(_):
+        _, ran = run_stage(
+            project_dir, manifest, 'runtime', runtime_fp,
+            lambda: get_python_runtime(
+                version=params['python_version'],
+                arch=params['arch'],
+                project_dir=project_dir,
+                offline=offline,
+                use_cache=not params.get('no_cache', False),
+                cache_max_size_mb=params.get('cache_max_size'),
+                jobs=params.get('jobs')
+            ),
+            force=force, outputs=[python_exe]
+        )
+        if not os.path.exists(python_embed_path):
+            click.secho("Embedded Python is missing. Aborting.", fg='red', bold=True); sys.exit(1)
+        return ran
+
+    # --- 阶段: 预先下载 get-pip.py（与运行时获取并行） ---
+    def _get_pip(_):
+        return None if pip_fresh or staging or store_hit else fetch_get_pip(offline=offline)
+
+    # --- 阶段: 预取目标平台的 wheel（与运行时获取并行，失败时由依赖安装阶段补齐） ---
+    def _wheels(_):
+        if deps_fresh or store_hit or wheelhouse_dir is None or offline:
+            return None
+        click.secho("Prefetching wheels for the target into the wheelhouse...", fg='cyan')
+        fetched = fill_wheelhouse(wheelhouse_dir, params['python_version'], params['arch'], packages=BUILD_ESSENTIALS, mirror=params['mirror'])
+        if fetched and lock_fresh:
+            # 锁文件已给出完整的依赖集合，无需解析
+            fetched = fill_wheelhouse(wheelhouse_dir, params['python_version'], params['arch'], requirements_path=lock_path,
+                                      mirror=params['mirror'], pip_args=["--no-deps"])
+        elif fetched and os.path.exists(requirements_path):
+            fetched = fill_wheelhouse(wheelhouse_dir, params['python_version'], params['arch'], requirements_path=requirements_path, mirror=params['mirror'])
+        if not fetched:
+            click.secho("Prefetch incomplete; missing wheels will be fetched with the target interpreter.", fg='yellow')
+        return None
+
+    # --- 阶段: 安装 pip（依赖运行时） ---
+    def _pip(results):
+        if staging or store_hit:
+            # 暂存模式下 pip 与构建工具由宿主 pip 直接放入 site-packages；命中仓库时随依赖一起恢复
+            return results['runtime']
+        _, ran = run_stage(
+            project_dir, manifest, 'bootstrap_pip', pip_fp,
+            lambda: bootstrap_pip(python_exe, work_dir=python_embed_path, mirror=params['mirror'], wheelhouse_dir=wheelhouse_dir,
+                                  offline=offline, get_pip_source=results['get_pip']),
+            force=force or results['runtime']
+        )
+        return ran or results['runtime']
+
+    # --- 阶段: 安装依赖（依赖 pip 与 requirements 文件内容） ---
+    def _install():
+        if store_hit:
+            if not restore_tree(store_key, python_embed_path, jobs=params.get('jobs')):
+                click.secho("The package store entry is incomplete or was modified and has been discarded. Run the build again.", fg='red', bold=True); sys.exit(1)
+            return
+        _install_packages()
+        if store_key:
+            save_tree(python_embed_path, [store_key, fingerprint('store', _deps_fp(), target_tag)], jobs=params.get('jobs'))
+
+    def _install_packages():
+        if staging:
+            if not stage_dependencies(os.path.join(python_embed_path, 'Lib', 'site-packages'), requirements_path, params['python_version'],
+                                      params['arch'], params['mirror'], wheelhouse_dir=wheelhouse_dir, offline=offline,
+                                      lock_path=lock_path, relock=params.get('relock', False),
+                                      parallel_install=not params.get('no_parallel_install'), jobs=params.get('jobs')):
+                click.secho("Failed to stage dependencies. Aborting.", fg='red', bold=True); sys.exit(1)
+            return
+        if not install_dependencies(python_exe, requirements_path, params['mirror'], wheelhouse_dir=wheelhouse_dir,
+                                    python_version=params['python_version'], arch=params['arch'], offline=offline,
+                                    lock_path=lock_path, relock=params.get('relock', False),
+                                    parallel_install=not params.get('no_parallel_install'), jobs=params.get('jobs')):
             click.secho("Failed to install dependencies. Aborting.", fg='red', bold=True); sys.exit(1)
-        if params['encrypt']:
-            encrypt_code(app_dir_path, delete_source=params['delete_source_on_encrypt'])
-        click.echo("\nAll preparations are complete. Starting final compilation...")
-        compile_launcher(
-            project_dir=params['project_dir'],
+
+    def _dependencies(results):
+        _, ran = run_stage(project_dir, manifest, 'dependencies', deps_fp, _install,
+                           force=force or params.get('relock', False) or results['bootstrap_pip'], post_fingerprint=_deps_fp)
+        return ran
+
+    # --- 阶段: 加密源码（只依赖源码本身与宿主 Python） ---
+    def _encrypt_fp():
+        return fingerprint('encrypt', hash_sources(app_dir_path), params['delete_source_on_encrypt'], sys.version)
+
+    def _encrypt(_):
+        run_stage(
+            project_dir, manifest, 'encrypt', _encrypt_fp(),
+            lambda: encrypt_code(app_dir_path, delete_source=params['delete_source_on_encrypt'], jobs=params.get('jobs')),
+            force=force, post_fingerprint=_encrypt_fp
+        )
+
+    # --- 阶段: 裁剪 site-packages（依赖安装完成之后） ---
+    prune_rules = params.get('prune_rules') or DEFAULT_PRUNE_RULES
+
+    def _slim(results):
+        slim_fp = fingerprint('slim', _deps_fp(), list(prune_rules), sorted(params.get('prune_glob') or ()), params.get('dedupe_binaries', False))
+        _, ran = run_stage(
+            project_dir, manifest, 'slim', slim_fp,
+            lambda: slim_bundle(
+                os.path.join(python_embed_path, 'Lib', 'site-packages'), rule_names=prune_rules,
+                custom_globs=params.get('prune_glob') or (), dedupe=params.get('dedupe_binaries', False),
+                python_version=params['python_version']
+            ),
+            force=force or results['dependencies']
+        )
+        return ran or results['dependencies']
+
+    # --- 阶段: 预编译字节码（依赖安装完成、源码加密完成之后） ---
+    def _bytecode_fp():
+        # 矩阵构建时由父进程统一计算源码哈希，各目标的 app 目录是其镜像
+        source_hashes = params.get('_source_hashes') or hash_sources(app_dir_path)
+        return fingerprint('bytecode', _deps_fp(), source_hashes, params.get('optimize') or 0,
+                           params.get('strip_sources', False), sorted(params.get('keep_source') or ()))
+
+    # 暂存模式下目标 python.exe 无法运行；宿主与目标的 major.minor 相同时 .pyc 可以通用
+    bytecode_python = python_exe
+    if staging:
+        same_version = tuple(int(p) for p in params['python_version'].split('.')[:2]) == sys.version_info[:2]
+        bytecode_python = sys.executable if same_version else None
+
+    def _bytecode(results):
+        if bytecode_python is None:
+            click.secho(f"Warning: Skipping --precompile; staged builds need a host Python {'.'.join(params['python_version'].split('.')[:2])} "
+                        "to write matching .pyc files.", fg='yellow')
+            return False
+        _, ran = run_stage(
+            project_dir, manifest, 'bytecode', _bytecode_fp(),
+            lambda: precompile_bytecode(
+                bytecode_python, app_dir_path, os.path.join(python_embed_path, 'Lib', 'site-packages'),
+                optimize=params.get('optimize') or 0, strip_sources=params.get('strip_sources', False),
+                keep_source_packages=params.get('keep_source') or (), jobs=params.get('jobs')
+            ),
+            force=force or results[site_packages_stage], post_fingerprint=_bytecode_fp
+        )
+        return ran
+
+    # --- 阶段: 把 app 与纯 Python 依赖打包成一个带索引的文件（字节码与加密完成之后） ---
+    pack_path = get_pack_path(project_dir)
+
+    def _pack_fp():
+        # app 目录中的 .pyc（含 __pycache__）也会被打包，它们变化时同样需要重新打包
+        return fingerprint('pack', _deps_fp(), hash_sources(app_dir_path, extensions=('.py', '.pyc', '.pyd'), skip_dirs=('build',)),
+                           params.get('precompile') and _bytecode_fp(), params.get('pack_compress', False),
+                           sorted(params.get('pack_exclude') or ()))
+
+    def _pack(results):
+        def _build():
+            build_pack(project_dir, params['app_folder'], os.path.join(python_embed_path, 'Lib', 'site-packages'),
+                       compress=params.get('pack_compress', False), exclude=params.get('pack_exclude') or (), jobs=params.get('jobs'))
+            install_importer(python_embed_path)
+
+        run_stage(project_dir, manifest, 'pack', _pack_fp(), _build,
+                  force=force or results[site_packages_stage] or results.get('bytecode', False),
+                  outputs=[pack_path, os.path.join(python_embed_path, 'pysuitcase_pack.py')], post_fingerprint=_pack_fp)
+
+    # --- 阶段: 编译图标资源 ---
+    def _resources(_):
+        # 预编译存根的图标直接在 exe 中替换，只有从 C 源码编译启动器时才需要 app.res
+        if launcher_fresh or not params.get('compile_launcher'):
+            return False
+        compile_resources(project_dir, params['icon'])
+        return True
+
+    # --- 阶段: 编译启动器（最后执行） ---
+    def _build_launcher(resources_ready):
+        preloads = []
+        if params.get('pack'):
+            preloads.append(pack_preload(project_dir, params['app_folder']))
+        if params.get('warm'):
+            # 在包文件的导入器之后、入口模块之前接管启动：预热进程自行安装导入器，冷启动则沿用已安装的
+            install_warm_client(python_embed_path)
+            preloads.append(warm_preload(project_dir, params['app_folder'], params['main_script'], params.get('warm_preload') or (),
+                                         params.get('warm_idle_timeout'), pack=params.get('pack', False)))
+        launcher_args = dict(
+            project_dir=project_dir,
             app_folder=params['app_folder'],
             main_script=params['main_script'],
             python_version=params['python_version'],
             arch=params['arch'],
             requirements_file=params['requirements_file'],
             icon_path=params['icon'],
-            no_window=params.get('no_window', False)
+            no_window=params.get('no_window', False),
+            optimize=params.get('optimize') or 0,
+            preload='; '.join(preloads) or None
         )
+        if not params.get('compile_launcher') and create_launcher(**launcher_args):
+            return
+        compile_launcher(resources_ready=resources_ready, **launcher_args)
+
+    def _launcher(results):
+        click.echo("\nAll preparations are complete. Starting final compilation...")
+        run_stage(project_dir, manifest, 'launcher', launcher_fp, lambda: _build_launcher(results['resources']),
+                  force=force, outputs=[exe_path] + ([get_warm_client_path(python_embed_path)] if params.get('warm') else []))
+
+    # --- 阶段: 写入内容清单（启动器完成之后），供增量更新包比较版本 ---
+    def _manifest(_):
+        write_file_manifest(project_dir, python_version=params['python_version'], arch=params['arch'], jobs=params.get('jobs'))
+
+    # --- 阶段: 归档整个项目目录（内容清单写入之后） ---
+    def _archive(_):
+        archive_bundle(project_dir, archive_format=params['archive'], jobs=params.get('jobs'),
+                       output_dir=params.get('_archive_dir'), archive_name=params.get('_archive_name'))
+
+    stages = [
+        Stage('runtime', _runtime),
+        Stage('get_pip', _get_pip),
+        Stage('wheels', _wheels),
+        Stage('bootstrap_pip', _pip, deps=['runtime', 'get_pip']),
+        Stage('dependencies', _dependencies, deps=['bootstrap_pip', 'wheels']),
+        Stage('resources', _resources),
+    ]
+    site_packages_stage = 'dependencies'
+    if params.get('prune'):
+        stages.append(Stage('slim', _slim, deps=['dependencies']))
+        site_packages_stage = 'slim'
+    launcher_deps = [site_packages_stage, 'resources']
+    if params['encrypt']:
+        stages.append(Stage('encrypt', _encrypt))
+        launcher_deps.append('encrypt')
+    if params.get('precompile'):
+        stages.append(Stage('bytecode', _bytecode, deps=[dep for dep in launcher_deps if dep != 'resources']))
+        launcher_deps.append('bytecode')
+    if params.get('pack'):
+        stages.append(Stage('pack', _pack, deps=[dep for dep in launcher_deps if dep != 'resources']))
+        launcher_deps.append('pack')
+    else:
+        remove_pack(project_dir, python_embed_path)
+    if not params.get('warm'):
+        remove_warm_client(python_embed_path)
+    stages.append(Stage('launcher', _launcher, deps=launcher_deps))
+    stages.append(Stage('manifest', _manifest, deps=['launcher']))
+    if params.get('archive'):
+        stages.append(Stage('archive', _archive, deps=['manifest']))
+    trace = reset_trace()
+    try:
+        run_stages(stages)
+    finally:
+        if params.get('trace'):
+            trace.write(params['trace'])
+            click.echo(f"Build trace written to {params['trace']} ({trace.bytes_downloaded / 1024 / 1024:.1f} MB downloaded).")
 
 def generate_reproducible_command(params):
     """根据参数生成可复现的命令行字符串。"""
@@ -75,7 +420,7 @@ def generate_reproducible_command(params):
     # 处理所有带值的选项
     valued_options = [
         'app_folder', 'main_script', 'requirements_file', 'python_version', 
-        'arch', 'icon', 'mirror'
+        'arch', 'icon', 'mirror', 'wheelhouse', 'cache_max_size', 'jobs', 'trace', 'optimize', 'archive'
     ]
     for key in valued_options:
         value = params.get(key)
@@ -90,6 +435,54 @@ def generate_reproducible_command(params):
         command.append(click.style('--delete-source-on-encrypt', fg='red', bold=True))
     if params.get('no_window'):
         command.append('--no-window')
+    if params.get('offline'):
+        command.append('--offline')
+    if params.get('no_cache'):
+        command.append('--no-cache')
+    if params.get('no_wheelhouse'):
+        command.append('--no-wheelhouse')
+    if params.get('no_lock'):
+        command.append('--no-lock')
+    if params.get('relock'):
+        command.append('--relock')
+    if params.get('no_parallel_install'):
+        command.append('--no-parallel-install')
+    if params.get('compile_launcher'):
+        command.append('--compile-launcher')
+    if params.get('stage_deps'):
+        command.append('--stage-deps')
+    if params.get('store'):
+        command.append('--store')
+    if params.get('force'):
+        command.append('--force')
+    if params.get('prune'):
+        command.append('--prune')
+    if params.get('prune_rules'):
+        command.append(f"--prune-rules {','.join(params['prune_rules'])}")
+    for pattern in params.get('prune_glob') or ():
+        command.append(f"--prune-glob {win_quote(pattern)}")
+    if params.get('dedupe_binaries'):
+        command.append('--dedupe-binaries')
+    if params.get('precompile'):
+        command.append('--precompile')
+    if params.get('pack'):
+        command.append('--pack')
+    if params.get('pack_compress'):
+        command.append('--pack-compress')
+    for package in params.get('pack_exclude') or ():
+        command.append(f"--pack-exclude {win_quote(package)}")
+    if params.get('warm'):
+        command.append('--warm')
+    for module in params.get('warm_preload') or ():
+        command.append(f"--warm-preload {module}")
+    if params.get('warm_idle_timeout') is not None:
+        command.append(f"--warm-idle-timeout {params['warm_idle_timeout']}")
+    for version, arch in params.get('target') or ():
+        command.append(f"--target {version}:{arch}")
+    if params.get('strip_sources'):
+        command.append('--strip-sources')
+    for package in params.get('keep_source') or ():
+        command.append(f"--keep-source {win_quote(package)}")
         
     return ' '.join(command)
 
@@ -131,6 +524,7 @@ def run_interactive_mode(params):
     params['no_window'] = click.confirm("Use windowless mode?", default=False)
 
     params['_is_interactive'] = True
+    _check_toolchain(params)
     execute_build(params)
     click.secho("\n🎉 PySuitcase packaging process completed successfully! 🎉", fg='cyan', bold=True)
     click.echo("\nTo run this again without interactive prompts, use the following command:")
@@ -141,6 +535,19 @@ def run_direct_mode(params):
     if params.get('encrypt') and (params.get('python_version') is not None or params.get('arch') is not None):
         click.secho("Error: When using --encrypt, you cannot specify --python-version or --arch.", fg='red', bold=True)
         click.secho("Encryption requires using the host's Python environment.", fg='yellow'); sys.exit(1)
+    if params.get('offline') and params.get('no_wheelhouse'):
+        click.secho("Error: --offline installs dependencies from the wheelhouse and cannot be combined with --no-wheelhouse.", fg='red', bold=True); sys.exit(1)
+    if (params.get('prune_rules') or params.get('prune_glob') or params.get('dedupe_binaries')) and not params.get('prune'):
+        click.secho("Error: --prune-rules, --prune-glob and --dedupe-binaries require --prune.", fg='red', bold=True); sys.exit(1)
+    if (params.get('optimize') or params.get('strip_sources') or params.get('keep_source')) and not params.get('precompile'):
+        click.secho("Error: --optimize, --strip-sources and --keep-source require --precompile.", fg='red', bold=True); sys.exit(1)
+    if (params.get('pack_compress') or params.get('pack_exclude')) and not params.get('pack'):
+        click.secho("Error: --pack-compress and --pack-exclude require --pack.", fg='red', bold=True); sys.exit(1)
+    if (params.get('warm_preload') or params.get('warm_idle_timeout') is not None) and not params.get('warm'):
+        click.secho("Error: --warm-preload and --warm-idle-timeout require --warm.", fg='red', bold=True); sys.exit(1)
+    _check_toolchain(params)
+    if params.get('pack') and not params.get('precompile'):
+        click.secho("Warning: --pack without --precompile compiles every packed module on each start; add --precompile.", fg='yellow')
     
     # 为直接模式填充默认值
     if params.get('app_folder') is None: params['app_folder'] = 'app'
@@ -148,10 +555,62 @@ def run_direct_mode(params):
     if params.get('requirements_file') is None: params['requirements_file'] = 'requirements.txt'
 
     click.echo("Running in direct mode...")
-    execute_build(params)
+    if params.get('target'):
+        run_matrix(params, params['target'], execute_build)
+    else:
+        execute_build(params)
     click.secho("\n🎉 PySuitcase packaging process completed successfully! 🎉", fg='cyan', bold=True)
 
-@click.command(context_settings=dict(ignore_unknown_options=True, help_option_names=['-h', '--help']))
+def _parse_prune_rules(ctx, param, value):
+    """把逗号分隔的规则集名称解析为元组并校验。"""
+    if value is None:
+        return None
+    rules = tuple(rule.strip() for rule in value.split(',') if rule.strip())
+    unknown = [rule for rule in rules if rule not in PRUNE_RULE_SETS]
+    if unknown:
+        raise click.BadParameter(f"unknown rule set(s): {', '.join(unknown)}. Choose from: {', '.join(PRUNE_RULE_SETS)}.")
+    return rules
+
+
+def _parse_targets(ctx, param, value):
+    """把多个 VERSION:ARCH 解析为 (版本, 架构) 列表并校验。"""
+    targets = []
+    for item in value:
+        try:
+            target = parse_target(item)
+        except ValueError as e:
+            raise click.BadParameter(str(e))
+        if target in targets:
+            raise click.BadParameter(f"target {item} is given more than once.")
+        targets.append(target)
+    return targets
+
+
+def _check_module_names(ctx, param, value):
+    """校验 --warm-preload 的模块名：它们会写进启动器的命令行，只允许点分标识符。"""
+    for module in value:
+        if not all(part.isidentifier() for part in module.split('.')):
+            raise click.BadParameter(f"'{module}' is not a dotted module name.")
+    return value
+
+
+class _DefaultBuildGroup(click.Group):
+    """未匹配到子命令时把参数交给 build 命令，保持 `pysuitcase PROJECT_DIR` 的原有用法。"""
+
+    def parse_args(self, ctx, args):
+        if not args or (args[0] not in self.commands and args[0] not in ctx.help_option_names):
+            args = ['build'] + list(args)
+        return super().parse_args(ctx, args)
+
+
+@click.group(cls=_DefaultBuildGroup, context_settings=dict(help_option_names=['-h', '--help']))
+def main():
+    """
+    将 Python 项目打包成独立的可执行文件。不指定子命令时执行 build。
+    """
+
+
+@main.command('build', context_settings=dict(ignore_unknown_options=True, help_option_names=['-h', '--help']))
 @click.argument('project_dir', type=click.Path(exists=True, file_okay=False, resolve_path=True), required=False)
 @click.option('--app-folder', default=None, help='Name of the folder containing your source code.')
 @click.option('--main-script', default=None, help='Name of the main script file.')
@@ -163,12 +622,49 @@ def run_direct_mode(params):
 @click.option('--encrypt', is_flag=True, help='Encrypt source code. Locks Python version to host version.')
 @click.option('--delete-source-on-encrypt', is_flag=True, help='[DANGEROUS] Delete .py source files after encryption.')
 @click.option('--no-window', is_flag=True, help='Use a windowless launcher for the final executable.')
+@click.option('--compile-launcher', is_flag=True, help='Compile the launcher from C source with cl.exe/rc.exe on every build instead of patching a prebuilt stub.')
+@click.option('--target', multiple=True, callback=_parse_targets, help='Build for VERSION:ARCH, e.g. 3.11.8:amd64 (repeatable; several targets build in parallel into dist/<VERSION>-<ARCH>/).')
+@click.option('--offline', is_flag=True, help='Never touch the network; use only locally cached runtimes and wheels.')
+@click.option('--no-cache', is_flag=True, help='Bypass the per-user runtime cache and always download.')
+@click.option('--cache-max-size', default=None, type=click.IntRange(min=0), help='Runtime cache size cap in MB (least recently used entries are evicted).')
+@click.option('--wheelhouse', default=None, type=click.Path(file_okay=False, resolve_path=True), help='Use this local directory of wheels instead of the shared wheelhouse (e.g. an air-gapped mirror).')
+@click.option('--no-wheelhouse', is_flag=True, help='Install dependencies with plain pip instead of the wheelhouse.')
+@click.option('--no-lock', is_flag=True, help='Resolve requirements on every dependency install instead of using a <requirements>.<target>.lock file.')
+@click.option('--relock', is_flag=True, help='Re-resolve the requirements and rewrite the lock file even if they did not change.')
+@click.option('--no-parallel-install', is_flag=True, help='Install locked wheels with pip one by one instead of unpacking them from the wheelhouse in parallel.')
+@click.option('--stage-deps', is_flag=True, help='Unpack target-platform wheels into site-packages with the host pip instead of running the target interpreter (always on off Windows).')
+@click.option('--store', is_flag=True, help='Deduplicate installed packages into the machine-wide content-addressed store and hardlink them into the project; installs that hit the store skip pip.')
+@click.option('--force', is_flag=True, help='Rebuild every stage even if its inputs are unchanged.')
+@click.option('--prune', is_flag=True, help='Remove files the app does not need at run time from site-packages and print a size report.')
+@click.option('--prune-rules', default=None, callback=_parse_prune_rules, help=f"Comma-separated rule sets for --prune ({', '.join(PRUNE_RULE_SETS)}; default: {','.join(DEFAULT_PRUNE_RULES)}).")
+@click.option('--prune-glob', multiple=True, help="Extra glob (relative to site-packages) removed by --prune; end with '/' to match a directory (repeatable).")
+@click.option('--dedupe-binaries', is_flag=True, help='With --prune, replace identical DLL/.pyd files with hardlinks.')
+@click.option('--precompile', is_flag=True, help='Precompile the app folder and site-packages to .pyc in parallel for faster first launch.')
+@click.option('--optimize', default=None, type=click.IntRange(0, 2), help='Bytecode optimization level for --precompile (like python -O/-OO).')
+@click.option('--strip-sources', is_flag=True, help='With --precompile, drop .py sources of third-party packages and keep only .pyc.')
+@click.option('--keep-source', multiple=True, help='Package whose sources --strip-sources must keep (repeatable).')
+@click.option('--pack', is_flag=True, help='Serve the app and pure-Python packages from one memory-mapped archive at startup instead of thousands of loose files.')
+@click.option('--pack-compress', is_flag=True, help='With --pack, store entries zlib-compressed (smaller, slightly slower to load).')
+@click.option('--pack-exclude', multiple=True, help='Top-level package that --pack must leave loose (repeatable).')
+@click.option('--warm', is_flag=True, help='Keep a pre-imported interpreter waiting in the background after the first launch so repeated launches skip interpreter start-up and imports.')
+@click.option('--warm-preload', multiple=True, callback=_check_module_names, help='Extra module the waiting interpreter imports ahead of time (repeatable).')
+@click.option('--warm-idle-timeout', default=None, type=click.IntRange(min=1), help=f'Seconds without launches before the background interpreter exits (default: {DEFAULT_IDLE_TIMEOUT}).')
+@click.option('--archive', default=None, type=click.Choice(ARCHIVE_FORMATS), help='Also pack the finished project folder into dist/<ProjectName>.<format> with a .sha256 file (multi-threaded).')
+@click.option('--trace', default=None, type=click.Path(dir_okay=False, resolve_path=True), help='Write a Chrome-trace JSON of stage timings, subprocess exit codes and download sizes.')
+@click.option('--jobs', '-j', default=None, type=click.IntRange(min=1), help='Number of parallel workers (default: all CPU cores).')
 @click.pass_context
-def main(ctx, **kwargs):
+def build(ctx, **kwargs):
     """
     将 PROJECT_DIR 中的 Python 项目打包成一个独立的可执行文件。
     """
     params = kwargs
+    if params.get('target'):
+        if params.get('project_dir') is None:
+            click.secho("Error: --target requires PROJECT_DIR.", fg='red', bold=True); sys.exit(1)
+        if params.get('python_version') is not None or params.get('arch') is not None:
+            click.secho("Error: --target cannot be combined with --python-version or --arch.", fg='red', bold=True); sys.exit(1)
+        if params.get('encrypt'):
+            click.secho("Error: --target cannot be combined with --encrypt (encryption is locked to the host Python).", fg='red', bold=True); sys.exit(1)
     host_python_version = f"{sys.version_info.major}.{sys.version_info.minor}.{sys.version_info.micro}"
     host_arch = 'amd64' if platform.architecture()[0] == '64bit' else 'win32'
     
@@ -185,3 +681,167 @@ def main(ctx, **kwargs):
         run_interactive_mode(params)
     else:
         run_direct_mode(params)
+
+
+@main.group('wheelhouse')
+def wheelhouse_group():
+    """
+    管理按目标 (Python 版本, 架构) 划分的共享 wheelhouse。
+    """
+
+
+@wheelhouse_group.command('prefill')
+@click.argument('project_dir', type=click.Path(exists=True, file_okay=False, resolve_path=True))
+@click.option('--app-folder', default='app', show_default=True, help='Name of the folder containing your source code.')
+@click.option('--requirements-file', default='requirements.txt', show_default=True, help='Name of the requirements file.')
+@click.option('--python-version', default=None, help='Target Python version (defaults to the host version).')
+@click.option('--arch', default=None, type=click.Choice(['amd64', 'win32', 'arm64']), help='Target architecture (defaults to the host architecture).')
+@click.option('--mirror', default=None, help='PyPI mirror URL.')
+@click.option('--wheelhouse', default=None, type=click.Path(file_okay=False, resolve_path=True), help='Fill this local directory instead of the shared wheelhouse.')
+def wheelhouse_prefill(project_dir, app_folder, requirements_file, python_version, arch, mirror, wheelhouse):
+    """
+    预先把 PROJECT_DIR 的依赖（以及 pip/setuptools/wheel）下载到 wheelhouse。
+    """
+    python_version = python_version or f"{sys.version_info.major}.{sys.version_info.minor}.{sys.version_info.micro}"
+    arch = arch or ('amd64' if platform.architecture()[0] == '64bit' else 'win32')
+    wheelhouse_dir = get_wheelhouse_dir(python_version, arch, override=wheelhouse)
+    requirements_path = os.path.join(project_dir, app_folder, requirements_file)
+    click.secho(f"Prefilling wheelhouse {wheelhouse_dir}...", fg='cyan', bold=True)
+
+    if not fill_wheelhouse(wheelhouse_dir, python_version, arch, packages=BUILD_ESSENTIALS, mirror=mirror):
+        sys.exit(1)
+    if os.path.exists(requirements_path):
+        if not fill_wheelhouse(wheelhouse_dir, python_version, arch, requirements_path=requirements_path, mirror=mirror):
+            sys.exit(1)
+    else:
+        click.secho(f"Warning: '{requirements_path}' not found. Only build essentials were fetched.", fg='yellow')
+    wheel_count = len([name for name in os.listdir(wheelhouse_dir) if name.endswith('.whl')])
+    click.secho(f"Wheelhouse ready with {wheel_count} wheels.", fg='green')
+
+
+@wheelhouse_group.command('prune')
+@click.option('--python-version', default=None, help='Target Python version (defaults to the host version).')
+@click.option('--arch', default=None, type=click.Choice(['amd64', 'win32', 'arm64']), help='Target architecture (defaults to the host architecture).')
+@click.option('--wheelhouse', default=None, type=click.Path(exists=True, file_okay=False, resolve_path=True), help='Prune this local directory instead of the shared wheelhouse.')
+@click.option('--max-age-days', default=None, type=click.IntRange(min=0), help='Remove wheels not used for this many days.')
+@click.option('--max-size', default=None, type=click.IntRange(min=0), help='Keep the wheelhouse under this size in MB (least recently used first).')
+@click.option('--keep-latest', is_flag=True, help='Keep only the most recently used wheel of each project.')
+def wheelhouse_prune(python_version, arch, wheelhouse, max_age_days, max_size, keep_latest):
+    """
+    清理 wheelhouse 中不再使用的 wheel。
+    """
+    python_version = python_version or f"{sys.version_info.major}.{sys.version_info.minor}.{sys.version_info.micro}"
+    arch = arch or ('amd64' if platform.architecture()[0] == '64bit' else 'win32')
+    wheelhouse_dir = get_wheelhouse_dir(python_version, arch, override=wheelhouse)
+    if max_age_days is None and max_size is None and not keep_latest:
+        click.secho("Nothing to do: pass --max-age-days, --max-size and/or --keep-latest.", fg='yellow')
+        return
+    removed = prune_wheelhouse(wheelhouse_dir, max_age_days=max_age_days, max_size_mb=max_size, keep_latest=keep_latest)
+    for name in removed:
+        click.echo(f"  - Removed {name}")
+    click.secho(f"Pruned {len(removed)} wheels from {wheelhouse_dir}.", fg='green')
+
+
+@main.group('store')
+def store_group():
+    """
+    管理在多个项目之间共享已安装文件的内容寻址仓库（build --store）。
+    """
+
+
+@store_group.command('status')
+def store_status_command():
+    """
+    显示仓库的大小、仍被项目使用的部分以及硬链接节省的空间。
+    """
+    status = store_status()
+    click.secho(f"Package store: {status['store_dir']}", fg='cyan', bold=True)
+    click.echo(f"  - Installed trees:      {status['trees']}")
+    click.echo(f"  - Stored files:         {status['objects']} ({status['size'] / 1024 / 1024:.1f} MB on disk)")
+    click.echo(f"  - Linked by projects:   {status['linked_objects']} files")
+    click.echo(f"  - Not linked anywhere:  {status['unlinked_size'] / 1024 / 1024:.1f} MB (reclaimable with 'store gc')")
+    click.secho(f"  - Saved by hardlinks:   {status['saved'] / 1024 / 1024:.1f} MB", fg='green')
+
+
+@store_group.command('gc')
+@click.option('--max-age-days', default=30, show_default=True, type=click.IntRange(min=0), help='Forget installed trees that no project links any more and that were last used this many days ago.')
+@click.option('--dry-run', is_flag=True, help='Only report what would be removed.')
+def store_gc(max_age_days, dry_run):
+    """
+    删除不再被任何项目硬链接、也不被保留的目录树引用的文件。
+    """
+    trees, objects, freed = gc_store(max_age_days=max_age_days, dry_run=dry_run)
+    verb = 'Would remove' if dry_run else 'Removed'
+    click.secho(f"{verb} {trees} installed trees and {objects} files ({freed / 1024 / 1024:.1f} MB).", fg='green')
+
+
+@main.command('profile-startup')
+@click.argument('project_dir', type=click.Path(exists=True, file_okay=False, resolve_path=True))
+@click.option('--app-folder', default='app', show_default=True, help='Name of the folder containing your source code.')
+@click.option('--main-script', default='app.py', show_default=True, help='Name of the main script file.')
+@click.option('--requirements-file', default='requirements.txt', show_default=True, help='Name of the requirements file.')
+@click.option('--python-version', default=None, help='Python version of the packaged runtime (detected from the project when only one is present).')
+@click.option('--arch', default=None, type=click.Choice(['amd64', 'win32', 'arm64']), help='Architecture of the packaged runtime (detected like --python-version).')
+@click.option('--python', 'python_exe', default=None, type=click.Path(exists=True, dir_okay=False, resolve_path=True), help='Profile with this interpreter instead of the embedded python.exe.')
+@click.option('--optimize', default=0, type=click.IntRange(0, 2), help='Run like a launcher built with --optimize.')
+@click.option('--cold-runs', default=3, show_default=True, type=click.IntRange(min=0), help='Runs with an empty bytecode cache.')
+@click.option('--repeats', default=5, show_default=True, type=click.IntRange(min=0), help='Warm runs after one untimed warm-up run.')
+@click.option('--top', default=20, show_default=True, type=click.IntRange(min=1), help='Number of imports shown in each ranking.')
+@click.option('--output', '-o', default=None, type=click.Path(dir_okay=False, resolve_path=True), help='Save the results as JSON.')
+@click.option('--compare', 'baseline', default=None, type=click.Path(exists=True, dir_okay=False, resolve_path=True), help='Diff against a JSON file saved by an earlier run.')
+@click.option('--max-regression', default=None, type=click.FloatRange(min=0), help='With --compare, exit with an error if startup got slower by more than this percentage.')
+def profile_startup(project_dir, app_folder, main_script, requirements_file, python_version, arch, python_exe,
+                    optimize, cold_runs, repeats, top, output, baseline, max_regression):
+    """
+    分析已打包应用的启动耗时：导入入口模块直到 run() 之前，统计冷/热启动耗时和最慢的导入。
+    """
+    if cold_runs == 0 and repeats == 0:
+        click.secho("Error: --cold-runs and --repeats cannot both be 0.", fg='red', bold=True)
+        sys.exit(1)
+    if max_regression is not None and not baseline:
+        click.secho("Error: --max-regression requires --compare.", fg='red', bold=True)
+        sys.exit(1)
+    if python_version is None or arch is None:
+        runtimes = [(v, a) for v, a in find_embedded_runtimes(project_dir)
+                    if python_version in (None, v) and arch in (None, a)]
+        if len(runtimes) == 1:
+            python_version, arch = runtimes[0]
+        elif python_exe is None:
+            found = ', '.join(f"{v} ({a})" for v, a in runtimes) or 'none'
+            click.secho(f"Error: cannot pick the packaged runtime (found: {found}). Pass --python-version and --arch.", fg='red', bold=True)
+            sys.exit(1)
+        else:
+            python_version = python_version or f"{sys.version_info.major}.{sys.version_info.minor}.{sys.version_info.micro}"
+            arch = arch or ('amd64' if platform.architecture()[0] == '64bit' else 'win32')
+
+    profile = build_profile(project_dir, app_folder, main_script, requirements_file, python_version, arch,
+                            python_exe=python_exe, optimize=optimize, cold_runs=cold_runs, repeats=repeats)
+    click.echo("\n-------------------------------------")
+    click.secho("Startup profile (up to run()):", fg='green', bold=True)
+    print_profile_report(profile, top=top)
+
+    if output:
+        write_profile(output, profile)
+        click.secho(f"Profile saved to {output}", fg='green')
+    if baseline:
+        change = compare_profiles(load_profile(baseline), profile, top=top)
+        if max_regression is not None and change is not None and change > max_regression:
+            click.secho(f"Startup regressed by {change:.1f}% (allowed: {max_regression:.1f}%).", fg='red', bold=True)
+            sys.exit(1)
+
+
+@main.command('diff')
+@click.argument('old_dir', type=click.Path(exists=True, file_okay=False, resolve_path=True))
+@click.argument('new_dir', type=click.Path(exists=True, file_okay=False, resolve_path=True))
+@click.option('--output', '-o', default=None, type=click.Path(dir_okay=False, resolve_path=True), help='Path of the update package (default: NEW_DIR/dist/<ProjectName>-update-<old>-to-<new>.zip).')
+@click.option('--no-binary-diff', is_flag=True, help='Ship changed files whole instead of as binary patches.')
+@click.option('--jobs', '-j', default=None, type=click.IntRange(min=1), help='Number of parallel workers (default: all CPU cores).')
+def diff(old_dir, new_dir, output, no_binary_diff, jobs):
+    """
+    比较两次构建 OLD_DIR 与 NEW_DIR，生成只包含变化部分的增量更新包。
+    """
+    click.secho(f"Creating update package from '{old_dir}' to '{new_dir}'...", fg='cyan', bold=True)
+    package = create_delta(old_dir, new_dir, output_path=output, binary_diff=not no_binary_diff, jobs=jobs)
+    if package:
+        click.echo("\nUsers apply it from the application folder with the bundled interpreter, e.g.:")
+        click.echo(f"  python-<version>-embed-<arch>\\python.exe {os.path.basename(package)}")
@@ -1,11 +1,16 @@
 import base64
 import click
+import hashlib
 import os
 import shutil
 import subprocess
 import sys
+import sysconfig
 import glob
 
+from .cache import get_cache_dir
+from .runner import run_command
+
 try:
     import importlib.resources as pkg_resources
 except ImportError:
@@ -26,8 +31,87 @@ def is_pyqt5_project(project_dir, app_folder, requirements_file):
         return False
     return False
 
-def encrypt_code(app_dir_path, delete_source=False):
-    """使用 Cython 将 app 目录下的 .py 文件编译为 .pyd 文件。"""
+def _cython_version():
+    try:
+        import Cython
+        return Cython.__version__
+    except ImportError:
+        return None
+
+
+def _qualified_module_name(py_file):
+    """按 Cython 的规则（父目录含 __init__.py 即为包）推导模块的完整名称。"""
+    directory, filename = os.path.split(os.path.abspath(py_file))
+    parts = [os.path.splitext(filename)[0]]
+    while os.path.exists(os.path.join(directory, '__init__.py')):
+        directory, package = os.path.split(directory)
+        parts.insert(0, package)
+    if parts[-1] == '__init__':
+        parts.pop()
+    return '.'.join(parts)
+
+
+def _module_cache_key(py_file):
+    """模块缓存键：源码内容 + 模块全名 + Cython/Python/编译器版本。"""
+    digest = hashlib.sha256()
+    with open(py_file, 'rb') as f:
+        digest.update(f.read())
+    for part in (_qualified_module_name(py_file), _cython_version(), sys.version,
+                 sysconfig.get_config_var('EXT_SUFFIX'), os.environ.get('VCToolsVersion')):
+        digest.update(b'\0' + str(part).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _compiled_outputs(py_file):
+    """返回某个 .py 文件就地编译后的 .c 与扩展模块路径。"""
+    stem = os.path.splitext(py_file)[0]
+    return stem + '.c', stem + sysconfig.get_config_var('EXT_SUFFIX')
+
+
+def _store_compiled_module(cache_dir, key, py_file):
+    """把新编译的 .c 和扩展模块原子地存入 Cython 缓存。"""
+    c_file, ext_file = _compiled_outputs(py_file)
+    if not os.path.exists(ext_file):
+        return
+    entry_dir = os.path.join(cache_dir, key)
+    tmp_dir = f"{entry_dir}.tmp-{os.getpid()}"
+    os.makedirs(tmp_dir, exist_ok=True)
+    shutil.copy2(ext_file, os.path.join(tmp_dir, os.path.basename(ext_file)))
+    if os.path.exists(c_file):
+        shutil.copy2(c_file, os.path.join(tmp_dir, os.path.basename(c_file)))
+    try:
+        os.replace(tmp_dir, entry_dir)
+    except OSError:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def _restore_compiled_module(cache_dir, key, py_file):
+    """缓存命中时把扩展模块复制到源码旁边，返回是否命中。"""
+    _, ext_file = _compiled_outputs(py_file)
+    cached_ext = os.path.join(cache_dir, key, os.path.basename(ext_file))
+    if not os.path.exists(cached_ext):
+        return False
+    shutil.copy2(cached_ext, ext_file)
+    return True
+
+
+def build_script_source(py_files, jobs):
+    """
+    生成 Cython 编译脚本。nthreads > 1 时 cythonize 使用进程池，Windows 以 spawn 方式启动的子进程会重新导入该脚本，
+    因此 setup() 必须位于 __main__ 判断之内，否则每个子进程都会再次执行构建，进程池随之崩溃。
+    """
+    files_repr = repr([f.replace('\\', '/') for f in py_files])
+    return f"""# This file is auto-generated by pysuitcase.
+from setuptools import setup
+from Cython.Build import cythonize
+
+if __name__ == '__main__':
+    setup(ext_modules=cythonize({files_repr}, language_level='3', quiet=True, nthreads={jobs}))
+"""
+
+
+def encrypt_code(app_dir_path, delete_source=False, jobs=None):
+    """使用 Cython 将 app 目录下的 .py 文件编译为 .pyd 文件。按模块缓存编译结果，未命中的模块并行编译。"""
     click.echo("\n-------------------------------------")
     click.secho("Encrypting source code with Cython...", fg='cyan', bold=True)
     all_py_files = glob.glob(os.path.join(app_dir_path, '**', '*.py'), recursive=True)
@@ -39,63 +123,136 @@ def encrypt_code(app_dir_path, delete_source=False):
     click.echo("Found python files to compile:")
     for py_file in files_to_compile:
         click.echo(f"  - {os.path.basename(py_file)}")
-        
-    files_repr = repr([f.replace('\\', '/') for f in files_to_compile])
 
-    build_script_content = f"""
-# This file is auto-generated by pysuitcase.
-from setuptools import setup
-from Cython.Build import cythonize
-setup(ext_modules=cythonize({files_repr}, language_level='3', quiet=True))
-"""
-    build_script_path = os.path.join(app_dir_path, 'pysuitcase_build.py')
-    with open(build_script_path, 'w', encoding='utf-8') as f:
-        f.write(build_script_content)
+    # --- 查询模块缓存 ---
+    cache_dir = get_cache_dir('cython')
+    keys = {py_file: _module_cache_key(py_file) for py_file in files_to_compile}
+    misses = [py_file for py_file in files_to_compile if not _restore_compiled_module(cache_dir, keys[py_file], py_file)]
+    hits = len(files_to_compile) - len(misses)
+    click.secho(f"Cython cache: {hits} hits, {len(misses)} misses.", fg='green' if not misses else 'cyan')
 
-    compile_command = [sys.executable, 'pysuitcase_build.py', 'build_ext', '--inplace']
-    click.echo(f"Running compilation command: {' '.join(compile_command)}")
-    
-    try:
-        process = subprocess.run(compile_command, cwd=app_dir_path, check=True, capture_output=True, text=True, encoding='mbcs', errors='ignore')
-        click.echo(process.stdout)
-    except subprocess.CalledProcessError as e:
-        click.secho("Cython compilation failed!", fg='red', bold=True)
-        click.echo(e.stdout); click.secho(e.stderr, fg='red'); os.remove(build_script_path); sys.exit(1)
+    if misses:
+        jobs = min(jobs or os.cpu_count() or 1, len(misses))
+        build_script_path = os.path.join(app_dir_path, 'pysuitcase_build.py')
+        with open(build_script_path, 'w', encoding='utf-8') as f:
+            f.write(build_script_source(misses, jobs))
+
+        # cythonize 的 nthreads 并行生成 C 代码，build_ext -j 并行调用 C 编译器
+        compile_command = [sys.executable, 'pysuitcase_build.py', 'build_ext', '--inplace', '-j', str(jobs)]
+        click.echo(f"Running compilation command: {' '.join(compile_command)}")
+
+        try:
+            run_command(compile_command, cwd=app_dir_path, label='cython')
+        except subprocess.CalledProcessError as e:
+            click.secho(f"Cython compilation failed! (exit code {e.returncode})", fg='red', bold=True)
+            os.remove(build_script_path); sys.exit(1)
+
+        for py_file in misses:
+            _store_compiled_module(cache_dir, keys[py_file], py_file)
+        os.remove(build_script_path)
 
     click.echo("Cleaning up build files...")
-    os.remove(build_script_path)
     shutil.rmtree(os.path.join(app_dir_path, 'build'), ignore_errors=True)
-    
-    for c_file in glob.glob(os.path.join(app_dir_path, '*.c')):
-        os.remove(c_file)
+    for py_file in files_to_compile:
+        c_file, _ = _compiled_outputs(py_file)
+        if os.path.exists(c_file):
+            os.remove(c_file)
     
     if delete_source:
         click.secho("Deleting source files and __pycache__ folders as requested...", fg='red')
         for py_file in files_to_compile:
             if os.path.basename(py_file) != '__init__.py' and os.path.exists(py_file):
                 os.remove(py_file)
-        for cache_dir in glob.glob(os.path.join(app_dir_path, '**/__pycache__'), recursive=True):
-            shutil.rmtree(cache_dir, ignore_errors=True)
+        for pycache_dir in glob.glob(os.path.join(app_dir_path, '**/__pycache__'), recursive=True):
+            shutil.rmtree(pycache_dir, ignore_errors=True)
         click.secho("Source files deleted.", fg='red')
     else:
         click.secho("Original source files have been kept.", fg='green')
+    return {'hits': hits, 'misses': len(misses)}
+
+
+# 依赖自身源码运行的包（例如 TorchScript 需要读取函数源码），剥离源码时默认保留
+SOURCE_REQUIRED_PACKAGES = ('torch', 'torchvision', 'torchaudio', 'pip', 'setuptools')
+
+
+def _split_site_packages(site_packages, keep_packages):
+    """把 site-packages 的顶层条目分为需保留源码的和可剥离源码的两组。"""
+    keep = {name.lower() for name in keep_packages}
+    kept, strippable = [], []
+    for entry in sorted(os.listdir(site_packages)):
+        path = os.path.join(site_packages, entry)
+        name, ext = os.path.splitext(entry)
+        if entry == '__pycache__' or ext in ('.dist-info', '.egg-info', '.data'):
+            continue
+        if os.path.isfile(path) and ext != '.py':
+            continue
+        (kept if name.lower() in keep else strippable).append(path)
+    return kept, strippable
+
+
+def _strip_package_sources(paths):
+    """删除已有旧式 .pyc 对应的 .py 源码以及 __pycache__，返回删除的文件数。"""
+    removed = 0
+    for path in paths:
+        if os.path.isfile(path):
+            walker = [(os.path.dirname(path), [], [os.path.basename(path)])]
+        else:
+            walker = os.walk(path)
+        for dirpath, dirnames, filenames in walker:
+            if '__pycache__' in dirnames:
+                shutil.rmtree(os.path.join(dirpath, '__pycache__'), ignore_errors=True)
+                dirnames.remove('__pycache__')
+            for name in filenames:
+                if name.endswith('.py') and os.path.exists(os.path.join(dirpath, name + 'c')):
+                    os.remove(os.path.join(dirpath, name))
+                    removed += 1
+    return removed
 
 
-def compile_launcher(project_dir, app_folder, main_script, python_version, arch, requirements_file, icon_path=None, no_window=False):
-    """根据选择编译 C 语言启动器，支持标准控制台模式和无窗口模式。"""
+def precompile_bytecode(python_exe_path, app_dir_path, site_packages, optimize=0, strip_sources=False, keep_source_packages=(), jobs=None):
+    """
+    用目标解释器并行预编译 app 目录与 site-packages，生成 unchecked-hash 的 .pyc，首次启动无需再编译。
+    strip_sources 时第三方包改为生成与源码同目录的旧式 .pyc 并删除 .py 源码。
+    """
     click.echo("\n-------------------------------------")
-    if no_window:
-        click.secho("Compiling Advanced (Windowless) C Launcher...", fg='cyan', bold=True)
-    else:
-        click.secho("Compiling Simple & Reliable C Launcher...", fg='cyan', bold=True)
+    click.secho(f"Precompiling bytecode (optimization level {optimize})...", fg='cyan', bold=True)
+    # 通过 -O/-OO 运行 compileall 以生成对应优化级别的 .pyc，兼容不支持 compileall -o 的旧版本
+    base_command = [python_exe_path] + ['-O'] * optimize + [
+        '-m', 'compileall', '-q', '-j', str(jobs or 0), '--invalidation-mode', 'unchecked-hash',
+    ]
+    keep = tuple(SOURCE_REQUIRED_PACKAGES) + tuple(keep_source_packages)
+    regular_targets, legacy_targets = [app_dir_path], []
+    if os.path.isdir(site_packages):
+        if strip_sources:
+            kept, strippable = _split_site_packages(site_packages, keep)
+            regular_targets += kept
+            legacy_targets = strippable
+        else:
+            regular_targets.append(site_packages)
 
-    if not shutil.which("cl.exe") or not shutil.which("rc.exe"):
-        click.secho("Error: 'cl.exe' or 'rc.exe' not found.", fg='red', bold=True)
+    for targets, legacy in ((regular_targets, False), (legacy_targets, True)):
+        if not targets:
+            continue
+        command = base_command + (['-b'] if legacy else []) + targets
+        click.echo(f"Running compileall on {len(targets)} path(s){' (sourceless layout)' if legacy else ''}...")
+        try:
+            run_command(command, label='compileall')
+        except subprocess.CalledProcessError as e:
+            # 个别第三方文件（如测试样例中的语法错误）无法编译不应中断打包
+            click.secho(f"Warning: compileall reported errors (exit code {e.returncode}).", fg='yellow')
+
+    if legacy_targets:
+        removed = _strip_package_sources(legacy_targets)
+        click.secho(f"Removed {removed} third-party .py sources (kept: {', '.join(keep)}).", fg='green')
+    click.secho("Bytecode precompiled successfully.", fg='green')
+
+
+def compile_resources(project_dir, icon_path=None):
+    """用 rc.exe 把图标编译为 app.res，可以与其他构建阶段并行执行。"""
+    if not shutil.which("rc.exe"):
+        click.secho("Error: 'rc.exe' not found.", fg='red', bold=True)
         click.secho("Please run pysuitcase from a 'Developer Command Prompt for VS'.", fg='yellow'); sys.exit(1)
-    
-    click.echo("Found 'cl.exe' and 'rc.exe'.")
 
-    # --- 资源文件处理 ---
     with pkg_resources.path('pysuitcase.templates', 'default.ico') as default_icon_p:
         if icon_path and os.path.exists(icon_path):
             final_icon_path = icon_path
@@ -106,10 +263,24 @@ def compile_launcher(project_dir, app_folder, main_script, python_version, arch,
     with pkg_resources.path('pysuitcase.templates', 'resource.rc') as rc_template_p:
         shutil.copy(rc_template_p, os.path.join(project_dir, 'resource.rc'))
     rc_command = ["rc.exe", "/fo", "app.res", "resource.rc"]
-    subprocess.run(rc_command, cwd=project_dir, check=True, capture_output=True)
-    
-    # --- 1. 构建智能 Python 载荷 ---
-    python_folder = f"python-{python_version}-embed-{arch}"
+    run_command(rc_command, cwd=project_dir, label='rc.exe')
+    return os.path.join(project_dir, 'app.res')
+
+
+def launcher_environment(project_dir, app_folder, python_version, arch, requirements_file):
+    """启动应用前需要设置的环境变量（路径相对于 app 目录）。"""
+    environment = {}
+    if is_pyqt5_project(project_dir, app_folder, requirements_file):
+        python_folder = f"python-{python_version}-embed-{arch}"
+        environment['QT_QPA_PLATFORM_PLUGIN_PATH'] = os.path.join('..', python_folder, 'Lib', 'site-packages', 'PyQt5', 'Qt5', 'plugins')
+    return environment
+
+
+def build_launcher_payload(project_dir, app_folder, main_script, python_version, arch, requirements_file, run_entry=True, preload=None):
+    """
+    生成启动器在 app 目录中执行的 Python 载荷；run_entry=False 时只导入主模块而不调用 run()。
+    preload 是导入主模块之前执行的语句（例如安装 --pack 的导入器）。
+    """
     module_name = main_script.replace('.py', '')
 
     py_payload_lines = [
@@ -117,17 +288,44 @@ def compile_launcher(project_dir, app_folder, main_script, python_version, arch,
         "sys.path.append(os.getcwd())",
     ]
 
-    if is_pyqt5_project(project_dir, app_folder, requirements_file):
-        # 计算相对路径，并为 Python 字符串正确转义
-        qt_plugin_path = os.path.join('..', python_folder, 'Lib', 'site-packages', 'PyQt5', 'Qt5', 'plugins').replace('\\', '\\\\')
-        py_payload_lines.append(f"os.environ['QT_QPA_PLATFORM_PLUGIN_PATH'] = r'{qt_plugin_path}'")
-
-    py_payload_lines.extend([
-        f"import {module_name}",
-        f"{module_name}.run()"
-    ])
+    for name, value in launcher_environment(project_dir, app_folder, python_version, arch, requirements_file).items():
+        # 为 Python 字符串正确转义
+        escaped_value = value.replace('\\', '\\\\')
+        py_payload_lines.append(f"os.environ['{name}'] = r'{escaped_value}'")
+
+    if preload:
+        py_payload_lines.append(preload)
+    py_payload_lines.append(f"import {module_name}")
+    if run_entry:
+        py_payload_lines.append(f"{module_name}.run()")
+    return "; ".join(py_payload_lines)
+
+
+def compile_launcher(project_dir, app_folder, main_script, python_version, arch, requirements_file, icon_path=None, no_window=False, resources_ready=False, optimize=0,
+                     preload=None):
+    """
+    根据选择编译 C 语言启动器，支持标准控制台模式和无窗口模式。resources_ready 表示 app.res 已由 compile_resources 生成。
+    optimize 与预编译的优化级别一致，使解释器加载对应的 .opt-N.pyc。
+    """
+    click.echo("\n-------------------------------------")
+    if no_window:
+        click.secho("Compiling Advanced (Windowless) C Launcher...", fg='cyan', bold=True)
+    else:
+        click.secho("Compiling Simple & Reliable C Launcher...", fg='cyan', bold=True)
+
+    if not shutil.which("cl.exe") or not shutil.which("rc.exe"):
+        click.secho("Error: 'cl.exe' or 'rc.exe' not found.", fg='red', bold=True)
+        click.secho("Please run pysuitcase from a 'Developer Command Prompt for VS'.", fg='yellow'); sys.exit(1)
+    
+    click.echo("Found 'cl.exe' and 'rc.exe'.")
+
+    # --- 资源文件处理 ---
+    if not resources_ready:
+        compile_resources(project_dir, icon_path)
     
-    py_payload = "; ".join(py_payload_lines)
+    # --- 1. 构建智能 Python 载荷 ---
+    python_folder = f"python-{python_version}-embed-{arch}"
+    py_payload = build_launcher_payload(project_dir, app_folder, main_script, python_version, arch, requirements_file, preload=preload)
     encoded_payload = base64.b64encode(py_payload.encode()).decode()
     
     # --- 2. 构建简化的命令行 ---
@@ -135,7 +333,8 @@ def compile_launcher(project_dir, app_folder, main_script, python_version, arch,
     python_exe_path = os.path.join('..', python_folder, 'python.exe')
     
     # 最终的命令行现在非常简单
-    final_command = f'{python_exe_path} -u -c "{python_exec_code}"'
+    optimize_flag = (' -' + 'O' * optimize) if optimize else ''
+    final_command = f'{python_exe_path} -u{optimize_flag} -c "{python_exec_code}"'
     click.echo(f"Launcher will execute from '{app_folder}': {final_command}")
 
     # --- 3. 为 C 语言模板准备数据 ---
@@ -165,11 +364,9 @@ def compile_launcher(project_dir, app_folder, main_script, python_version, arch,
     
     click.echo(f"Running C compiler for {exe_name} with {subsystem}...")
     try:
-        process = subprocess.run(cl_command, cwd=project_dir, check=True, capture_output=True, encoding='mbcs', errors='ignore')
+        run_command(cl_command, cwd=project_dir, label='cl.exe')
     except subprocess.CalledProcessError as e:
-        click.secho("C compiler failed with an error:", fg='red', bold=True)
-        click.echo(e.stdout)
-        click.secho(e.stderr, fg='red')
+        click.secho(f"C compiler failed with an error (exit code {e.returncode}).", fg='red', bold=True)
         sys.exit(1)
 
     # --- 5. 清理 ---
@@ -0,0 +1,256 @@
+import click
+import json
+import mmap
+import os
+import struct
+import tempfile
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from .archiver import ARCHIVE_EXCLUDES, collect_files
+from .cache import hash_file, tree_digest, write_json_atomic
+
+try:
+    import importlib.resources as pkg_resources
+except ImportError:
+    import importlib_resources as pkg_resources
+
+# 以下常量需与 templates/pysuitcase_delta.py 保持一致
+DELTA_FORMAT_VERSION = 1
+DELTA_INDEX_NAME = 'delta.json'
+MANIFEST_NAME = 'pysuitcase-manifest.json'
+MANIFEST_FORMAT_VERSION = 1
+PATCH_MAGIC = b'PSDELTA1'
+
+# 清单不包含自身以及更新过程中的临时文件
+MANIFEST_EXCLUDES = ARCHIVE_EXCLUDES + [MANIFEST_NAME, '*.pysuitcase-new', '*.pysuitcase-old*']
+
+# 不小于此大小的变更文件尝试生成二进制补丁，补丁不超过新文件的这一比例时才采用
+MIN_PATCH_FILE_SIZE = 256 * 1024
+MAX_PATCH_RATIO = 0.5
+
+_NEEDLE = 64                    # 在旧文件中查找的最短匹配片段
+_MAX_STEP = 64 * 1024           # 连续未命中时向前跳跃的最大步长
+_NEAR_RADIUS = 64 * 1024
+_SEARCH_RADIUS = 16 * 1024 * 1024  # 只在预期位置附近查找，避免每次扫描整个旧文件
+_COMPARE_BLOCK = 1024 * 1024
+
+
+def build_file_manifest(root, project=None, python_version=None, arch=None, jobs=None):
+    """并行计算目录中每个发布文件的 SHA-256，返回内容清单（digest 为整个构建的摘要）。"""
+    entries = [(arcname, path, size) for arcname, path, size in collect_files(root, MANIFEST_EXCLUDES) if size is not None]
+    with ThreadPoolExecutor(max_workers=jobs or os.cpu_count() or 1) as executor:
+        hashes = list(executor.map(hash_file, [path for _, path, _ in entries]))
+    files = {arcname: {'sha256': sha256, 'size': size} for (arcname, _, size), sha256 in zip(entries, hashes)}
+    return {
+        'format': MANIFEST_FORMAT_VERSION,
+        'project': project or os.path.basename(os.path.normpath(root)),
+        'python_version': python_version,
+        'arch': arch,
+        'digest': tree_digest({path: entry['sha256'] for path, entry in files.items()}),
+        'files': files,
+    }
+
+
+def write_file_manifest(project_dir, python_version=None, arch=None, jobs=None):
+    """清单阶段：为构建产物写入 pysuitcase-manifest.json，随应用一起分发，供增量更新校验版本。"""
+    click.echo("\n-------------------------------------")
+    click.secho("Writing content manifest...", fg='cyan', bold=True)
+    manifest = build_file_manifest(project_dir, python_version=python_version, arch=arch, jobs=jobs)
+    write_json_atomic(os.path.join(project_dir, MANIFEST_NAME), manifest)
+    total = sum(entry['size'] for entry in manifest['files'].values())
+    click.secho(f"Hashed {len(manifest['files'])} files ({total / 1024 / 1024:.1f} MB), build digest {manifest['digest'][:12]}.", fg='green')
+    return manifest['digest']
+
+
+def load_file_manifest(root, jobs=None):
+    """读取目录中的内容清单；没有清单（旧版本构建）时现场计算。"""
+    try:
+        with open(os.path.join(root, MANIFEST_NAME), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('format') == MANIFEST_FORMAT_VERSION and 'files' in manifest:
+            return manifest
+    except (OSError, ValueError):
+        pass
+    click.secho(f"No manifest in '{root}'; hashing its files...", fg='yellow')
+    return build_file_manifest(root, jobs=jobs)
+
+
+# --- 二进制补丁 ---
+
+def _match_length(old, old_pos, new, new_pos):
+    """返回从 old_pos / new_pos 开始两边相同的字节数：先按 1 MB 整块比较，再在不同的块内二分。"""
+    limit = min(len(old) - old_pos, len(new) - new_pos)
+    length = 0
+    while length < limit:
+        size = min(_COMPARE_BLOCK, limit - length)
+        if old[old_pos + length:old_pos + length + size] == new[new_pos + length:new_pos + length + size]:
+            length += size
+            continue
+        low, high = 0, size
+        while low < high:
+            middle = (low + high + 1) // 2
+            if old[old_pos + length:old_pos + length + middle] == new[new_pos + length:new_pos + length + middle]:
+                low = middle
+            else:
+                high = middle - 1
+        return length + low
+    return length
+
+
+def _backward_length(old, old_pos, new, new_pos, limit):
+    """返回 old_pos / new_pos 之前两边相同的字节数（不超过 limit）。"""
+    limit = min(limit, old_pos, new_pos)
+    low, high = 0, limit
+    while low < high:
+        middle = (low + high + 1) // 2
+        if old[old_pos - middle:old_pos] == new[new_pos - middle:new_pos]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def _locate(old, needle, expected):
+    """在旧文件中查找片段：先看预期位置本身，再由近及远扩大范围，优先命中原位修改后的延续部分。"""
+    if old[expected:expected + len(needle)] == needle:
+        return expected
+    for radius in (_NEAR_RADIUS, _SEARCH_RADIUS):
+        found = old.find(needle, max(0, expected - radius), min(len(old), expected + radius + len(needle)))
+        if found >= 0:
+            return found
+    return -1
+
+
+def diff_files(old_path, new_path, patch_path, max_size=None):
+    """
+    生成把 old_path 变为 new_path 的补丁，写入 patch_path：COPY 引用旧文件中相同的片段，INSERT 携带新数据。
+    在旧文件预期位置附近查找新文件的片段，命中后向前后扩展，未命中时逐步加大步长跳过新内容。
+    补丁超过 max_size 时放弃并返回 None，否则返回补丁大小。
+    """
+    with open(old_path, 'rb') as old_file, open(new_path, 'rb') as new_file, open(patch_path, 'wb') as out:
+        if os.path.getsize(old_path) == 0 or os.path.getsize(new_path) == 0:
+            return None
+        with mmap.mmap(old_file.fileno(), 0, access=mmap.ACCESS_READ) as old, \
+                mmap.mmap(new_file.fileno(), 0, access=mmap.ACCESS_READ) as new:
+            out.write(PATCH_MAGIC)
+            written = len(PATCH_MAGIC)
+            new_size, old_size = len(new), len(old)
+            literal_start = position = shift = 0
+            step = _NEEDLE
+
+            while position + _NEEDLE <= new_size:
+                # shift 为上一次匹配中旧文件与新文件的偏移差，据此推算当前片段在旧文件中的预期位置
+                expected = min(max(position + shift, 0), old_size)
+                found = _locate(old, new[position:position + _NEEDLE], expected)
+                if found < 0:
+                    position += step
+                    step = min(step * 2, _MAX_STEP)
+                    continue
+                length = _match_length(old, found, new, position)
+                back = _backward_length(old, found, new, position, position - literal_start)
+                if position - back > literal_start:
+                    literal = new[literal_start:position - back]
+                    out.write(b'I' + struct.pack('<Q', len(literal)))
+                    out.write(literal)
+                    written += 9 + len(literal)
+                out.write(b'C' + struct.pack('<QQ', found - back, length + back))
+                written += 17
+                if max_size is not None and written > max_size:
+                    return None
+                shift = found - position
+                position += length
+                literal_start = position
+                step = _NEEDLE
+
+            if literal_start < new_size:
+                literal = new[literal_start:new_size]
+                out.write(b'I' + struct.pack('<Q', len(literal)))
+                out.write(literal)
+                written += 9 + len(literal)
+            out.write(b'E')
+            written += 1
+    if max_size is not None and written > max_size:
+        return None
+    return written
+
+
+def _diff_task(old_path, new_path, patch_path):
+    """进程池任务：生成补丁，不划算时删除补丁文件。"""
+    size = diff_files(old_path, new_path, patch_path, max_size=int(os.path.getsize(new_path) * MAX_PATCH_RATIO))
+    if size is None and os.path.exists(patch_path):
+        os.remove(patch_path)
+    return size
+
+
+def create_delta(old_dir, new_dir, output_path=None, binary_diff=True, jobs=None):
+    """
+    比较两次构建的内容清单，生成只包含新增/变化文件（大文件尽量用二进制补丁）的更新包。
+    更新包是一个可直接执行的 zip：__main__.py 即应用脚本，打包的 python.exe 可以直接运行它。
+    返回更新包路径。
+    """
+    old_manifest = load_file_manifest(old_dir, jobs=jobs)
+    new_manifest = load_file_manifest(new_dir, jobs=jobs)
+    old_files, new_files = old_manifest['files'], new_manifest['files']
+    if old_manifest['digest'] == new_manifest['digest']:
+        click.secho("The two builds are identical; no update package needed.", fg='yellow')
+        return None
+
+    added = [path for path in new_files if path not in old_files]
+    changed = [path for path in new_files if path in old_files and new_files[path]['sha256'] != old_files[path]['sha256']]
+    removed = sorted(path for path in old_files if path not in new_files)
+    candidates = [path for path in changed if binary_diff and new_files[path]['size'] >= MIN_PATCH_FILE_SIZE]
+
+    project = new_manifest.get('project') or os.path.basename(os.path.normpath(new_dir))
+    if output_path is None:
+        output_path = os.path.join(new_dir, 'dist', f"{project}-update-{old_manifest['digest'][:8]}-to-{new_manifest['digest'][:8]}.zip")
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+
+    click.secho(f"Diffing {len(changed)} changed files ({len(candidates)} large enough for binary patches), "
+                f"{len(added)} new, {len(removed)} removed...", fg='cyan')
+    with tempfile.TemporaryDirectory(prefix='pysuitcase-delta-') as work_dir:
+        patches = {}
+        if candidates:
+            with ProcessPoolExecutor(max_workers=min(jobs or os.cpu_count() or 1, len(candidates))) as executor:
+                futures = {
+                    path: executor.submit(_diff_task, os.path.join(old_dir, *path.split('/')), os.path.join(new_dir, *path.split('/')),
+                                          os.path.join(work_dir, f"{index}.bin"))
+                    for index, path in enumerate(candidates)
+                }
+                for index, path in enumerate(candidates):
+                    if futures[path].result() is not None:
+                        patches[path] = os.path.join(work_dir, f"{index}.bin")
+
+        index = {
+            'format': DELTA_FORMAT_VERSION,
+            'project': project,
+            'from': old_manifest['digest'],
+            'to': new_manifest['digest'],
+            'files': {},
+            'patched': {},
+            'removed': {path: old_files[path]['sha256'] for path in removed},
+            'manifest': new_manifest,
+        }
+        full_size = sum(new_files[path]['size'] for path in added + changed)
+        tmp_path = output_path + '.partial'
+        with zipfile.ZipFile(tmp_path, 'w', compression=zipfile.ZIP_DEFLATED) as bundle:
+            apply_script = (pkg_resources.files('pysuitcase.templates') / 'pysuitcase_delta.py').read_text(encoding='utf-8')
+            bundle.writestr('__main__.py', apply_script)
+            for path in sorted(added + changed):
+                if path in patches:
+                    entry_name = f"patches/{len(index['patched'])}.bin"
+                    bundle.write(patches[path], entry_name)
+                    index['patched'][path] = {'from': old_files[path]['sha256'], 'to': new_files[path]['sha256'], 'patch': entry_name}
+                else:
+                    bundle.write(os.path.join(new_dir, *path.split('/')), 'files/' + path)
+                    index['files'][path] = new_files[path]['sha256']
+            bundle.writestr(DELTA_INDEX_NAME, json.dumps(index, indent=1, sort_keys=True))
+        os.replace(tmp_path, output_path)
+
+    bundle_size = os.path.getsize(output_path)
+    total_size = sum(entry['size'] for entry in new_files.values())
+    click.secho(f"Update package: {output_path}", fg='green', bold=True)
+    click.echo(f"  {len(index['files'])} files shipped whole, {len(index['patched'])} patched, {len(removed)} removed.")
+    click.echo(f"  {bundle_size / 1024 / 1024:.1f} MB to download (changed files: {full_size / 1024 / 1024:.1f} MB, "
+               f"full build: {total_size / 1024 / 1024:.1f} MB).")
+    return output_path
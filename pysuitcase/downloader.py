@@ -0,0 +1,264 @@
+import click
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .cache import hash_file, write_json_atomic
+from .trace import get_trace
+
+CHUNK_SIZE = 1024 * 1024
+# 不小于此大小且服务器支持 Range 的文件分段并行下载
+SEGMENT_THRESHOLD = 16 * 1024 * 1024
+MIN_SEGMENT_SIZE = 4 * 1024 * 1024
+MAX_SEGMENTS = 8
+# 连续多少次没有任何进展的失败后放弃；每次重试前按指数退避等待
+MAX_ATTEMPTS = 5
+BACKOFF_SECONDS = 0.5
+TIMEOUT = (10, 60)  # (连接, 读取) 秒
+
+_RETRY_STATUS = (429, 500, 502, 503, 504)
+# 分段下载的进度每写入这么多字节保存一次，中断后从记录的位置续传
+_STATE_SAVE_INTERVAL = 8 * 1024 * 1024
+
+_session_lock = threading.Lock()
+_sessions = {}
+
+
+class DownloadError(Exception):
+    """下载失败：重试次数耗尽、服务器返回错误或校验和不符。"""
+
+
+class _RangeIgnored(Exception):
+    """服务器对 Range 请求返回了完整内容。"""
+
+
+class _Incomplete(Exception):
+    """连接提前结束，收到的数据少于预期。"""
+
+
+_TRANSIENT_ERRORS = (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError, _Incomplete)
+
+
+def get_session():
+    """返回本进程共享的 HTTP 会话：连接池复用 TCP/TLS 连接，建立连接失败与 429/5xx 响应自动退避重试。"""
+    pid = os.getpid()
+    with _session_lock:
+        session = _sessions.get(pid)
+        if session is None:
+            retry = Retry(total=MAX_ATTEMPTS, backoff_factor=BACKOFF_SECONDS, status_forcelist=_RETRY_STATUS, raise_on_status=False)
+            adapter = HTTPAdapter(pool_connections=8, pool_maxsize=MAX_SEGMENTS * 2, max_retries=retry)
+            session = requests.Session()
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            session.headers['User-Agent'] = 'pysuitcase'
+            # 按原始字节下载，Content-Length 与 Range 偏移才与文件大小一致
+            session.headers['Accept-Encoding'] = 'identity'
+            _sessions[pid] = session
+    return session
+
+
+def _is_transient(error):
+    if isinstance(error, requests.HTTPError):
+        return error.response is not None and error.response.status_code in _RETRY_STATUS
+    return isinstance(error, _TRANSIENT_ERRORS)
+
+
+def _backoff(attempt):
+    time.sleep(BACKOFF_SECONDS * 2 ** (attempt - 1))
+
+
+def _probe(session, url):
+    """HEAD 请求获取文件大小以及服务器是否支持 Range；获取不到时返回 (None, False)。"""
+    try:
+        response = session.head(url, allow_redirects=True, timeout=TIMEOUT)
+        response.raise_for_status()
+    except requests.RequestException:
+        return None, False
+    length = response.headers.get('Content-Length')
+    size = int(length) if length and length.isdigit() else None
+    return size, size is not None and response.headers.get('Accept-Ranges', '').lower() == 'bytes'
+
+
+def _download_single(session, url, part_path, size, ranges_ok):
+    """单连接流式下载到 part_path；中途断开时从已写入的位置续传。返回 (本次传输的字节数, sha256)。"""
+    hasher = hashlib.sha256()
+    offset = 0
+    if ranges_ok and os.path.exists(part_path) and (size is None or os.path.getsize(part_path) <= size):
+        # 上次中断留下的部分文件：计入哈希后接着下载
+        with open(part_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                hasher.update(chunk)
+                offset += len(chunk)
+    transferred = attempt = 0
+    with open(part_path, 'r+b' if offset else 'wb') as f:
+        f.seek(offset)
+        f.truncate()
+        while size is None or offset < size:
+            received = 0
+            try:
+                headers = {'Range': f'bytes={offset}-'} if offset else {}
+                with session.get(url, stream=True, timeout=TIMEOUT, headers=headers) as response:
+                    if offset and response.status_code == 200:
+                        # 服务器不支持续传，从头开始
+                        f.seek(0)
+                        f.truncate()
+                        hasher, offset = hashlib.sha256(), 0
+                    response.raise_for_status()
+                    for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                        f.write(chunk)
+                        hasher.update(chunk)
+                        offset += len(chunk)
+                        received += len(chunk)
+                if size is None:
+                    break
+                if offset < size:
+                    raise _Incomplete(f"connection closed after {offset} of {size} bytes")
+            except (requests.RequestException, _Incomplete) as e:
+                transferred += received
+                attempt = 1 if received else attempt + 1
+                if not _is_transient(e) or attempt >= MAX_ATTEMPTS:
+                    raise DownloadError(f"Failed to download {url}: {e}") from e
+                if not ranges_ok:
+                    f.seek(0)
+                    f.truncate()
+                    hasher, offset = hashlib.sha256(), 0
+                click.secho(f"Download of {url} interrupted ({e}); retrying from byte {offset}...", fg='yellow')
+                _backoff(attempt)
+                continue
+            transferred += received
+    return transferred, hasher.hexdigest()
+
+
+def _load_state(state_path, url, size):
+    try:
+        with open(state_path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if state.get('url') != url or state.get('size') != size:
+        return None
+    return state
+
+
+def _download_segments(session, url, part_path, state_path, state, jobs):
+    """
+    按 state 中记录的区间并行下载，每个区间用各自的文件句柄写到对应偏移。
+    各区间的进度定期写入 state_path，中断后只下载尚未完成的部分。返回本次传输的字节数。
+    """
+    if not os.path.exists(part_path) or os.path.getsize(part_path) != state['size']:
+        with open(part_path, 'wb') as f:
+            f.truncate(state['size'])
+        for segment in state['segments']:
+            segment[2] = 0
+    lock = threading.Lock()
+    counters = {'transferred': 0, 'unsaved': 0}
+
+    def _save():
+        with lock:
+            snapshot = {'url': state['url'], 'size': state['size'], 'segments': [list(s) for s in state['segments']]}
+        write_json_atomic(state_path, snapshot)
+
+    def _fetch(segment):
+        start, end = segment[0], segment[1]
+        attempt = 0
+        with open(part_path, 'r+b') as f:
+            while start + segment[2] < end:
+                position = start + segment[2]
+                received = 0
+                try:
+                    headers = {'Range': f'bytes={position}-{end - 1}'}
+                    with session.get(url, stream=True, timeout=TIMEOUT, headers=headers) as response:
+                        if response.status_code == 200:
+                            raise _RangeIgnored()
+                        response.raise_for_status()
+                        f.seek(position)
+                        for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                            chunk = chunk[:end - position - received]
+                            f.write(chunk)
+                            received += len(chunk)
+                            with lock:
+                                segment[2] += len(chunk)
+                                counters['transferred'] += len(chunk)
+                                counters['unsaved'] += len(chunk)
+                                save = counters['unsaved'] >= _STATE_SAVE_INTERVAL
+                                if save:
+                                    counters['unsaved'] = 0
+                            if save:
+                                f.flush()
+                                _save()
+                    if start + segment[2] < end:
+                        raise _Incomplete(f"segment closed at byte {start + segment[2]} of {end}")
+                except (requests.RequestException, _Incomplete) as e:
+                    attempt = 1 if received else attempt + 1
+                    if not _is_transient(e) or attempt >= MAX_ATTEMPTS:
+                        raise DownloadError(f"Failed to download {url}: {e}") from e
+                    _backoff(attempt)
+
+    try:
+        pending = [segment for segment in state['segments'] if segment[0] + segment[2] < segment[1]]
+        with ThreadPoolExecutor(max_workers=max(1, min(jobs, len(pending)))) as executor:
+            for future in [executor.submit(_fetch, segment) for segment in pending]:
+                future.result()
+    finally:
+        _save()
+    return counters['transferred']
+
+
+def download_file(url, dest, sha256=None, segments=None, quiet=False):
+    """
+    把 url 下载到 dest：流式写入 dest.part，断线后用 HTTP Range 从断点续传，完成后校验并原子地替换为 dest。
+    大文件且服务器支持 Range 时分段并行下载（segments 指定段数，1 表示不分段）。
+    sha256 不符时删除下载结果并抛出 DownloadError。返回 dest。
+    """
+    part_path = dest + '.part'
+    state_path = part_path + '.json'
+    session = get_session()
+    started = time.perf_counter()
+    size, ranges_ok = _probe(session, url)
+
+    state = _load_state(state_path, url, size) if ranges_ok else None
+    if state is None and ranges_ok and segments != 1 and size >= SEGMENT_THRESHOLD:
+        count = segments or min(MAX_SEGMENTS, max(2, size // MIN_SEGMENT_SIZE))
+        bounds = [size * index // count for index in range(count + 1)]
+        state = {'url': url, 'size': size, 'segments': [[bounds[i], bounds[i + 1], 0] for i in range(count)]}
+        if os.path.exists(part_path):
+            os.remove(part_path)
+
+    digest = None
+    if state is not None:
+        try:
+            transferred = _download_segments(session, url, part_path, state_path, state, len(state['segments']))
+        except _RangeIgnored:
+            os.remove(state_path)
+            state = None
+            transferred, digest = _download_single(session, url, part_path, size, False)
+    else:
+        transferred, digest = _download_single(session, url, part_path, size, ranges_ok)
+    get_trace().add_download(url, transferred)
+
+    if size is not None and os.path.getsize(part_path) != size:
+        raise DownloadError(f"Downloaded {os.path.getsize(part_path)} bytes from {url}, expected {size}.")
+    if sha256:
+        actual = digest or hash_file(part_path)
+        if actual.lower() != sha256.lower():
+            os.remove(part_path)
+            if os.path.exists(state_path):
+                os.remove(state_path)
+            raise DownloadError(f"Checksum mismatch for {url}: expected sha256 {sha256}, got {actual}.")
+    os.replace(part_path, dest)
+    if os.path.exists(state_path):
+        os.remove(state_path)
+
+    if not quiet:
+        elapsed = time.perf_counter() - started
+        total = os.path.getsize(dest)
+        mode = f", {len(state['segments'])} segments" if state is not None else ''
+        click.echo(f"Downloaded {os.path.basename(dest)} ({total / 1024 / 1024:.1f} MB in {elapsed:.1f}s{mode}).")
+    return dest
@@ -0,0 +1,93 @@
+import click
+import hashlib
+import json
+import os
+import threading
+import time
+
+from .cache import hash_file, write_json_atomic
+
+# 记录每个构建阶段输入指纹的清单文件，位于项目根目录
+BUILD_MANIFEST_NAME = '.pysuitcase-build.json'
+BUILD_MANIFEST_VERSION = 1
+
+# 并发执行的阶段共享同一份清单，读写都需要加锁
+_manifest_lock = threading.Lock()
+
+
+def fingerprint(*parts):
+    """把任意可 JSON 序列化的输入组合成一个稳定的指纹。"""
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def hash_optional_file(path):
+    """文件存在时返回其 SHA-256，否则返回 None。"""
+    if path and os.path.isfile(path):
+        return hash_file(path)
+    return None
+
+
+def hash_sources(app_dir_path, extensions=('.py',), skip_dirs=('__pycache__', 'build')):
+    """计算 app 目录下所有源码文件的哈希，返回 {相对路径: 哈希}。"""
+    hashes = {}
+    for dirpath, dirnames, filenames in os.walk(app_dir_path):
+        dirnames[:] = [d for d in dirnames if d not in skip_dirs]
+        for name in filenames:
+            if name.endswith(extensions):
+                full_path = os.path.join(dirpath, name)
+                hashes[os.path.relpath(full_path, app_dir_path).replace(os.sep, '/')] = hash_file(full_path)
+    return hashes
+
+
+def load_build_manifest(project_dir):
+    """读取项目的构建清单；不存在、损坏或版本不符时返回空清单。"""
+    path = os.path.join(project_dir, BUILD_MANIFEST_NAME)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = None
+    if not isinstance(manifest, dict) or manifest.get('version') != BUILD_MANIFEST_VERSION:
+        manifest = {'version': BUILD_MANIFEST_VERSION, 'stages': {}}
+    return manifest
+
+
+def save_build_manifest(project_dir, manifest):
+    with _manifest_lock:
+        write_json_atomic(os.path.join(project_dir, BUILD_MANIFEST_NAME), manifest)
+
+
+def is_stage_fresh(manifest, name, stage_fingerprint, outputs=()):
+    """判断阶段的输入指纹是否与上次成功构建一致且产物仍然存在。"""
+    with _manifest_lock:
+        previous = manifest.get('stages', {}).get(name, {})
+    return previous.get('fingerprint') == stage_fingerprint and all(os.path.exists(p) for p in outputs)
+
+
+def run_stage(project_dir, manifest, name, stage_fingerprint, func, force=False, outputs=(), post_fingerprint=None):
+    """
+    若阶段的输入指纹与上次成功构建一致且产物仍然存在，则跳过该阶段；否则执行并记录新指纹。
+    post_fingerprint 可在阶段执行后重新计算指纹（例如阶段本身会修改自己的输入）。
+    返回 (阶段结果, 是否实际执行)，调用方据此让下游阶段一并重做。
+    """
+    if not force and is_stage_fresh(manifest, name, stage_fingerprint, outputs):
+        click.secho(f"\nSkipping stage '{name}' (inputs unchanged since last build).", fg='bright_black')
+        with _manifest_lock:
+            return manifest['stages'][name].get('result'), False
+
+    # 先作废旧记录，阶段中途失败时下次构建必然重做
+    with _manifest_lock:
+        manifest.setdefault('stages', {}).pop(name, None)
+    save_build_manifest(project_dir, manifest)
+
+    result = func()
+    record = {
+        'fingerprint': post_fingerprint() if post_fingerprint else stage_fingerprint,
+        'completed': time.time(),
+        'result': result if isinstance(result, (str, int, float, bool, type(None))) else None,
+    }
+    with _manifest_lock:
+        manifest.setdefault('stages', {})[name] = record
+    save_build_manifest(project_dir, manifest)
+    return result, True
@@ -0,0 +1,366 @@
+import base64
+import click
+import configparser
+import csv
+import hashlib
+import io
+import os
+import re
+import shutil
+import time
+import zipfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from email.parser import HeaderParser
+from urllib.parse import unquote, urlparse
+
+from .cache import hash_file
+from .lockfile import _canonical_name, locked_files
+from .wheelhouse import fill_wheelhouse
+
+try:
+    import pip._vendor.distlib as _distlib
+except ImportError:
+    _distlib = None
+
+INSTALLER_NAME = 'pysuitcase'
+# 单个解包任务最多负责的（解压后）字节数：大 wheel 拆成多个任务，耗时取决于核数与磁盘带宽而不是包的数量
+_TASK_BYTES = 32 * 1024 * 1024
+_COPY_CHUNK = 1024 * 1024
+# pip 自带的 distlib 入口点启动器（t64.exe、w64-arm.exe 等）按目标架构区分的后缀
+_LAUNCHER_SUFFIXES = {'amd64': '64', 'win32': '32', 'arm64': '64-arm'}
+# 启动器按相对于自身所在目录的路径找到解释器，项目目录整体移动后仍然可用
+_SHEBANG = '#!<launcher_dir>\\..\\{}\r\n'
+_SCRIPT_TEMPLATE = '''# -*- coding: utf-8 -*-
+import re
+import sys
+from {module} import {import_name}
+if __name__ == '__main__':
+    sys.argv[0] = re.sub(r'(-script\\.pyw|\\.exe)?$', '', sys.argv[0])
+    sys.exit({func}())
+'''
+# 启动器内嵌 zip 的固定时间戳，让相同的入口点每次生成相同的字节（增量更新包按哈希比较文件）
+_ZIP_DATE = (1980, 1, 1, 0, 0, 0)
+_SKIPPED_METADATA = ('RECORD', 'RECORD.jws', 'RECORD.p7s', 'INSTALLER')
+
+
+class WheelInstallError(Exception):
+    """wheel 无法由并行安装器处理（格式不支持、包之间文件冲突等），调用方应回退到 pip。"""
+
+
+def _record_hash(digest):
+    return 'sha256=' + base64.urlsafe_b64encode(digest).rstrip(b'=').decode('ascii')
+
+
+def _path_key(path):
+    # 目标是 Windows，文件名不区分大小写
+    return os.path.normpath(path).lower()
+
+
+def _entry_points(wheel_name, text):
+    """解析 entry_points.txt 中的 console_scripts 与 gui_scripts，返回 [(脚本名, 模块, 属性, 是否 GUI)]。"""
+    parser = configparser.ConfigParser(delimiters=('=',), interpolation=None)
+    parser.optionxform = str
+    try:
+        parser.read_string(text)
+    except configparser.Error as e:
+        raise WheelInstallError(f"{wheel_name} has an unreadable entry_points.txt ({e})")
+    scripts = []
+    for section, gui in (('console_scripts', False), ('gui_scripts', True)):
+        if not parser.has_section(section):
+            continue
+        for script, spec in parser.items(section):
+            match = re.match(r'^\s*([\w.]+)\s*:\s*([\w.]+)\s*(\[.*\])?\s*$', spec)
+            if not match or not re.match(r'^[\w.-]+$', script):
+                raise WheelInstallError(f"{wheel_name} declares an unsupported entry point '{script} = {spec}'")
+            scripts.append((script, match.group(1), match.group(2), gui))
+    return scripts
+
+
+def _plan_wheel(wheel_path, runtime_dir):
+    """读取 wheel 的目录与元数据（不解压文件内容），算出每个成员在运行时中的目标路径。"""
+    wheel_name = os.path.basename(wheel_path)
+    site_packages = os.path.join(runtime_dir, 'Lib', 'site-packages')
+    with zipfile.ZipFile(wheel_path) as zf:
+        infos = zf.infolist()
+        dist_infos = {info.filename.split('/', 1)[0] for info in infos if info.filename.split('/', 1)[0].endswith('.dist-info')}
+        if len(dist_infos) != 1:
+            raise WheelInstallError(f"{wheel_name} does not contain exactly one .dist-info directory")
+        dist_info = dist_infos.pop()
+        try:
+            wheel_meta = HeaderParser().parsestr(zf.read(f"{dist_info}/WHEEL").decode('utf-8'))
+            metadata = HeaderParser().parsestr(zf.read(f"{dist_info}/METADATA").decode('utf-8'))
+        except KeyError as e:
+            raise WheelInstallError(f"{wheel_name} is missing {e}")
+        try:
+            entry_points = zf.read(f"{dist_info}/entry_points.txt").decode('utf-8')
+        except KeyError:
+            entry_points = ''
+    if not (wheel_meta.get('Wheel-Version') or '').startswith('1.'):
+        raise WheelInstallError(f"{wheel_name} uses unsupported Wheel-Version {wheel_meta.get('Wheel-Version')}")
+    name = metadata.get('Name') or dist_info.split('-')[0]
+
+    data_dir = dist_info[:-len('.dist-info')] + '.data'
+    schemes = {
+        'purelib': site_packages,
+        'platlib': site_packages,
+        'scripts': os.path.join(runtime_dir, 'Scripts'),
+        'headers': os.path.join(runtime_dir, 'Include', name),
+        'data': runtime_dir,
+    }
+    members = []
+    script_members = set()
+    for info in infos:
+        if info.is_dir() or info.filename in (f"{dist_info}/{skipped}" for skipped in _SKIPPED_METADATA):
+            continue
+        parts = info.filename.split('/')
+        if '\\' in info.filename or ':' in info.filename or any(part in ('', '.', '..') for part in parts):
+            raise WheelInstallError(f"{wheel_name} contains an unsafe path '{info.filename}'")
+        if parts[0] == data_dir:
+            if len(parts) < 3 or parts[1] not in schemes:
+                raise WheelInstallError(f"{wheel_name} installs into an unsupported location '{info.filename}'")
+            dest = os.path.join(schemes[parts[1]], *parts[2:])
+            if parts[1] == 'scripts':
+                script_members.add(info.filename)
+        else:
+            dest = os.path.join(site_packages, *parts)
+        members.append((info.filename, dest, info.file_size))
+
+    scripts = [(os.path.join(runtime_dir, 'Scripts', f"{script}.exe"), module, attr, gui)
+               for script, module, attr, gui in _entry_points(wheel_name, entry_points)]
+    return {
+        'path': wheel_path, 'name': name, 'key': _canonical_name(name), 'dist_info': dist_info,
+        'members': members, 'scripts': scripts, 'size': sum(size for _, _, size in members),
+        'script_members': script_members, 'interpreter': os.path.join(runtime_dir, 'python.exe'),
+    }
+
+
+def _inspect(item, runtime_dir):
+    wheel_path, sha256 = item
+    if sha256 and hash_file(wheel_path) != sha256:
+        raise WheelInstallError(f"{os.path.basename(wheel_path)} does not match the hash in the lock file")
+    try:
+        return _plan_wheel(wheel_path, runtime_dir)
+    except (OSError, zipfile.BadZipFile, UnicodeDecodeError) as e:
+        raise WheelInstallError(f"cannot read {os.path.basename(wheel_path)} ({e})")
+
+
+def _installed(site_packages):
+    """已安装的发行包：{规范化名称: (dist-info 目录, RECORD 中列出的文件)}。"""
+    installed = {}
+    if not os.path.isdir(site_packages):
+        return installed
+    for entry in os.scandir(site_packages):
+        if not (entry.name.endswith('.dist-info') and entry.is_dir()):
+            continue
+        files = []
+        try:
+            with open(os.path.join(entry.path, 'RECORD'), 'r', encoding='utf-8', newline='') as f:
+                files = [os.path.normpath(os.path.join(site_packages, row[0])) for row in csv.reader(f) if row]
+        except OSError:
+            pass
+        installed[_canonical_name(entry.name.split('-')[0])] = (entry.path, files)
+    return installed
+
+
+def _remove_files(paths, stop_dir):
+    """删除文件，并自下而上删除因此变空的目录（不越过 stop_dir）。"""
+    parents = set()
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        parents.add(os.path.dirname(path))
+    stop_dir = os.path.normpath(stop_dir)
+    for parent in sorted(parents, key=len, reverse=True):
+        while len(parent) > len(stop_dir) and parent.startswith(stop_dir):
+            try:
+                os.rmdir(parent)
+            except OSError:
+                break
+            parent = os.path.dirname(parent)
+
+
+def _check_conflicts(plans, installed, site_packages):
+    """同一文件由两个包提供，或属于另一个已安装且不被替换的包时视为冲突。"""
+    owners = {}
+    keys = {plan['key'] for plan in plans}
+    for key, (_, files) in installed.items():
+        if key not in keys:
+            for path in files:
+                owners[_path_key(path)] = key
+    conflicts = []
+    seen = set()
+    for plan in plans:
+        if plan['key'] in seen:
+            raise WheelInstallError(f"{plan['name']} is given more than once")
+        seen.add(plan['key'])
+        for dest in [dest for _, dest, _ in plan['members']] + [dest for dest, _, _, _ in plan['scripts']]:
+            owner = owners.setdefault(_path_key(dest), plan['key'])
+            if owner != plan['key']:
+                conflicts.append(f"{os.path.relpath(dest, site_packages).replace(os.sep, '/')} ({owner} and {plan['key']})")
+    if conflicts:
+        more = f" and {len(conflicts) - 5} more" if len(conflicts) > 5 else ''
+        raise WheelInstallError(f"packages overwrite each other's files: {', '.join(conflicts[:5])}{more}")
+
+
+def _fix_shebang(line, interpreter):
+    """与 pip 相同：.data/scripts 中以 #!python 开头的首行改为指向运行时解释器的 shebang，其他首行原样保留。"""
+    if not line.startswith(b'#!python'):
+        return line
+    return b'#!' + os.fsencode(interpreter) + b'\r\n'
+
+
+def _extract(plan, members):
+    """解压一个 wheel 的一组成员，边写边计算 RECORD 所需的哈希。"""
+    written = []
+    with zipfile.ZipFile(plan['path']) as zf:
+        for member, dest, _ in members:
+            digest = hashlib.sha256()
+            size = 0
+            with zf.open(member) as src, open(dest, 'wb') as dst:
+                if member in plan['script_members']:
+                    line = _fix_shebang(src.readline(), plan['interpreter'])
+                    digest.update(line)
+                    dst.write(line)
+                    size += len(line)
+                for chunk in iter(lambda: src.read(_COPY_CHUNK), b''):
+                    digest.update(chunk)
+                    dst.write(chunk)
+                    size += len(chunk)
+            written.append((dest, _record_hash(digest.digest()), size))
+    return written
+
+
+def _tasks(plan):
+    """把一个 wheel 的成员按解压后大小切成若干任务。"""
+    tasks, chunk, chunk_size = [], [], 0
+    for member in sorted(plan['members'], key=lambda m: m[2], reverse=True):
+        if chunk and chunk_size + member[2] > _TASK_BYTES:
+            tasks.append((chunk_size, plan, chunk))
+            chunk, chunk_size = [], 0
+        chunk.append(member)
+        chunk_size += member[2]
+    if chunk:
+        tasks.append((chunk_size, plan, chunk))
+    return tasks
+
+
+def _launcher_bytes(kind, arch, cache):
+    name = f"{kind}{_LAUNCHER_SUFFIXES[arch]}.exe"
+    if name not in cache:
+        path = os.path.join(os.path.dirname(_distlib.__file__), name) if _distlib else None
+        if not path or not os.path.exists(path):
+            raise WheelInstallError(f"the entry point launcher {name} from pip's bundled distlib is not available")
+        with open(path, 'rb') as f:
+            cache[name] = f.read()
+    return cache[name]
+
+
+def _write_script(dest, module, attr, gui, launcher):
+    """生成与 pip 相同格式的入口点启动器：distlib 启动器 + shebang + 含 __main__.py 的 zip。"""
+    source = _SCRIPT_TEMPLATE.format(module=module, import_name=attr.split('.')[0], func=attr)
+    stream = io.BytesIO()
+    with zipfile.ZipFile(stream, 'w') as zf:
+        zf.writestr(zipfile.ZipInfo('__main__.py', date_time=_ZIP_DATE), source)
+    data = launcher + _SHEBANG.format('pythonw.exe' if gui else 'python.exe').encode('utf-8') + stream.getvalue()
+    with open(dest, 'wb') as f:
+        f.write(data)
+    return dest, _record_hash(hashlib.sha256(data).digest()), len(data)
+
+
+def _write_metadata(plan, written, site_packages):
+    """写入 INSTALLER 与列出全部已安装文件的 RECORD（路径相对于 site-packages）。"""
+    dist_info_dir = os.path.join(site_packages, plan['dist_info'])
+    installer_path = os.path.join(dist_info_dir, 'INSTALLER')
+    with open(installer_path, 'wb') as f:
+        f.write(f"{INSTALLER_NAME}\n".encode('ascii'))
+    written = written + [(installer_path, _record_hash(hashlib.sha256(f"{INSTALLER_NAME}\n".encode('ascii')).digest()), len(INSTALLER_NAME) + 1)]
+    rows = sorted((os.path.relpath(dest, site_packages).replace(os.sep, '/'), digest, size) for dest, digest, size in written)
+    rows.append((f"{plan['dist_info']}/RECORD", '', ''))
+    with open(os.path.join(dist_info_dir, 'RECORD'), 'w', encoding='utf-8', newline='') as f:
+        csv.writer(f, lineterminator='\n').writerows(rows)
+
+
+def install_wheels(runtime_dir, wheels, arch, jobs=None):
+    """
+    把一组已解析好的本地 wheel（[(路径, sha256 或 None)]）并行解包到运行时的 Lib/site-packages，
+    写入 RECORD 与 INSTALLER，并在 Scripts 中生成入口点启动器；同名包的旧版本先按其 RECORD 卸载。
+    wheel 无法处理或包之间有文件冲突时，在写入任何文件之前抛出 WheelInstallError。
+    """
+    site_packages = os.path.join(runtime_dir, 'Lib', 'site-packages')
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        plans = list(executor.map(lambda item: _inspect(item, runtime_dir), wheels))
+        installed = _installed(site_packages)
+        _check_conflicts(plans, installed, site_packages)
+        launchers = {}
+        scripts = [(plan, dest, module, attr, gui, _launcher_bytes('w' if gui else 't', arch, launchers))
+                   for plan in plans for dest, module, attr, gui in plan['scripts']]
+
+        for plan in plans:
+            if plan['key'] in installed:
+                dist_info_dir, files = installed[plan['key']]
+                _remove_files(files, site_packages)
+                shutil.rmtree(dist_info_dir, ignore_errors=True)
+        dest_dirs = {os.path.dirname(dest) for plan in plans for _, dest, _ in plan['members']}
+        dest_dirs.update(os.path.dirname(dest) for _, dest, _, _, _, _ in scripts)
+
+        # 最大的任务先开始，避免最后只剩一个大 wheel 在单线程解压
+        tasks = sorted((task for plan in plans for task in _tasks(plan)), key=lambda task: task[0], reverse=True)
+        try:
+            for directory in sorted(dest_dirs):
+                os.makedirs(directory, exist_ok=True)
+            results = list(executor.map(lambda task: _extract(task[1], task[2]), tasks))
+            written = {plan['key']: [] for plan in plans}
+            for (_, plan, _), files in zip(tasks, results):
+                written[plan['key']].extend(files)
+            for plan, dest, module, attr, gui, launcher in scripts:
+                written[plan['key']].append(_write_script(dest, module, attr, gui, launcher))
+            for plan in plans:
+                _write_metadata(plan, written[plan['key']], site_packages)
+        except (OSError, zipfile.BadZipFile, zlib.error) as e:
+            # 删除已写入的部分，避免 pip 回退时把残缺的包当作已安装
+            _remove_files([dest for plan in plans for _, dest, _ in plan['members']] + [dest for _, dest, _, _, _, _ in scripts], site_packages)
+            for plan in plans:
+                shutil.rmtree(os.path.join(site_packages, plan['dist_info']), ignore_errors=True)
+            raise WheelInstallError(f"unpacking failed ({e})")
+
+    total = sum(plan['size'] for plan in plans)
+    click.secho(f"Installed {len(plans)} packages ({sum(len(plan['members']) for plan in plans)} files, {total / 1024 / 1024:.1f} MB) "
+                f"in {time.perf_counter() - started:.1f}s.", fg='green')
+    return True
+
+
+def _wheel_path(wheelhouse_dir, url):
+    return os.path.join(wheelhouse_dir, unquote(os.path.basename(urlparse(url).path)))
+
+
+def install_locked(runtime_dir, lock_path, wheelhouse_dir, python_version, arch, mirror=None, offline=False, python_exe=None, jobs=None):
+    """
+    不运行 pip install，直接把锁文件中的 wheel 从 wheelhouse 并行安装到运行时；缺少的 wheel（非离线时）先用 pip 补齐。
+    成功返回 True；返回 False 时调用方应改用 pip（解包失败时已写入的文件会被删除）。
+    """
+    wheels = [(_wheel_path(wheelhouse_dir, url), sha256) for _, _, sha256, url in locked_files(lock_path)]
+    missing = [path for path, _ in wheels if not os.path.exists(path)]
+    if missing and not offline:
+        click.echo(f"{len(missing)} locked wheel(s) are not in the wheelhouse yet. Fetching them once...")
+        fill_wheelhouse(wheelhouse_dir, python_version, arch, lock_path, mirror=mirror, python_exe=python_exe,
+                        pip_args=["--no-deps", "--require-hashes"])
+        missing = [path for path, _ in wheels if not os.path.exists(path)]
+    if missing:
+        click.secho(f"{len(missing)} locked wheel(s) are missing from the wheelhouse; installing with pip instead.", fg='yellow')
+        return False
+
+    click.echo(f"Installing {len(wheels)} locked wheels from the wheelhouse in parallel...")
+    try:
+        install_wheels(runtime_dir, wheels, arch, jobs=jobs)
+    except WheelInstallError as e:
+        click.secho(f"The parallel installer cannot install this set: {e}. Installing with pip instead.", fg='yellow')
+        return False
+    # 与 pip 安装时一样更新被使用的 wheel 的时间戳，供 wheelhouse prune 判断
+    now = time.time()
+    for path, _ in wheels:
+        os.utime(path, (now, now))
+    return True
@@ -0,0 +1,274 @@
+import click
+import ctypes
+import hashlib
+import os
+import shutil
+import struct
+import subprocess
+import tempfile
+
+from .cache import get_cache_dir
+from .compiler import launcher_environment
+from .runner import run_command
+
+try:
+    import importlib.resources as pkg_resources
+except ImportError:
+    import importlib_resources as pkg_resources
+
+# 以下常量需与 templates/launcher-stub.c 保持一致
+CONFIG_MAGIC = b'PYSUITCASE-LAUNCHER-CFG1'
+CONFIG_SIZE = 4096
+
+_STUB_SOURCE = 'launcher-stub.c'
+_RT_ICON = 3
+_RT_GROUP_ICON = 14
+# 存根的 .rc 把默认图标放在中性语言下的 1 号图标组中
+_ICON_GROUP_ID = 1
+_ICON_LANGUAGE = 0
+_STUB_RC = 'LANGUAGE 0, 0\n1 ICON "app.ico"\n'
+# pysuitcase/stubs/ 中记录编译这些存根时 stub_source_digest() 的文件，由 tools/build_stubs.py 生成
+_SHIPPED_DIGEST = 'SOURCE_DIGEST'
+
+
+# --- 配置块 ---
+
+def encode_config(config):
+    """把配置编码为定长的配置块：魔数 + 若干以 NUL 结尾的 '键=值'，以空字符串结束，剩余部分补零。"""
+    blob = CONFIG_MAGIC + b'\0'
+    for key, value in config.items():
+        entry = f"{key}={value}".encode('utf-8')
+        if b'\0' in entry:
+            raise ValueError(f"Launcher setting {key!r} contains a NUL byte.")
+        blob += entry + b'\0'
+    blob += b'\0'
+    if len(blob) > CONFIG_SIZE:
+        raise ValueError(f"Launcher settings take {len(blob)} bytes; the stub reserves {CONFIG_SIZE}.")
+    return blob.ljust(CONFIG_SIZE, b'\0')
+
+
+def _config_offset(data):
+    offset = data.find(CONFIG_MAGIC + b'\0')
+    if offset < 0:
+        raise ValueError("No launcher config block found; this is not a pysuitcase launcher stub.")
+    if data.find(CONFIG_MAGIC + b'\0', offset + 1) >= 0:
+        raise ValueError("The launcher stub contains more than one config block.")
+    if offset + CONFIG_SIZE > len(data):
+        raise ValueError("The launcher config block is truncated.")
+    return offset
+
+
+def patch_stub(stub_data, config):
+    """返回写入了配置的存根副本；只改写配置块的 CONFIG_SIZE 个字节，其余字节保持不变。"""
+    offset = _config_offset(stub_data)
+    return stub_data[:offset] + encode_config(config) + stub_data[offset + CONFIG_SIZE:]
+
+
+def read_config(exe_data):
+    """读取启动器中的配置，返回 {键: 值}。"""
+    offset = _config_offset(exe_data)
+    block = exe_data[offset + len(CONFIG_MAGIC) + 1:offset + CONFIG_SIZE]
+    config = {}
+    for entry in block.split(b'\0'):
+        if not entry:
+            break
+        key, _, value = entry.decode('utf-8').partition('=')
+        config[key] = value
+    return config
+
+
+def build_launcher_config(app_folder, main_script, python_version, arch, optimize=0, environment=None, preload=None):
+    """启动器配置：app 目录、相对于 app 目录的解释器路径、解释器参数、入口模块与函数、导入前执行的语句，以及环境变量覆盖。"""
+    config = {
+        'app_folder': app_folder,
+        'python': os.path.join('..', f"python-{python_version}-embed-{arch}", 'python.exe').replace('/', '\\'),
+        'args': '-u' + (' -' + 'O' * optimize if optimize else ''),
+        'module': main_script.replace('.py', ''),
+        'function': 'run',
+    }
+    if preload:
+        config['preload'] = preload
+    for name, value in (environment or {}).items():
+        config[f"env:{name}"] = value
+    return config
+
+
+# --- 图标资源 ---
+
+def read_ico(path):
+    """解析 .ico 文件，返回 [(ICONDIRENTRY 前 12 字节, 图像数据)]。"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    reserved, kind, count = struct.unpack_from('<HHH', data, 0)
+    if reserved != 0 or kind != 1 or count == 0:
+        raise ValueError(f"'{path}' is not a valid .ico file.")
+    images = []
+    for index in range(count):
+        entry = data[6 + index * 16:6 + (index + 1) * 16]
+        if len(entry) < 16:
+            raise ValueError(f"'{path}' is truncated.")
+        size, offset = struct.unpack_from('<II', entry, 8)
+        image = data[offset:offset + size]
+        if len(image) != size:
+            raise ValueError(f"'{path}' is truncated.")
+        images.append((entry[:8], image))
+    return images
+
+
+def build_group_icon(images, first_id=1):
+    """生成 RT_GROUP_ICON 资源：与 .ico 头相同，但每项以 RT_ICON 资源 ID 代替文件偏移。"""
+    data = struct.pack('<HHH', 0, 1, len(images))
+    for index, (header, image) in enumerate(images):
+        data += header + struct.pack('<IH', len(image), first_id + index)
+    return data
+
+
+def set_icon(exe_path, icon_path):
+    """用 Win32 资源更新 API 直接替换 exe 中的图标组，无需 rc.exe / 重新链接。仅在 Windows 上可用。"""
+    images = read_ico(icon_path)
+    with pkg_resources.path('pysuitcase.templates', 'default.ico') as default_icon_p:
+        old_count = len(read_ico(default_icon_p))
+
+    kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+    kernel32.BeginUpdateResourceW.restype = ctypes.c_void_p
+    kernel32.BeginUpdateResourceW.argtypes = [ctypes.c_wchar_p, ctypes.c_int]
+    kernel32.UpdateResourceW.argtypes = [ctypes.c_void_p, ctypes.c_void_p, ctypes.c_void_p, ctypes.c_ushort, ctypes.c_char_p, ctypes.c_uint]
+    kernel32.EndUpdateResourceW.argtypes = [ctypes.c_void_p, ctypes.c_int]
+
+    handle = kernel32.BeginUpdateResourceW(exe_path, False)
+    if not handle:
+        raise ctypes.WinError(ctypes.get_last_error())
+    try:
+        for index, (_, image) in enumerate(images):
+            if not kernel32.UpdateResourceW(handle, _RT_ICON, index + 1, _ICON_LANGUAGE, image, len(image)):
+                raise ctypes.WinError(ctypes.get_last_error())
+        # 删除默认图标中多出来的图像
+        for icon_id in range(len(images) + 1, old_count + 1):
+            kernel32.UpdateResourceW(handle, _RT_ICON, icon_id, _ICON_LANGUAGE, None, 0)
+        group = build_group_icon(images)
+        if not kernel32.UpdateResourceW(handle, _RT_GROUP_ICON, _ICON_GROUP_ID, _ICON_LANGUAGE, group, len(group)):
+            raise ctypes.WinError(ctypes.get_last_error())
+    except BaseException:
+        kernel32.EndUpdateResourceW(handle, True)
+        raise
+    if not kernel32.EndUpdateResourceW(handle, False):
+        raise ctypes.WinError(ctypes.get_last_error())
+
+
+# --- 存根 ---
+
+def _stub_name(arch, no_window):
+    return f"launcher-{arch}{'-no-window' if no_window else ''}.exe"
+
+
+def stub_source_digest():
+    """存根源码、资源脚本与默认图标的摘要；它们变化时缓存的存根失效、启动器需重新生成。"""
+    digest = hashlib.sha256(_STUB_RC.encode('utf-8'))
+    templates = pkg_resources.files('pysuitcase.templates')
+    for name in (_STUB_SOURCE, 'default.ico'):
+        digest.update((templates / name).read_bytes())
+    return digest.hexdigest()
+
+
+def _shipped_stub(arch, no_window):
+    """
+    随 pysuitcase 发布的预编译存根（pysuitcase/stubs/，由 tools/build_stubs.py 交叉编译）。
+    不存在，或存根源码在编译之后又被修改过时返回 None。
+    """
+    stubs = pkg_resources.files('pysuitcase') / 'stubs'
+    stub, digest = stubs / _stub_name(arch, no_window), stubs / _SHIPPED_DIGEST
+    if not stub.is_file() or not digest.is_file():
+        return None
+    if digest.read_text(encoding='ascii').strip() != stub_source_digest():
+        click.secho("The shipped launcher stubs are older than templates/launcher-stub.c; ignoring them.", fg='yellow')
+        return None
+    return stub.read_bytes()
+
+
+def _compile_stub(arch, no_window, stub_path):
+    """用 rc.exe / cl.exe 编译一次存根并放入缓存；工具链不可用时返回 False。"""
+    if not shutil.which("cl.exe") or not shutil.which("rc.exe"):
+        return False
+    click.echo(f"Compiling the {'windowless' if no_window else 'console'} launcher stub once (cached for later builds)...")
+    templates = pkg_resources.files('pysuitcase.templates')
+    with tempfile.TemporaryDirectory(prefix='pysuitcase-stub-') as work_dir:
+        with open(os.path.join(work_dir, 'app.ico'), 'wb') as f:
+            f.write((templates / 'default.ico').read_bytes())
+        with open(os.path.join(work_dir, 'stub.rc'), 'w', encoding='utf-8') as f:
+            f.write(_STUB_RC)
+        with open(os.path.join(work_dir, _STUB_SOURCE), 'wb') as f:
+            f.write((templates / _STUB_SOURCE).read_bytes())
+        cl_command = ["cl.exe", "/nologo", "/O2", "/W3"] + (["/DPYSUITCASE_NO_WINDOW"] if no_window else []) + [
+            "/Festub.exe", _STUB_SOURCE, "stub.res", "User32.lib",
+            "/link", "/SUBSYSTEM:WINDOWS" if no_window else "/SUBSYSTEM:CONSOLE",
+        ]
+        try:
+            run_command(["rc.exe", "/fo", "stub.res", "stub.rc"], cwd=work_dir, label='rc.exe')
+            run_command(cl_command, cwd=work_dir, label='cl.exe')
+        except subprocess.CalledProcessError as e:
+            click.secho(f"Failed to compile the launcher stub (exit code {e.returncode}).", fg='yellow')
+            return False
+        tmp_path = f"{stub_path}.tmp-{os.getpid()}"
+        shutil.copyfile(os.path.join(work_dir, 'stub.exe'), tmp_path)
+        os.replace(tmp_path, stub_path)
+    return True
+
+
+def _cached_stub_path(arch, no_window):
+    # cl.exe 生成的是开发者命令提示符所选架构的程序，因此缓存键包含它
+    key = hashlib.sha256(f"{stub_source_digest()}|{os.environ.get('VSCMD_ARG_TGT_ARCH')}".encode('utf-8')).hexdigest()[:16]
+    return os.path.join(get_cache_dir('stubs'), f"{_stub_name(arch, no_window)[:-4]}-{key}.exe")
+
+
+def stub_available(arch, no_window):
+    """不编译任何东西地判断能否得到存根：随包发布的、缓存中已有的，或者本机有 cl.exe 与 rc.exe 可以编译。"""
+    if _shipped_stub(arch, no_window) is not None or os.path.exists(_cached_stub_path(arch, no_window)):
+        return True
+    return bool(shutil.which("cl.exe") and shutil.which("rc.exe"))
+
+
+def get_stub(arch, no_window):
+    """返回存根的字节：优先使用随包发布的，其次是本机缓存中编译过的，必要时编译一次。都不可用时返回 None。"""
+    data = _shipped_stub(arch, no_window)
+    if data is not None:
+        return data
+    stub_path = _cached_stub_path(arch, no_window)
+    if not os.path.exists(stub_path) and not _compile_stub(arch, no_window, stub_path):
+        return None
+    with open(stub_path, 'rb') as f:
+        return f.read()
+
+
+def create_launcher(project_dir, app_folder, main_script, python_version, arch, requirements_file, icon_path=None, no_window=False, optimize=0,
+                    preload=None):
+    """
+    复制预编译的存根、写入配置块并替换图标来生成启动器，不调用 C 编译器。
+    没有可用的存根时返回 False，由调用方退回到 compile_launcher。
+    """
+    click.echo("\n-------------------------------------")
+    click.secho(f"Creating the {'windowless' if no_window else 'console'} launcher from a prebuilt stub...", fg='cyan', bold=True)
+    stub = get_stub(arch, no_window)
+    if stub is None:
+        click.secho("No prebuilt launcher stub is available and it cannot be compiled here.", fg='yellow')
+        return False
+
+    environment = launcher_environment(project_dir, app_folder, python_version, arch, requirements_file)
+    config = build_launcher_config(app_folder, main_script, python_version, arch, optimize=optimize, environment=environment, preload=preload)
+    exe_path = os.path.join(project_dir, f"{os.path.basename(project_dir)}.exe")
+    tmp_path = f"{exe_path}.tmp-{os.getpid()}"
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(patch_stub(stub, config))
+        if icon_path and os.path.exists(icon_path):
+            if os.name == 'nt':
+                set_icon(tmp_path, icon_path)
+            else:
+                click.secho("Warning: Custom icons can only be embedded on Windows; the launcher keeps the default icon.", fg='yellow')
+        os.replace(tmp_path, exe_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    click.echo(f"Launcher will execute from '{app_folder}': {config['python']} {config['args']} (entry {config['module']}.{config['function']}())")
+    click.secho(f"\nSuccessfully created '{os.path.basename(exe_path)}' in {project_dir}", fg='green', bold=True)
+    return True
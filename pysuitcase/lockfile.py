@@ -0,0 +1,230 @@
+import click
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+from urllib.parse import unquote, urlparse
+
+from .cache import hash_file
+from .downloader import DownloadError, download_file
+from .incremental import fingerprint
+from .runner import run_command
+from .wheelhouse import _mirror_args, cross_platform_args, get_target_tag, report_missing_wheels
+
+# requirements 文件中会原样复制到锁文件的索引相关选项，安装时 pip 仍能找到同样的来源
+_INDEX_OPTIONS = ('-i', '--index-url', '--extra-index-url', '-f', '--find-links', '--trusted-host', '--no-index', '--prefer-binary')
+_NESTED_OPTIONS = ('-r', '--requirement', '-c', '--constraint')
+_FINGERPRINT_LINE = '# requirements-fingerprint: '
+
+
+def get_lock_path(lock_dir, requirements_path, python_version, arch):
+    """锁文件按目标区分，例如 requirements.cp311-win_amd64.lock。"""
+    stem = os.path.splitext(os.path.basename(requirements_path))[0]
+    return os.path.join(lock_dir, f"{stem}.{get_target_tag(python_version, arch)}.lock")
+
+
+def _split_option(line):
+    """把 '--opt value' / '--opt=value' / '-ovalue' 拆成 (选项, 值)；不是选项时返回 (None, None)。"""
+    if not line.startswith('-'):
+        return None, None
+    match = re.match(r'^(--[\w-]+|-\w)\s*=?\s*(.*)$', line)
+    return (match.group(1), match.group(2).strip()) if match else (line, '')
+
+
+def _requirement_lines(requirements_path):
+    """返回去掉注释与续行后的有效行。"""
+    with open(requirements_path, 'r', encoding='utf-8') as f:
+        content = f.read().replace('\\\n', ' ')
+    lines = []
+    for line in content.splitlines():
+        line = re.sub(r'(^|\s)#.*$', '', line).strip()
+        if line:
+            lines.append(line)
+    return lines
+
+
+def _requirement_files(requirements_path, seen=None):
+    """requirements 文件及其通过 -r/-c 引用的所有文件。"""
+    seen = seen if seen is not None else []
+    path = os.path.abspath(requirements_path)
+    if path in seen or not os.path.exists(path):
+        return seen
+    seen.append(path)
+    for line in _requirement_lines(path):
+        option, value = _split_option(line)
+        if option in _NESTED_OPTIONS and value:
+            _requirement_files(os.path.join(os.path.dirname(path), value), seen)
+    return seen
+
+
+def requirements_fingerprint(requirements_path, python_version, arch):
+    """锁文件的有效性指纹：目标标签加上 requirements 文件（含嵌套引用）的内容。"""
+    base_dir = os.path.dirname(os.path.abspath(requirements_path))
+    files = [(os.path.relpath(path, base_dir).replace(os.sep, '/'), hash_file(path)) for path in _requirement_files(requirements_path)]
+    return fingerprint('lock', get_target_tag(python_version, arch), files)
+
+
+def read_lock_fingerprint(lock_path):
+    try:
+        with open(lock_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.startswith(_FINGERPRINT_LINE):
+                    return line[len(_FINGERPRINT_LINE):].strip()
+    except OSError:
+        pass
+    return None
+
+
+def is_lock_fresh(lock_path, requirements_path, python_version, arch):
+    """锁文件存在且由当前的 requirements 文件生成时无需重新解析。"""
+    return os.path.exists(requirements_path) and read_lock_fingerprint(lock_path) == requirements_fingerprint(requirements_path, python_version, arch)
+
+
+def lock_has_only_wheels(lock_path):
+    """锁定的所有文件都是 wheel 时返回 True。"""
+    try:
+        with open(lock_path, 'r', encoding='utf-8') as f:
+            urls = [line.split('# from ', 1)[1].strip() for line in f if line.strip().startswith('# from ')]
+    except OSError:
+        return False
+    return bool(urls) and all(url.split('#')[0].lower().endswith('.whl') for url in urls)
+
+
+def locked_pins(lock_path):
+    """锁文件中的 'name==version' 列表（不带哈希）。"""
+    with open(lock_path, 'r', encoding='utf-8') as f:
+        return [line.split(' ', 1)[0] for line in f if re.match(r'^[\w.-]+==\S+', line)]
+
+
+def locked_files(lock_path):
+    """锁文件中每个包的 (名称, 版本, sha256, 来源 URL)，即 write_lock 写入的三行一组。"""
+    with open(lock_path, 'r', encoding='utf-8') as f:
+        content = f.read()
+    return re.findall(r'^([\w.-]+)==(\S+) \\\n\s+--hash=sha256:([0-9a-f]+)\n\s+# from (\S+)$', content, re.MULTILINE)
+
+
+def _canonical_name(name):
+    return re.sub(r'[-_.]+', '-', name).lower()
+
+
+def _file_url_path(url):
+    path = unquote(urlparse(url).path)
+    if os.name == 'nt' and re.match(r'^/[A-Za-z]:', path):
+        path = path[1:]
+    return path
+
+
+def _download_sha256(url):
+    """索引没有提供哈希时下载该文件计算 SHA-256。"""
+    click.echo(f"Hashing {url} (the index did not provide a hash)...")
+    with tempfile.TemporaryDirectory(prefix='pysuitcase-hash-') as work_dir:
+        path = download_file(url, os.path.join(work_dir, 'download'), quiet=True)
+        return hash_file(path)
+
+
+def _locked_entries(report):
+    """从 pip 安装报告中提取 (名称, 版本, URL, sha256)；无法锁定（本地目录、VCS）的依赖报错退出。"""
+    entries = []
+    for item in report.get('install', []):
+        name, version = item['metadata']['name'], item['metadata']['version']
+        info = item.get('download_info', {})
+        url = info.get('url', '')
+        if 'archive_info' not in info:
+            click.secho(f"Error: '{name}' comes from a local directory or VCS ({url}) and cannot be locked. "
+                        "Build with --no-lock or depend on a released version.", fg='red', bold=True)
+            return None
+        archive = info['archive_info']
+        sha256 = (archive.get('hashes') or {}).get('sha256')
+        if not sha256 and archive.get('hash', '').startswith('sha256='):
+            sha256 = archive['hash'].split('=', 1)[1]
+        if not sha256:
+            sha256 = hash_file(_file_url_path(url)) if url.startswith('file:') else _download_sha256(url)
+        entries.append((_canonical_name(name), version, url, sha256))
+    return sorted(entries)
+
+
+def write_lock(lock_path, requirements_path, python_version, arch, entries):
+    """以 pip requirements 格式写入锁文件：精确版本 + --hash，来源 URL 作为注释保留。"""
+    index_lines = []
+    for path in _requirement_files(requirements_path):
+        for line in _requirement_lines(path):
+            option, _ = _split_option(line)
+            if option in _INDEX_OPTIONS and line not in index_lines:
+                index_lines.append(line)
+
+    lines = [
+        f"# Generated by pysuitcase for {get_target_tag(python_version, arch)} from {os.path.basename(requirements_path)}.",
+        "# Do not edit: it is re-resolved whenever the requirements change (or with --relock).",
+        f"{_FINGERPRINT_LINE}{requirements_fingerprint(requirements_path, python_version, arch)}",
+        "",
+    ] + index_lines + ([""] if index_lines else [])
+    for name, version, url, sha256 in entries:
+        lines += [f"{name}=={version} \\", f"    --hash=sha256:{sha256}", f"    # from {url}"]
+
+    tmp_path = f"{lock_path}.tmp-{os.getpid()}"
+    with open(tmp_path, 'w', encoding='utf-8', newline='\n') as f:
+        f.write('\n'.join(lines) + '\n')
+    os.replace(tmp_path, lock_path)
+
+
+def resolve_lock(python_exe_path, requirements_path, lock_path, python_version, arch, mirror=None, wheelhouse_dir=None, offline=False,
+                 cross=False):
+    """
+    用目标解释器执行一次 pip 解析（--dry-run，不安装），把结果写成锁文件。
+    cross 时改用宿主解释器按目标平台标签解析（只接受 wheel）。
+    wheelhouse 中已有的 wheel 也作为候选；离线时只在 wheelhouse 中解析。
+    """
+    click.secho(f"Resolving {os.path.basename(requirements_path)} for {get_target_tag(python_version, arch)}...", fg='cyan')
+    fd, report_path = tempfile.mkstemp(prefix='pysuitcase-resolve-', suffix='.json')
+    os.close(fd)
+    command = [sys.executable if cross else python_exe_path, "-m", "pip", "install", "--dry-run", "--ignore-installed", "--report", report_path,
+               "-r", requirements_path]
+    target_dir = None
+    if cross:
+        # pip 只在指定 --target 时接受平台相关参数，--dry-run 并不会写入该目录
+        target_dir = tempfile.mkdtemp(prefix='pysuitcase-resolve-')
+        command += ["--target", target_dir] + cross_platform_args(python_version, arch)
+    if wheelhouse_dir:
+        command += ["--find-links", wheelhouse_dir]
+    command += ["--no-index"] if offline else _mirror_args(mirror)
+    click.echo(f"Running command: {' '.join(command)}")
+    try:
+        run_command(command, label='pip')
+        with open(report_path, 'r', encoding='utf-8') as f:
+            report = json.load(f)
+    except subprocess.CalledProcessError as e:
+        if not (cross and report_missing_wheels(e.output, python_version, arch)):
+            click.secho(f"Failed to resolve the requirements! (exit code {e.returncode})", fg='red', bold=True)
+        return False
+    except (OSError, ValueError) as e:
+        click.secho(f"Failed to read pip's resolution report: {e}", fg='red', bold=True)
+        return False
+    finally:
+        os.remove(report_path)
+        if target_dir:
+            shutil.rmtree(target_dir, ignore_errors=True)
+
+    try:
+        entries = _locked_entries(report)
+    except DownloadError as e:
+        click.secho(f"Failed to hash a locked file: {e}", fg='red', bold=True)
+        return False
+    if entries is None:
+        return False
+    write_lock(lock_path, requirements_path, python_version, arch, entries)
+    click.secho(f"Locked {len(entries)} packages in {lock_path}", fg='green')
+    return True
+
+
+def ensure_lock(python_exe_path, requirements_path, lock_path, python_version, arch, mirror=None, wheelhouse_dir=None,
+                offline=False, relock=False, cross=False):
+    """锁文件仍与 requirements 文件对应时直接复用，否则（或指定 relock 时）重新解析。"""
+    if not relock and is_lock_fresh(lock_path, requirements_path, python_version, arch):
+        click.echo(f"Using lock file {lock_path}")
+        return True
+    if os.path.exists(lock_path) and not relock:
+        click.echo(f"{os.path.basename(requirements_path)} changed since {os.path.basename(lock_path)} was written.")
+    return resolve_lock(python_exe_path, requirements_path, lock_path, python_version, arch, mirror, wheelhouse_dir, offline, cross=cross)
@@ -0,0 +1,172 @@
+import click
+import os
+import shutil
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from .cache import tree_size
+from .incremental import hash_sources
+
+
+def parse_target(value):
+    """把 'VERSION:ARCH' 解析为 (版本, 架构)；格式不对时抛出 ValueError。"""
+    version, sep, arch = value.partition(':')
+    parts = version.split('.')
+    if not sep or len(parts) != 3 or not all(part.isdigit() for part in parts):
+        raise ValueError(f"'{value}' is not VERSION:ARCH with a full version, e.g. 3.11.8:amd64")
+    if arch not in ('amd64', 'win32', 'arm64'):
+        raise ValueError(f"unknown architecture '{arch}' in '{value}' (choose from amd64, win32, arm64)")
+    return version, arch
+
+
+def get_target_dir(project_dir, python_version, arch):
+    """矩阵构建中每个目标的输出目录：<项目>/dist/<版本>-<架构>/<项目名>/，目录名与单目标构建保持一致。"""
+    return os.path.join(project_dir, 'dist', f"{python_version}-{arch}", os.path.basename(os.path.normpath(project_dir)))
+
+
+def sync_tree(src, dst, ignore_dirs=('__pycache__',)):
+    """
+    把 src 镜像到 dst：只复制大小或修改时间不同的文件，删除 dst 中多余的文件。
+    忽略 __pycache__，这样上次预编译的字节码得以保留，增量构建可以跳过未变化的阶段。返回复制的文件数。
+    """
+    copied = 0
+    wanted = set()
+    for dirpath, dirnames, filenames in os.walk(src):
+        dirnames[:] = [d for d in dirnames if d not in ignore_dirs]
+        target_dir = os.path.normpath(os.path.join(dst, os.path.relpath(dirpath, src)))
+        os.makedirs(target_dir, exist_ok=True)
+        wanted.add(target_dir)
+        for name in filenames:
+            source_path, target_path = os.path.join(dirpath, name), os.path.join(target_dir, name)
+            wanted.add(target_path)
+            source_stat = os.stat(source_path)
+            try:
+                target_stat = os.stat(target_path)
+            except FileNotFoundError:
+                target_stat = None
+            if target_stat is None or target_stat.st_size != source_stat.st_size or int(target_stat.st_mtime) != int(source_stat.st_mtime):
+                shutil.copy2(source_path, target_path)
+                copied += 1
+
+    for dirpath, dirnames, filenames in os.walk(dst):
+        for dirname in list(dirnames):
+            path = os.path.join(dirpath, dirname)
+            if dirname in ignore_dirs:
+                dirnames.remove(dirname)
+            elif os.path.normpath(path) not in wanted:
+                shutil.rmtree(path, ignore_errors=True)
+                dirnames.remove(dirname)
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            if os.path.normpath(path) not in wanted:
+                os.remove(path)
+    return copied
+
+
+def _build_target(build_func, params, log_path):
+    """工作进程入口：把输出写入该目标的日志文件后执行单目标构建，返回 (是否成功, 错误信息, 耗时秒数)。"""
+    started = time.perf_counter()
+    with open(log_path, 'w', encoding='utf-8', buffering=1) as log:
+        sys.stdout = sys.stderr = log
+        try:
+            build_func(params)
+            ok, error = True, None
+        except SystemExit as e:
+            ok, error = e.code in (0, None), f"exited with code {e.code}"
+        except BaseException as e:
+            traceback.print_exc()
+            ok, error = False, f"{type(e).__name__}: {e}"
+        finally:
+            sys.stdout, sys.stderr = sys.__stdout__, sys.__stderr__
+    return ok, error, time.perf_counter() - started
+
+
+def _tail(path, lines=15):
+    try:
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            return f.read().splitlines()[-lines:]
+    except OSError:
+        return []
+
+
+def run_matrix(params, targets, build_func):
+    """
+    矩阵构建：为每个 (版本, 架构) 同步一份 app 目录到独立的输出目录，并在独立的进程中并行构建。
+    源码哈希只计算一次并传给各目标，锁文件统一写在源项目目录；运行时、wheelhouse、Cython 等用户级缓存由各进程共享。
+    """
+    project_dir = params['project_dir']
+    project_name = os.path.basename(os.path.normpath(project_dir))
+    source_app_dir = os.path.join(project_dir, params['app_folder'])
+    if not os.path.isdir(source_app_dir):
+        click.secho(f"Error: app folder '{source_app_dir}' not found.", fg='red', bold=True); sys.exit(1)
+
+    click.secho(f"\nMatrix build of {len(targets)} targets: {', '.join(f'{v}:{a}' for v, a in targets)}", fg='cyan', bold=True)
+    source_hashes = hash_sources(source_app_dir)
+    # 各目标大部分时间在下载和等待子进程，因此每个目标一个进程；进程内的并行度按 CPU 核数均分
+    workers = len(targets)
+    jobs = params.get('jobs') or max(1, (os.cpu_count() or 1) // len(targets))
+    trace_base, trace_ext = os.path.splitext(params['trace']) if params.get('trace') else (None, None)
+
+    jobs_by_target = {}
+    for version, arch in targets:
+        target_dir = get_target_dir(project_dir, version, arch)
+        copied = sync_tree(source_app_dir, os.path.join(target_dir, params['app_folder']))
+        click.echo(f"  - {version}:{arch} -> {target_dir} ({copied} app files updated)")
+        target_params = dict(params)
+        target_params.update({
+            'project_dir': target_dir,
+            'python_version': version,
+            'arch': arch,
+            'jobs': jobs,
+            'icon': os.path.abspath(params['icon']) if params.get('icon') else None,
+            'trace': f"{trace_base}-{version}-{arch}{trace_ext}" if trace_base else None,
+            '_is_interactive': False,
+            '_source_hashes': source_hashes,
+            '_lock_dir': project_dir,
+            '_archive_dir': os.path.join(project_dir, 'dist'),
+            '_archive_name': f"{project_name}-{version}-{arch}",
+        })
+        jobs_by_target[(version, arch)] = (target_params, os.path.join(os.path.dirname(target_dir), 'build.log'))
+
+    click.echo(f"Building with {workers} worker processes; per-target logs are written next to each output folder.")
+    results = {}
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(_build_target, build_func, target_params, log_path): target
+            for target, (target_params, log_path) in jobs_by_target.items()
+        }
+        for future in as_completed(futures):
+            target = futures[future]
+            try:
+                ok, error, elapsed = future.result()
+            except BaseException as e:
+                ok, error, elapsed = False, f"{type(e).__name__}: {e}", time.perf_counter() - started
+            results[target] = (ok, error, elapsed)
+            label = f"{target[0]}:{target[1]}"
+            if ok:
+                click.secho(f"  [{label}] finished in {elapsed:.1f}s", fg='green')
+            else:
+                click.secho(f"  [{label}] FAILED after {elapsed:.1f}s ({error}); last lines of {jobs_by_target[target][1]}:", fg='red', bold=True)
+                for line in _tail(jobs_by_target[target][1]):
+                    click.echo(f"      {line}")
+
+    print_matrix_summary(project_dir, targets, results, time.perf_counter() - started)
+    if not all(ok for ok, _, _ in results.values()):
+        sys.exit(1)
+
+
+def print_matrix_summary(project_dir, targets, results, total):
+    """打印每个目标的状态、耗时与输出目录大小。"""
+    click.echo("\n-------------------------------------")
+    click.secho("Matrix build summary:", bold=True)
+    click.echo(f"  {'Target':<18}{'Status':<9}{'Time':>9}{'Size':>12}  Output")
+    for version, arch in targets:
+        ok, _, elapsed = results[(version, arch)]
+        target_dir = get_target_dir(project_dir, version, arch)
+        size = tree_size(target_dir) if os.path.isdir(target_dir) else 0
+        click.secho(f"  {version + ':' + arch:<18}{'ok' if ok else 'FAILED':<9}{elapsed:8.1f}s{size / 1024 / 1024:9.1f} MB  {target_dir}",
+                    fg=None if ok else 'red')
+    click.echo(f"  Wall-clock {total:.1f}s vs. {sum(r[2] for r in results.values()):.1f}s if built one after another.")
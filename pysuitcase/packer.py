@@ -0,0 +1,154 @@
+import click
+import importlib.util
+import marshal
+import os
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+from .compiler import SOURCE_REQUIRED_PACKAGES
+
+try:
+    import importlib.resources as pkg_resources
+except ImportError:
+    import importlib_resources as pkg_resources
+
+# 以下常量需与 templates/pysuitcase_pack.py 保持一致
+PACK_MAGIC = b'PSPACK01'
+PACK_NAME = 'pysuitcase.pack'
+IMPORTER_NAME = 'pysuitcase_pack.py'
+# marshal 第 4 版格式自 Python 3.4 起不变，宿主与目标解释器版本不同也能读取索引
+_MARSHAL_VERSION = 4
+_CODE_SUFFIXES = ('.py', '.pyc')
+_EXTENSION_SUFFIXES = ('.pyd', '.so')
+# 压缩后至少小这么多才以压缩形式存放，否则解压的开销不值得
+_MIN_SAVING = 0.1
+
+
+def get_pack_path(project_dir):
+    return os.path.join(project_dir, PACK_NAME)
+
+
+def pack_relpath(project_dir, app_folder):
+    """包文件相对于 app 目录（启动时的当前目录）的 Windows 路径。"""
+    return os.path.relpath(get_pack_path(project_dir), os.path.join(project_dir, app_folder)).replace('/', '\\')
+
+
+def pack_preload(project_dir, app_folder):
+    """启动器在导入入口模块前执行的语句：安装包文件的导入器。路径相对于 app 目录。"""
+    return f"import pysuitcase_pack; pysuitcase_pack.install(r'{pack_relpath(project_dir, app_folder)}')"
+
+
+def _pyc_matches_source(pyc_path, source_path):
+    """
+    __pycache__ 中的 .pyc 是否仍对应磁盘上的源码：按时间戳的 .pyc 比较修改时间与大小，按哈希的 .pyc 比较源码哈希。
+    包中的导入器不再校验，因此过期的（例如之后又修改过源码的）或无法用宿主解释器校验的 .pyc 都不打包，导入时改为编译源码。
+    """
+    with open(pyc_path, 'rb') as f:
+        header = f.read(16)
+    if len(header) < 16:
+        return False
+    flags = int.from_bytes(header[4:8], 'little')
+    if flags & 0b1:
+        if header[:4] != importlib.util.MAGIC_NUMBER:
+            return False
+        with open(source_path, 'rb') as f:
+            return header[8:16] == importlib.util.source_hash(f.read())
+    stat = os.stat(source_path)
+    return (int.from_bytes(header[8:12], 'little') == int(stat.st_mtime) & 0xFFFFFFFF
+            and int.from_bytes(header[12:16], 'little') == stat.st_size & 0xFFFFFFFF)
+
+
+def _collect(root_name, root_dir, skip_top=()):
+    """返回 root_dir 下可以打包的 (键, 文件路径)：.py 与 .pyc，但不包括与扩展模块同名的模块（扩展模块优先）。"""
+    entries = []
+    for dirpath, dirnames, filenames in os.walk(root_dir):
+        rel_dir = os.path.relpath(dirpath, root_dir).replace(os.sep, '/')
+        if rel_dir == '.':
+            rel_dir = ''
+            dirnames[:] = [d for d in dirnames if d.lower() not in skip_top and not d.endswith(('.dist-info', '.egg-info'))]
+        base = os.path.basename(dirpath) if rel_dir else ''
+        source_dir = os.path.dirname(dirpath) if base == '__pycache__' else dirpath
+        extensions = {name.split('.')[0] for name in os.listdir(source_dir) if name.endswith(_EXTENSION_SUFFIXES)}
+        for name in filenames:
+            if not name.endswith(_CODE_SUFFIXES) or name.split('.')[0] in extensions:
+                continue
+            if not rel_dir and os.path.splitext(name)[0].lower() in skip_top:
+                continue
+            if base == '__pycache__' and name.endswith('.pyc'):
+                source_path = os.path.join(source_dir, name.split('.')[0] + '.py')
+                if os.path.exists(source_path) and not _pyc_matches_source(os.path.join(dirpath, name), source_path):
+                    continue
+            key = f"{root_name}/{rel_dir + '/' if rel_dir else ''}{name}"
+            entries.append((key, os.path.join(dirpath, name)))
+    return entries
+
+
+def _read_entry(path, compress):
+    with open(path, 'rb') as f:
+        data = f.read()
+    if compress and data:
+        packed = zlib.compress(data, 1)
+        if len(packed) < len(data) * (1 - _MIN_SAVING):
+            return len(data), packed
+    return len(data), data
+
+
+def build_pack(project_dir, app_folder, site_packages, compress=False, exclude=(), jobs=None):
+    """
+    把 app 目录以及 site-packages 中的 .py/.pyc 写入一个带索引的包文件，原文件保留在磁盘上。
+    扩展模块及与之同名的模块、数据文件、元数据以及 exclude 中的顶层包不打包。返回包文件路径。
+    """
+    click.echo("\n-------------------------------------")
+    click.secho("Packing the app and its pure-Python modules into one archive...", fg='cyan', bold=True)
+    started = time.perf_counter()
+    pack_path = get_pack_path(project_dir)
+    skip = {name.lower() for name in tuple(SOURCE_REQUIRED_PACKAGES) + tuple(exclude)}
+    # 与嵌入式解释器的 sys.path 顺序一致：site-packages 在 app 目录之前
+    roots = [
+        ('site', os.path.relpath(site_packages, project_dir).replace(os.sep, '/')),
+        ('app', app_folder.replace(os.sep, '/')),
+    ]
+    files = _collect('site', site_packages, skip) if os.path.isdir(site_packages) else []
+    # app 目录下的 build/ 是加密时 Cython 的中间产物
+    files += _collect('app', os.path.join(project_dir, app_folder), {'build'})
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        contents = list(executor.map(lambda item: _read_entry(item[1], compress), files))
+
+    entries = {}
+    tmp_path = f"{pack_path}.tmp-{os.getpid()}"
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(PACK_MAGIC)
+            for (key, _), (size, data) in zip(files, contents):
+                entries[key] = (f.tell(), size, len(data))
+                f.write(data)
+            index = marshal.dumps({'version': 1, 'roots': roots, 'entries': entries}, _MARSHAL_VERSION)
+            index_offset = f.tell()
+            f.write(index)
+            f.write(PACK_MAGIC + index_offset.to_bytes(8, 'little') + len(index).to_bytes(8, 'little'))
+        os.replace(tmp_path, pack_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    raw = sum(size for size, _ in contents)
+    stored = sum(len(data) for _, data in contents)
+    click.secho(f"Packed {len(files)} files ({raw / 1024 / 1024:.1f} MB{f', {stored / 1024 / 1024:.1f} MB stored' if compress else ''}) "
+                f"into {PACK_NAME} in {time.perf_counter() - started:.1f}s.", fg='green')
+    return pack_path
+
+
+def install_importer(python_embed_path):
+    """把导入器复制到嵌入式 Python 目录，该目录在 ._pth 中，启动时可直接导入。"""
+    source = (pkg_resources.files('pysuitcase.templates') / IMPORTER_NAME).read_bytes()
+    with open(os.path.join(python_embed_path, IMPORTER_NAME), 'wb') as f:
+        f.write(source)
+
+
+def remove_pack(project_dir, python_embed_path):
+    """关闭 --pack 后删除上次构建留下的包文件与导入器，避免它们被一起分发。"""
+    for path in (get_pack_path(project_dir), os.path.join(python_embed_path, IMPORTER_NAME)):
+        if os.path.exists(path):
+            os.remove(path)
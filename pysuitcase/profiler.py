@@ -0,0 +1,260 @@
+import click
+import glob
+import json
+import os
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from .compiler import build_launcher_payload
+from .packer import get_pack_path, pack_preload
+from .runner import CONSOLE_ENCODING
+
+PROFILE_FORMAT_VERSION = 1
+
+# 载荷在主模块导入完成、即将调用 run() 时打印此标记并退出
+_READY_MARKER = '__pysuitcase_startup_ready__'
+
+# -X importtime 的输出行：self 微秒 | cumulative 微秒 | 缩进表示嵌套深度的模块名
+_IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( *)(\S.*)$')
+
+_RUN_TIMEOUT = 300
+
+
+def find_embedded_runtimes(project_dir):
+    """返回项目目录中已下载的 (版本, 架构) 列表，依据 python-<版本>-embed-<架构> 目录名。"""
+    runtimes = []
+    for path in sorted(glob.glob(os.path.join(project_dir, 'python-*-embed-*'))):
+        match = re.match(r'^python-(.+)-embed-(.+)$', os.path.basename(path))
+        if match and os.path.isdir(path):
+            runtimes.append((match.group(1), match.group(2)))
+    return runtimes
+
+
+def parse_importtime(output):
+    """解析 -X importtime 输出，返回 [{'module', 'self_us', 'cumulative_us', 'depth'}]，按导入顺序排列。"""
+    imports = []
+    for line in output.splitlines():
+        match = _IMPORTTIME_LINE.match(line.rstrip())
+        if not match:
+            continue
+        self_us, cumulative_us, indent, module = match.groups()
+        if module == 'imported package':
+            continue
+        imports.append({
+            'module': module.strip(),
+            'self_us': int(self_us),
+            'cumulative_us': int(cumulative_us),
+            'depth': max(len(indent) - 1, 0) // 2,
+        })
+    return imports
+
+
+def _run_once(command, cwd, env):
+    """运行一次启动过程，返回 (墙钟秒数, 导入记录)。"""
+    started = time.perf_counter()
+    try:
+        completed = subprocess.run(
+            command, cwd=cwd, env=env, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            text=True, encoding=CONSOLE_ENCODING, errors='ignore', timeout=_RUN_TIMEOUT
+        )
+    except subprocess.TimeoutExpired:
+        click.secho(f"Error: the app did not reach run() within {_RUN_TIMEOUT}s.", fg='red', bold=True)
+        sys.exit(1)
+    elapsed = time.perf_counter() - started
+
+    if completed.returncode != 0 or _READY_MARKER not in completed.stdout:
+        click.secho(f"Error: importing the entry module failed (exit code {completed.returncode}).", fg='red', bold=True)
+        errors = [line for line in completed.stderr.splitlines() if not line.startswith('import time:')]
+        for line in errors[-20:]:
+            click.echo(f"  {line}")
+        sys.exit(1)
+    return elapsed, parse_importtime(completed.stderr)
+
+
+def _aggregate(runs):
+    """把多次运行的导入记录合并为每个模块的中位数。"""
+    samples = {}
+    for _, imports in runs:
+        for record in imports:
+            entry = samples.setdefault(record['module'], {'self_us': [], 'cumulative_us': [], 'depth': record['depth']})
+            entry['self_us'].append(record['self_us'])
+            entry['cumulative_us'].append(record['cumulative_us'])
+            entry['depth'] = min(entry['depth'], record['depth'])
+    return {
+        module: {
+            'self_us': int(statistics.median(entry['self_us'])),
+            'cumulative_us': int(statistics.median(entry['cumulative_us'])),
+            'depth': entry['depth'],
+        }
+        for module, entry in samples.items()
+    }
+
+
+def _wall_stats(runs):
+    times = [elapsed for elapsed, _ in runs]
+    if not times:
+        return None
+    return {
+        'runs_s': [round(t, 4) for t in times],
+        'min_s': round(min(times), 4),
+        'median_s': round(statistics.median(times), 4),
+        'max_s': round(max(times), 4),
+    }
+
+
+def profile_startup(app_dir, python_exe, payload, optimize=0, cold_runs=3, repeats=5):
+    """
+    在 app 目录中用目标解释器执行启动器载荷（停在 run() 之前），收集 -X importtime 与墙钟耗时。
+    冷启动每次使用全新的 pycache_prefix，迫使所有模块重新编译；热启动先预热一次再重复测量。
+    """
+    payload += f"; print({_READY_MARKER!r}, flush=True)"
+    base_command = [python_exe, '-u'] + (['-' + 'O' * optimize] if optimize else []) + ['-X', 'importtime']
+    env = dict(os.environ)
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    env.pop('PYTHONPYCACHEPREFIX', None)
+
+    cold, warm = [], []
+    for index in range(cold_runs):
+        prefix_dir = tempfile.mkdtemp(prefix='pysuitcase-pycache-')
+        try:
+            click.echo(f"  Cold run {index + 1}/{cold_runs}...")
+            cold.append(_run_once(base_command + ['-X', f'pycache_prefix={prefix_dir}', '-c', payload], app_dir, env))
+        finally:
+            shutil.rmtree(prefix_dir, ignore_errors=True)
+
+    if repeats:
+        # 预热：写入 __pycache__ 并让系统缓存住文件
+        _run_once(base_command + ['-c', payload], app_dir, env)
+    for index in range(repeats):
+        click.echo(f"  Warm run {index + 1}/{repeats}...")
+        warm.append(_run_once(base_command + ['-c', payload], app_dir, env))
+
+    return {
+        'cold': _wall_stats(cold),
+        'warm': _wall_stats(warm),
+        'imports': _aggregate(warm or cold),
+        'cold_imports': _aggregate(cold) if cold and warm else None,
+    }
+
+
+def _format_ms(microseconds):
+    return f"{microseconds / 1000:9.1f} ms"
+
+
+def print_profile_report(result, top=20):
+    """打印墙钟统计以及自身耗时最长的导入、累计耗时最长的顶层导入。"""
+    for mode in ('cold', 'warm'):
+        stats = result.get(mode)
+        if stats:
+            click.echo(f"  {mode.capitalize() + ' start:':<13} median {stats['median_s'] * 1000:8.1f} ms"
+                       f"  (min {stats['min_s'] * 1000:.1f} ms, max {stats['max_s'] * 1000:.1f} ms, {len(stats['runs_s'])} runs)")
+
+    imports = result['imports']
+    click.echo(f"  {len(imports)} modules imported before run().")
+    click.echo("")
+    click.secho(f"Slowest imports by self time (top {top}):", bold=True)
+    click.echo(f"  {'Module':<48}{'Self':>13}{'Cumulative':>13}")
+    ranked = sorted(imports.items(), key=lambda item: item[1]['self_us'], reverse=True)
+    for module, entry in ranked[:top]:
+        click.echo(f"  {module[:47]:<48}{_format_ms(entry['self_us'])}{_format_ms(entry['cumulative_us'])}")
+
+    click.echo("")
+    click.secho(f"Slowest top-level imports by cumulative time (top {top}):", bold=True)
+    top_level = sorted(((m, e) for m, e in imports.items() if e['depth'] == 0), key=lambda item: item[1]['cumulative_us'], reverse=True)
+    for module, entry in top_level[:top]:
+        click.echo(f"  {module[:47]:<48}{_format_ms(entry['cumulative_us'])}")
+
+
+def compare_profiles(old, new, top=20):
+    """
+    对比两次分析结果：打印启动耗时变化以及自身耗时变化最大的模块。
+    返回热启动（无热启动时为冷启动）中位数的变化百分比。
+    """
+    click.echo("")
+    click.secho("Comparison with baseline:", bold=True)
+    change = None
+    for mode in ('cold', 'warm'):
+        before, after = old.get(mode), new.get(mode)
+        if not before or not after:
+            continue
+        delta = after['median_s'] - before['median_s']
+        percent = delta / before['median_s'] * 100 if before['median_s'] else 0.0
+        color = 'red' if percent > 5 else ('green' if percent < -5 else None)
+        click.secho(f"  {mode.capitalize() + ' start:':<13} {before['median_s'] * 1000:8.1f} ms -> {after['median_s'] * 1000:8.1f} ms"
+                    f"  ({delta * 1000:+.1f} ms, {percent:+.1f}%)", fg=color)
+        if mode == 'warm' or change is None:
+            change = percent
+
+    old_imports, new_imports = old.get('imports', {}), new.get('imports', {})
+    added = sorted(set(new_imports) - set(old_imports), key=lambda m: new_imports[m]['self_us'], reverse=True)
+    removed = sorted(set(old_imports) - set(new_imports))
+    deltas = sorted(
+        ((m, new_imports[m]['self_us'] - old_imports[m]['self_us']) for m in set(old_imports) & set(new_imports)),
+        key=lambda item: abs(item[1]), reverse=True
+    )
+    click.echo(f"  Modules: {len(old_imports)} -> {len(new_imports)} ({len(added)} new, {len(removed)} no longer imported)")
+    for module in added[:top]:
+        click.secho(f"    + {module[:45]:<46}{_format_ms(new_imports[module]['self_us'])}", fg='yellow')
+    if len(added) > top:
+        click.echo(f"    ... and {len(added) - top} more new modules")
+    click.echo(f"  Largest self-time changes (top {top}):")
+    for module, delta in deltas[:top]:
+        click.echo(f"    {module[:47]:<48}{delta / 1000:+9.1f} ms")
+    return change
+
+
+def write_profile(path, profile):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(profile, f, indent=2)
+
+
+def load_profile(path):
+    """读取之前保存的分析结果；格式不对时报错退出。"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            profile = json.load(f)
+    except (OSError, ValueError) as e:
+        click.secho(f"Error: cannot read startup profile '{path}': {e}", fg='red', bold=True)
+        sys.exit(1)
+    if profile.get('format') != PROFILE_FORMAT_VERSION or 'imports' not in profile:
+        click.secho(f"Error: '{path}' is not a pysuitcase startup profile.", fg='red', bold=True)
+        sys.exit(1)
+    return profile
+
+
+def build_profile(project_dir, app_folder, main_script, requirements_file, python_version, arch,
+                  python_exe=None, optimize=0, cold_runs=3, repeats=5):
+    """profile-startup 子命令的主体：定位解释器、生成与启动器相同的载荷并运行分析，返回可保存的结果。"""
+    app_dir = os.path.join(project_dir, app_folder)
+    if not os.path.exists(os.path.join(app_dir, main_script)) and not glob.glob(os.path.join(app_dir, os.path.splitext(main_script)[0] + '.*.pyd')):
+        click.secho(f"Error: entry module '{main_script}' not found in '{app_dir}'.", fg='red', bold=True)
+        sys.exit(1)
+    preload = None
+    if python_exe is None:
+        python_exe = os.path.join(project_dir, f"python-{python_version}-embed-{arch}", 'python.exe')
+        # 导入器位于嵌入式 Python 目录中，只有用打包的解释器分析时才能按 --pack 的方式加载
+        if os.path.exists(get_pack_path(project_dir)):
+            preload = pack_preload(project_dir, app_folder)
+    if not os.path.exists(python_exe):
+        click.secho(f"Error: interpreter '{python_exe}' not found. Build the project first or pass --python.", fg='red', bold=True)
+        sys.exit(1)
+
+    payload = build_launcher_payload(project_dir, app_folder, main_script, python_version, arch, requirements_file, run_entry=False,
+                                     preload=preload)
+    click.secho(f"Profiling startup of '{main_script}' with {python_exe}...", fg='cyan', bold=True)
+    result = profile_startup(app_dir, python_exe, payload, optimize=optimize, cold_runs=cold_runs, repeats=repeats)
+    result.update({
+        'format': PROFILE_FORMAT_VERSION,
+        'created': time.time(),
+        'project': os.path.basename(project_dir),
+        'main_script': main_script,
+        'python_version': python_version,
+        'arch': arch,
+        'optimize': optimize,
+    })
+    return result
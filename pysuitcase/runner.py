@@ -0,0 +1,92 @@
+import click
+import collections
+import itertools
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+
+from .trace import get_trace
+
+# 外部工具（pip、cl.exe 等）在 Windows 上以系统代码页输出，其他平台为 UTF-8
+CONSOLE_ENCODING = 'mbcs' if os.name == 'nt' else 'utf-8'
+
+_SPINNER = '|/-\\'
+_active_lock = threading.Lock()
+_active_commands = [0]
+
+
+class CommandResult:
+    """run_command 的返回值：退出码以及保留的最后若干行输出。"""
+
+    def __init__(self, command, returncode, output):
+        self.args = command
+        self.returncode = returncode
+        self.stdout = output
+
+
+def _reader(stream, lines):
+    for line in iter(stream.readline, ''):
+        lines.put(line)
+    stream.close()
+    lines.put(None)
+
+
+def run_command(command, cwd=None, label=None, check=True, echo=True, env=None, tail_lines=200):
+    """
+    运行外部命令并逐行流式输出（stderr 合并到 stdout），终端中显示实时进度。
+    只在内存中保留最后 tail_lines 行用于报错；check=True 且退出码非零时抛出 CalledProcessError。
+    """
+    label = label or os.path.basename(str(command[0]))
+    show_spinner = echo and sys.stdout.isatty()
+    tail = collections.deque(maxlen=tail_lines)
+    trace = get_trace()
+    start_us = trace.now_us()
+    started = time.perf_counter()
+
+    process = subprocess.Popen(
+        command, cwd=cwd, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+        stdin=subprocess.DEVNULL, text=True, encoding=CONSOLE_ENCODING, errors='ignore', bufsize=1
+    )
+    lines = queue.Queue()
+    threading.Thread(target=_reader, args=(process.stdout, lines), daemon=True).start()
+    with _active_lock:
+        _active_commands[0] += 1
+
+    spinner = itertools.cycle(_SPINNER)
+    status_shown = False
+    try:
+        while True:
+            try:
+                line = lines.get(timeout=0.2)
+            except queue.Empty:
+                # 多个命令并发运行时不绘制状态行，避免互相覆盖
+                if show_spinner and _active_commands[0] == 1:
+                    click.echo(f"\r[{label}] {next(spinner)} {time.perf_counter() - started:6.1f}s", nl=False)
+                    status_shown = True
+                continue
+            if line is None:
+                break
+            line = line.rstrip('\r\n')
+            tail.append(line)
+            if echo:
+                if status_shown:
+                    click.echo('\r' + ' ' * (len(label) + 14) + '\r', nl=False)
+                    status_shown = False
+                click.echo(f"[{label}] {line}")
+        returncode = process.wait()
+    finally:
+        with _active_lock:
+            _active_commands[0] -= 1
+        if status_shown:
+            click.echo('\r' + ' ' * (len(label) + 14) + '\r', nl=False)
+        if process.poll() is None:
+            process.kill()
+
+    trace.record_command(list(command), returncode, start_us, trace.now_us() - start_us, label=label)
+    output = '\n'.join(tail)
+    if check and returncode != 0:
+        raise subprocess.CalledProcessError(returncode, command, output=output, stderr='')
+    return CommandResult(command, returncode, output)
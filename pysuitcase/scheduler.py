@@ -0,0 +1,101 @@
+import click
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from .trace import get_trace
+
+
+class Stage:
+    """构建图中的一个阶段：名称、执行函数以及它依赖的阶段名。"""
+
+    def __init__(self, name, func, deps=()):
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+
+
+_echo_lock = threading.Lock()
+
+
+def stage_echo(message, **style):
+    """多个阶段并发输出时，按整行加锁打印，避免日志行互相穿插。"""
+    with _echo_lock:
+        click.secho(message, **style)
+
+
+def _check_graph(stages):
+    names = {stage.name for stage in stages}
+    for stage in stages:
+        missing = [dep for dep in stage.deps if dep not in names]
+        if missing:
+            raise ValueError(f"Stage '{stage.name}' depends on unknown stages: {', '.join(missing)}")
+
+    # 拓扑排序检测环
+    remaining = {stage.name: set(stage.deps) for stage in stages}
+    while remaining:
+        ready = [name for name, deps in remaining.items() if not deps]
+        if not ready:
+            raise ValueError(f"Dependency cycle between stages: {', '.join(sorted(remaining))}")
+        for name in ready:
+            del remaining[name]
+        for deps in remaining.values():
+            deps.difference_update(ready)
+
+
+def run_stages(stages, max_workers=None):
+    """
+    按依赖关系并发执行各阶段：依赖全部完成的阶段立即启动，互不依赖的阶段同时运行。
+    任一阶段失败（包括 sys.exit）时不再启动新阶段，等待已启动的阶段结束后重新抛出该异常。
+    返回 {阶段名: 返回值}；每个阶段函数以 {依赖阶段名: 返回值} 作为唯一参数。
+    """
+    _check_graph(stages)
+    by_name = {stage.name: stage for stage in stages}
+    pending = dict(by_name)
+    results, timings, running = {}, {}, {}
+    start = time.perf_counter()
+    failure = None
+
+    def _launch(executor, stage):
+        def _run():
+            began = time.perf_counter()
+            stage_echo(f"[{began - start:7.1f}s] >>> Stage '{stage.name}' started", fg='blue')
+            try:
+                with get_trace().span(stage.name, category='stage', deps=list(stage.deps)):
+                    return stage.func({dep: results[dep] for dep in stage.deps})
+            finally:
+                timings[stage.name] = (began - start, time.perf_counter() - start)
+        running[executor.submit(_run)] = stage.name
+
+    with ThreadPoolExecutor(max_workers=max_workers or len(stages) or 1) as executor:
+        while pending or running:
+            if failure is None:
+                for name, stage in list(pending.items()):
+                    if all(dep in results for dep in stage.deps):
+                        del pending[name]
+                        _launch(executor, stage)
+            if not running:
+                break
+            done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                began, ended = timings[name]
+                try:
+                    results[name] = future.result()
+                    stage_echo(f"[{ended:7.1f}s] <<< Stage '{name}' finished in {ended - began:.1f}s", fg='blue')
+                except BaseException as e:
+                    stage_echo(f"[{ended:7.1f}s] !!! Stage '{name}' failed after {ended - began:.1f}s", fg='red', bold=True)
+                    if failure is None:
+                        failure = e
+
+    if failure is not None:
+        raise failure
+
+    total = time.perf_counter() - start
+    serial = sum(ended - began for began, ended in timings.values())
+    click.echo("\n-------------------------------------")
+    click.secho("Stage timeline:", bold=True)
+    for name, (began, ended) in sorted(timings.items(), key=lambda item: item[1][0]):
+        click.echo(f"  - {name:<16} {began:7.1f}s -> {ended:7.1f}s  ({ended - began:.1f}s)")
+    click.echo(f"  Wall-clock {total:.1f}s vs. {serial:.1f}s if run sequentially.")
+    return results
@@ -1,57 +1,126 @@
 import click
-import requests
+import codecs
 import subprocess
 import sys
 import os
+import shutil
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urlparse
 
-def bootstrap_pip(python_exe_path, work_dir, mirror=None):
-    """在新的 Python 环境中，从零开始安装 pip。"""
-    click.echo("\n-------------------------------------")
-    click.secho("Bootstrapping pip...", fg='cyan', bold=True)
-    
-    get_pip_url = "https://bootstrap.pypa.io/get-pip.py"
-    get_pip_path = os.path.join(work_dir, "get-pip.py")
+from .cache import (
+    DEFAULT_CACHE_MAX_SIZE_MB, MANIFEST_NAME, evict_lru, get_cache_dir, hash_tree,
+    materialize_tree, read_manifest, touch_entry, tree_digest, write_json_atomic
+)
+from .downloader import DownloadError, download_file
+from .installer import install_locked
+from .lockfile import ensure_lock, lock_has_only_wheels, locked_pins
+from .runner import run_command
+from .wheelhouse import ensure_installed
+
+# get-pip.py 的地址，可通过 PYSUITCASE_GET_PIP_URL 指向镜像（或本地测试服务器）
+DEFAULT_GET_PIP_URL = "https://bootstrap.pypa.io/get-pip.py"
 
+
+def fetch_get_pip(offline=False):
+    """下载 get-pip.py 并缓存；离线或下载失败时使用缓存中的副本。"""
+    get_pip_url = os.environ.get('PYSUITCASE_GET_PIP_URL') or DEFAULT_GET_PIP_URL
+    cached_path = os.path.join(get_cache_dir('bootstrap'), "get-pip.py")
+    if offline:
+        if not os.path.exists(cached_path):
+            click.secho("Error: get-pip.py is not cached and --offline was given.", fg='red')
+            sys.exit(1)
+        click.echo(f"Using cached {cached_path} (offline).")
+        return cached_path
     try:
         click.echo(f"Downloading {get_pip_url}...")
-        response = requests.get(get_pip_url)
-        response.raise_for_status()
-        with open(get_pip_path, 'w', encoding='utf-8') as f:
-            f.write(response.text)
-    except requests.RequestException as e:
-        click.secho(f"Error downloading get-pip.py: {e}", fg='red')
-        sys.exit(1)
+        # 先下载到本进程的临时文件再替换：矩阵构建时多个进程可能同时刷新这份缓存
+        tmp_path = f"{cached_path}.tmp-{os.getpid()}"
+        download_file(get_pip_url, tmp_path)
+        os.replace(tmp_path, cached_path)
+    except DownloadError as e:
+        if not os.path.exists(cached_path):
+            click.secho(f"Error downloading get-pip.py: {e}", fg='red')
+            sys.exit(1)
+        click.secho(f"Warning: Could not download get-pip.py ({e}). Using the cached copy.", fg='yellow')
+    return cached_path
+
+
+def bootstrap_pip(python_exe_path, work_dir, mirror=None, wheelhouse_dir=None, offline=False, get_pip_source=None):
+    """在新的 Python 环境中，从零开始安装 pip。get_pip_source 为已预先下载好的 get-pip.py。"""
+    click.echo("\n-------------------------------------")
+    click.secho("Bootstrapping pip...", fg='cyan', bold=True)
+
+    get_pip_path = os.path.join(work_dir, "get-pip.py")
+    shutil.copy(get_pip_source or fetch_get_pip(offline=offline), get_pip_path)
 
     command = [python_exe_path, get_pip_path]
-    if mirror:
+    if wheelhouse_dir and any(name.startswith('pip-') for name in os.listdir(wheelhouse_dir)):
+        # wheelhouse 中已有 pip 的 wheel，直接从本地安装
+        command.extend(["--no-index", "--find-links", wheelhouse_dir])
+    elif offline:
+        click.secho("Error: No pip wheel in the wheelhouse and --offline was given.", fg='red')
+        sys.exit(1)
+    elif mirror:
         mirror_host = urlparse(mirror).hostname
-        command.extend(["--no-cache-dir", "-i", mirror, "--trusted-host", mirror_host])
+        command.extend(["-i", mirror, "--trusted-host", mirror_host])
         
     click.echo(f"Running command: {' '.join(command)}")
     try:
-        process = subprocess.run(
-            command,
-            check=True,
-            capture_output=True,
-            text=True,
-            encoding='mbcs',
-            errors='ignore'
-        )
-        click.echo(process.stdout)
+        run_command(command, label='get-pip')
         click.secho("pip bootstrapped successfully!", fg='green')
     except subprocess.CalledProcessError as e:
-        click.secho("Failed to bootstrap pip!", fg='red', bold=True)
-        click.echo(e.stdout)
-        click.secho(e.stderr, fg='red')
+        click.secho(f"Failed to bootstrap pip! (exit code {e.returncode})", fg='red', bold=True)
         sys.exit(1)
     finally:
         if os.path.exists(get_pip_path):
             os.remove(get_pip_path)
 
 
-def install_dependencies(python_exe_path, requirements_path, mirror=None):
-    """分两步在新环境中安装依赖：先装构建工具，再装其他所有包。"""
+def _install_locked(python_exe_path, lock_path, mirror, wheelhouse_dir, python_version, arch, offline, parallel_install=True, jobs=None):
+    """按锁文件安装：版本已全部确定，pip 不再解析依赖，并校验每个文件的哈希。"""
+    if wheelhouse_dir:
+        if lock_has_only_wheels(lock_path):
+            # 锁定的 wheel 已知且校验过哈希，直接并行解包即可；不能处理时再交给 pip
+            if parallel_install and install_locked(os.path.dirname(python_exe_path), lock_path, wheelhouse_dir, python_version, arch,
+                                                   mirror=mirror, offline=offline, python_exe=python_exe_path, jobs=jobs):
+                click.secho("Dependencies installed successfully!", fg='green')
+                return True
+            ok = ensure_installed(python_exe_path, wheelhouse_dir, python_version, arch, requirements_path=lock_path, mirror=mirror,
+                                  offline=offline, pip_args=["--no-deps", "--require-hashes"])
+        else:
+            # wheelhouse 中由 sdist 构建出的 wheel 与锁定的 sdist 哈希不同，只能按锁定的版本安装
+            click.echo("The lock contains source distributions; installing the pinned versions from the wheelhouse without hash checks.")
+            ok = ensure_installed(python_exe_path, wheelhouse_dir, python_version, arch, packages=locked_pins(lock_path), mirror=mirror,
+                                  offline=offline, pip_args=["--no-deps"])
+        if ok:
+            click.secho("Dependencies installed successfully!", fg='green')
+            return True
+        click.secho("An error occurred during dependency installation.", fg='red')
+        return False
+
+    command = [python_exe_path, "-m", "pip", "install", "--no-deps", "--require-hashes", "-r", lock_path]
+    if mirror:
+        command.extend(["-i", mirror, "--trusted-host", urlparse(mirror).hostname])
+    click.echo(f"Running command: {' '.join(command)}")
+    try:
+        run_command(command, label='pip')
+        click.secho("Dependencies installed successfully!", fg='green')
+        return True
+    except subprocess.CalledProcessError as e:
+        click.secho(f"An error occurred during dependency installation (exit code {e.returncode}).", fg='red')
+        return False
+
+
+def install_dependencies(python_exe_path, requirements_path, mirror=None, wheelhouse_dir=None, python_version=None, arch=None, offline=False,
+                         lock_path=None, relock=False, parallel_install=True, jobs=None):
+    """
+    分两步在新环境中安装依赖：先装构建工具，再装其他所有包。指定 wheelhouse 时只从本地 wheel 安装。
+    指定 lock_path 时按锁文件以 --no-deps --require-hashes 安装，只有 requirements 文件变化（或 relock）时才重新解析。
+    锁定的全是 wheel 且使用 wheelhouse 时（parallel_install）由并行安装器直接解包，不能处理时再交给 pip。
+    """
     if not os.path.exists(requirements_path):
         click.secho(f"Warning: '{requirements_path}' not found. Skipping dependency installation.", fg='yellow')
         return True
@@ -61,31 +130,47 @@ def install_dependencies(python_exe_path, requirements_path, mirror=None):
     click.secho("Step 1/2: Installing build essentials (setuptools, wheel)...", fg='cyan', bold=True)
     
     build_essentials = ['setuptools', 'wheel']
-    command_build = [python_exe_path, "-m", "pip", "install"] + build_essentials
-    if mirror:
-        mirror_host = urlparse(mirror).hostname
-        command_build.extend(["-i", mirror, "--trusted-host", mirror_host])
-    
-    click.echo(f"Running command: {' '.join(command_build)}")
-    try:
-        subprocess.run(
-            command_build, check=True, capture_output=True, text=True,
-            encoding='mbcs', errors='ignore'
-        )
-        click.secho("Build essentials installed successfully.", fg='green')
-    except subprocess.CalledProcessError as e:
-        click.secho("Failed to install build essentials!", fg='red', bold=True)
-        click.echo(e.stdout)
-        click.secho(e.stderr, fg='red')
-        return False
+    if wheelhouse_dir:
+        click.echo(f"Using wheelhouse: {wheelhouse_dir}")
+        if not ensure_installed(python_exe_path, wheelhouse_dir, python_version, arch, packages=build_essentials, mirror=mirror, offline=offline):
+            click.secho("Failed to install build essentials!", fg='red', bold=True)
+            return False
+    else:
+        command_build = [python_exe_path, "-m", "pip", "install"] + build_essentials
+        if mirror:
+            mirror_host = urlparse(mirror).hostname
+            command_build.extend(["-i", mirror, "--trusted-host", mirror_host])
+        
+        click.echo(f"Running command: {' '.join(command_build)}")
+        try:
+            run_command(command_build, label='pip')
+        except subprocess.CalledProcessError as e:
+            click.secho(f"Failed to install build essentials! (exit code {e.returncode})", fg='red', bold=True)
+            return False
+    click.secho("Build essentials installed successfully.", fg='green')
 
     # --- 步骤 2: 安装 requirements.txt 中的所有包 ---
     click.echo("\n-------------------------------------")
     click.secho(f"Step 2/2: Installing packages from {os.path.basename(requirements_path)}...", fg='cyan', bold=True)
-    
+
+    if lock_path:
+        if not ensure_lock(python_exe_path, requirements_path, lock_path, python_version, arch, mirror=mirror,
+                           wheelhouse_dir=wheelhouse_dir, offline=offline, relock=relock):
+            return False
+        return _install_locked(python_exe_path, lock_path, mirror, wheelhouse_dir, python_version, arch, offline,
+                               parallel_install=parallel_install, jobs=jobs)
+
+    if wheelhouse_dir:
+        # 依赖只下载一次到 wheelhouse，之后的构建都通过 --no-index --find-links 从本地安装
+        if ensure_installed(python_exe_path, wheelhouse_dir, python_version, arch, requirements_path=requirements_path, mirror=mirror, offline=offline):
+            click.secho("Dependencies installed successfully!", fg='green')
+            return True
+        click.secho("An error occurred during dependency installation.", fg='red')
+        return False
+
     command_reqs = [
         python_exe_path,
-        "-m", "pip", "install", "--no-cache-dir", "--upgrade",
+        "-m", "pip", "install", "--upgrade",
         "-r", requirements_path
     ]
     
@@ -96,19 +181,118 @@ def install_dependencies(python_exe_path, requirements_path, mirror=None):
     
     click.echo(f"Running command: {' '.join(command_reqs)}")
     try:
-        process = subprocess.run(
-            command_reqs, capture_output=True, text=True, check=True,
-            encoding='mbcs', errors='ignore'
-        )
-        click.echo(process.stdout)
+        run_command(command_reqs, label='pip')
         click.secho("Dependencies installed successfully!", fg='green')
         return True
     except subprocess.CalledProcessError as e:
-        click.secho("An error occurred during dependency installation:", fg='red')
-        click.echo(e.stdout)
-        click.secho(e.stderr, fg='red')
+        click.secho(f"An error occurred during dependency installation (exit code {e.returncode}).", fg='red')
         return False
 
+# python.org 上嵌入式发行包的地址，可通过 PYSUITCASE_PYTHON_MIRROR 指向镜像（或本地测试服务器）
+DEFAULT_PYTHON_MIRROR = "https://www.python.org/ftp/python"
+
+
+def get_embed_url(version, arch):
+    """返回官方嵌入式 zip 的下载地址，例如 .../3.11.8/python-3.11.8-embed-amd64.zip。"""
+    mirror = os.environ.get('PYSUITCASE_PYTHON_MIRROR') or DEFAULT_PYTHON_MIRROR
+    return f"{mirror.rstrip('/')}/{version}/python-{version}-embed-{arch}.zip"
+
+
+def _extract_parallel(zip_path, dest_dir, jobs=None):
+    """多线程解压：每个线程持有自己的 ZipFile 句柄，zlib 解压时释放 GIL。大文件先解压。返回文件数。"""
+    with zipfile.ZipFile(zip_path) as archive:
+        members = [info for info in archive.infolist() if not info.is_dir()]
+    root = os.path.abspath(dest_dir)
+    for info in members:
+        target = os.path.abspath(os.path.join(root, info.filename))
+        if os.path.commonpath([target, root]) != root:
+            raise zipfile.BadZipFile(f"Unsafe path in archive: {info.filename}")
+    members.sort(key=lambda info: info.file_size, reverse=True)
+
+    local = threading.local()
+    handles = []
+
+    def _extract(info):
+        archive = getattr(local, 'archive', None)
+        if archive is None:
+            archive = local.archive = zipfile.ZipFile(zip_path)
+            handles.append(archive)
+        target = os.path.join(root, *info.filename.split('/'))
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        # ZipFile.open 读完时会校验 CRC
+        with archive.open(info) as source, open(target, 'wb') as out:
+            shutil.copyfileobj(source, out, 1024 * 1024)
+
+    try:
+        with ThreadPoolExecutor(max_workers=jobs or os.cpu_count() or 1) as executor:
+            list(executor.map(_extract, members))
+    finally:
+        for archive in handles:
+            archive.close()
+    return len(members)
+
+
+def _patch_pth(python_install_path):
+    """
+    修改 pythonXY._pth：加入 Lib\\site-packages 并启用 import site，
+    这样 pip 安装的包可以被导入，.pth 文件也会被处理。
+    """
+    pth_files = [name for name in os.listdir(python_install_path) if name.endswith('._pth')]
+    if not pth_files:
+        raise zipfile.BadZipFile("The embeddable package has no ._pth file.")
+    pth_path = os.path.join(python_install_path, pth_files[0])
+    with open(pth_path, 'r', encoding='utf-8') as f:
+        lines = f.read().splitlines()
+    lines = [line for line in lines if line.strip() not in ('import site', '#import site', 'Lib\\site-packages', 'Lib/site-packages')]
+    lines += ['Lib\\site-packages', 'import site']
+    with open(pth_path, 'w', encoding='utf-8', newline='\r\n') as f:
+        f.write('\n'.join(lines) + '\n')
+    os.makedirs(os.path.join(python_install_path, 'Lib', 'site-packages'), exist_ok=True)
+
+
+def provision_runtime(version, arch, project_dir, jobs=None):
+    """
+    不借助 PowerShell 直接布置嵌入式 Python：流式下载官方 zip（可断点续传）、并行解压、修改 ._pth 并创建 Lib/site-packages。
+    先解压到临时目录，成功后再改名，失败时不会留下半成品。返回运行时目录。
+    """
+    python_install_path = os.path.join(project_dir, f"python-{version}-embed-{arch}")
+    url = get_embed_url(version, arch)
+    zip_path = os.path.join(get_cache_dir('downloads'), os.path.basename(url))
+    click.echo(f"Downloading {url}...")
+    download_file(url, zip_path)
+
+    tmp_path = f"{python_install_path}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    try:
+        started = time.perf_counter()
+        count = _extract_parallel(zip_path, tmp_path, jobs=jobs)
+        _patch_pth(tmp_path)
+        if os.path.exists(python_install_path):
+            shutil.rmtree(python_install_path)
+        os.replace(tmp_path, python_install_path)
+    except BaseException:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        raise
+    finally:
+        # 下载的 zip 只用于解压，运行时本身由运行时缓存保存
+        if os.path.exists(zip_path):
+            os.remove(zip_path)
+    click.secho(f"Embedded Python {version} ({arch}) extracted to {python_install_path} ({count} files in {time.perf_counter() - started:.1f}s).", fg='green')
+    return python_install_path
+
+
+def download_runtime(version, arch, project_dir, jobs=None):
+    """下载并布置运行时；原生方式失败时在 Windows 上退回到 PythonEmbed4Win 脚本。"""
+    try:
+        return provision_runtime(version, arch, project_dir, jobs=jobs)
+    except (DownloadError, zipfile.BadZipFile, OSError) as e:
+        if os.name != 'nt':
+            click.secho(f"Error provisioning Python {version} ({arch}): {e}", fg='red', bold=True)
+            sys.exit(1)
+        click.secho(f"Native runtime provisioning failed ({e}). Falling back to the PowerShell script...", fg='yellow')
+    return download_and_run_ps_script(version=version, arch=arch, project_dir=project_dir)
+
+
 def download_and_run_ps_script(version, arch, project_dir):
     """在指定的项目目录中，下载并执行 PythonEmbed4Win.ps1 脚本。"""
     script_path = os.path.join(project_dir, "PythonEmbed4Win.ps1")
@@ -116,12 +300,15 @@ def download_and_run_ps_script(version, arch, project_dir):
 
     try:
         click.echo(f"Downloading PowerShell script to {project_dir}...")
-        response = requests.get(script_url)
-        response.raise_for_status()
-        with open(script_path, 'w', encoding='utf-8-sig') as f:
-            f.write(response.text)
+        download_file(script_url, script_path)
+        # Windows PowerShell 5 只有在带 BOM 时才按 UTF-8 读取脚本
+        with open(script_path, 'rb') as f:
+            content = f.read()
+        if not content.startswith(codecs.BOM_UTF8):
+            with open(script_path, 'wb') as f:
+                f.write(codecs.BOM_UTF8 + content)
         click.secho("Download complete.", fg='green')
-    except requests.RequestException as e:
+    except DownloadError as e:
         click.secho(f"Error downloading script: {e}", fg='red')
         sys.exit(1)
 
@@ -141,24 +328,103 @@ def download_and_run_ps_script(version, arch, project_dir):
     click.echo(f"Attempting to install Python into: {python_install_path}")
     
     try:
-        process = subprocess.run(
-            command,
-            capture_output=True,
-            text=True,
-            check=True,
-            cwd=project_dir,
-            encoding='mbcs',
-            errors='ignore'
-        )
-        click.echo(process.stdout)
+        run_command(command, cwd=project_dir, label='powershell')
         click.secho(f"\nEmbedded Python downloaded successfully to {python_install_path}!", fg='green')
         return python_install_path
     except subprocess.CalledProcessError as e:
-        click.secho("An error occurred while running the PowerShell script:", fg='red')
-        click.secho(e.stderr, fg='red')
+        click.secho(f"An error occurred while running the PowerShell script (exit code {e.returncode}).", fg='red')
         click.secho("\nHint: Make sure you have 'Desktop development with C++' installed via Visual Studio Installer.", fg='yellow')
         sys.exit(1)
     finally:
         if os.path.exists(script_path):
             click.echo(f"Cleaning up {os.path.basename(script_path)}...")
-            os.remove(script_path)
\ No newline at end of file
+            os.remove(script_path)
+
+
+def _runtime_cache_key(version, arch):
+    return f"python-{version}-embed-{arch}"
+
+
+def _verify_cached_runtime(entry_dir):
+    """校验缓存中的运行时：逐个文件比对 SHA-256，返回 manifest 或 None。"""
+    manifest = read_manifest(entry_dir)
+    files_dir = os.path.join(entry_dir, 'files')
+    if not manifest or not os.path.isdir(files_dir):
+        return None
+    expected = manifest.get('files', {})
+    actual = hash_tree(files_dir)
+    if actual != expected or tree_digest(actual) != manifest.get('digest'):
+        return None
+    return manifest
+
+
+def _store_runtime_in_cache(python_install_path, version, arch, cache_dir):
+    """把刚下载好的运行时原子地存入缓存，返回条目目录。"""
+    key = _runtime_cache_key(version, arch)
+    entry_dir = os.path.join(cache_dir, key)
+    tmp_dir = os.path.join(cache_dir, f".tmp-{key}-{os.getpid()}")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    shutil.copytree(python_install_path, os.path.join(tmp_dir, 'files'))
+
+    file_hashes = hash_tree(os.path.join(tmp_dir, 'files'))
+    now = time.time()
+    manifest = {
+        'version': version,
+        'arch': arch,
+        'digest': tree_digest(file_hashes),
+        'files': file_hashes,
+        'size': sum(os.path.getsize(os.path.join(tmp_dir, 'files', p)) for p in file_hashes),
+        'created': now,
+        'last_used': now,
+    }
+    write_json_atomic(os.path.join(tmp_dir, MANIFEST_NAME), manifest)
+
+    # 另一个并发构建可能已经放入了同一个条目，此时保留先到者即可
+    try:
+        os.replace(tmp_dir, entry_dir)
+    except OSError:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    return entry_dir
+
+
+def get_python_runtime(version, arch, project_dir, offline=False, use_cache=True, cache_max_size_mb=None, jobs=None):
+    """获取嵌入式 Python：命中用户级缓存时直接链接/复制到项目中，否则下载并写入缓存。"""
+    python_install_path = os.path.join(project_dir, _runtime_cache_key(version, arch))
+    if not use_cache:
+        if offline:
+            click.secho("Error: --offline requires the runtime cache, but --no-cache was given.", fg='red', bold=True)
+            sys.exit(1)
+        return download_runtime(version, arch, project_dir, jobs=jobs)
+
+    cache_dir = get_cache_dir('runtimes')
+    entry_dir = os.path.join(cache_dir, _runtime_cache_key(version, arch))
+    click.echo("\n-------------------------------------")
+    click.secho(f"Looking up Python {version} ({arch}) in the runtime cache...", fg='cyan', bold=True)
+
+    manifest = _verify_cached_runtime(entry_dir) if os.path.isdir(entry_dir) else None
+    if manifest is None:
+        if os.path.isdir(entry_dir):
+            click.secho("Cached runtime failed checksum verification. Discarding it.", fg='yellow')
+            shutil.rmtree(entry_dir, ignore_errors=True)
+        if offline:
+            click.secho(f"Error: Python {version} ({arch}) is not in the runtime cache and --offline was given.", fg='red', bold=True)
+            click.secho(f"Run once without --offline to populate the cache at {cache_dir}.", fg='yellow')
+            sys.exit(1)
+        click.echo("Cache miss. Downloading the runtime...")
+        if os.path.exists(python_install_path):
+            shutil.rmtree(python_install_path)
+        python_install_path = download_runtime(version, arch, project_dir, jobs=jobs)
+        _store_runtime_in_cache(python_install_path, version, arch, cache_dir)
+        click.echo(f"Runtime stored in cache: {entry_dir}")
+    else:
+        click.secho(f"Cache hit (digest {manifest['digest'][:12]}).", fg='green')
+        if os.path.exists(python_install_path):
+            shutil.rmtree(python_install_path)
+        linked = materialize_tree(os.path.join(entry_dir, 'files'), python_install_path)
+        touch_entry(entry_dir)
+        click.secho(f"Runtime placed at {python_install_path} ({linked}/{len(manifest['files'])} files hardlinked).", fg='green')
+
+    max_bytes = (cache_max_size_mb if cache_max_size_mb is not None else DEFAULT_CACHE_MAX_SIZE_MB) * 1024 * 1024
+    for name in evict_lru(cache_dir, max_bytes, keep=(_runtime_cache_key(version, arch),)):
+        click.echo(f"Evicted cached runtime: {name}")
+    return python_install_path
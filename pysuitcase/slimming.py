@@ -0,0 +1,174 @@
+import click
+import fnmatch
+import os
+import shutil
+from collections import defaultdict
+
+from .cache import hash_file
+
+# 内置的裁剪规则集。以 '/' 结尾的模式匹配目录（整个删除），其余匹配文件；路径相对于 site-packages，使用 '/' 分隔
+PRUNE_RULE_SETS = {
+    'tests': [
+        '*/tests/', '*/test/', 'tests/', 'test/',
+        '*/test_*.py', '*/*_test.py', '*/conftest.py',
+    ],
+    'docs': [
+        '*/docs/', '*/doc/', '*/examples/', '*/sample_data/',
+        '*.md', '*.rst', '*/README', '*/README.txt', '*/CHANGELOG*', '*/HISTORY*',
+    ],
+    'headers': [
+        '*/include/', '*.h', '*.hpp', '*.hxx', '*.cuh', '*.pxd', '*.pyx', '*.lib', '*.a',
+    ],
+    'pycache': [
+        # 只删除 __pycache__ 里不属于目标解释器的 .pyc，见 _is_foreign_pyc
+    ],
+    'metadata': [
+        '*.dist-info/RECORD', '*.dist-info/INSTALLER', '*.dist-info/REQUESTED', '*.dist-info/direct_url.json',
+    ],
+    'qt': [
+        'PyQt5/Qt5/translations/', 'PyQt5/Qt/translations/',
+        'PyQt5/Qt5/qml/', 'PyQt5/Qt5/plugins/designer/', 'PyQt5/Qt5/plugins/sqldrivers/',
+        'PyQt5/Qt5/plugins/geoservices/', 'PyQt5/Qt5/plugins/sensors/', 'PyQt5/Qt5/plugins/sensorgestures/',
+        'PyQt5/Qt5/plugins/texttospeech/', 'PyQt5/Qt5/plugins/position/', 'PyQt5/Qt5/plugins/sceneparsers/',
+        'PyQt5/Qt5/plugins/geometryloaders/', 'PyQt5/Qt5/plugins/renderplugins/', 'PyQt5/Qt5/plugins/playlistformats/',
+        'PyQt5/Qt5/plugins/webview/', 'PyQt5/Qt5/plugins/assetimporters/',
+        'PyQt5/Qt5/bin/designer.exe', 'PyQt5/Qt5/bin/linguist.exe', 'PyQt5/Qt5/bin/assistant.exe',
+    ],
+}
+
+DEFAULT_PRUNE_RULES = ('tests', 'docs', 'headers', 'pycache')
+
+_BINARY_EXTENSIONS = ('.dll', '.pyd', '.so')
+
+
+def _size_by_package(site_packages):
+    """按 site-packages 顶层条目统计大小；.dist-info 等元数据目录计入其所属包，硬链接的文件只计一次。"""
+    seen = set()
+    sizes = defaultdict(int)
+    for entry in os.listdir(site_packages):
+        path = os.path.join(site_packages, entry)
+        if entry.endswith(('.dist-info', '.egg-info', '.data')):
+            key = entry.split('-')[0]
+        else:
+            key = os.path.splitext(entry)[0] if os.path.isfile(path) else entry
+        walker = [(site_packages, [], [entry])] if os.path.isfile(path) else os.walk(path)
+        for dirpath, _, filenames in walker:
+            for name in filenames:
+                full_path = os.path.join(dirpath, name)
+                if os.path.islink(full_path):
+                    continue
+                stat = os.stat(full_path)
+                inode = (stat.st_dev, stat.st_ino)
+                if inode in seen:
+                    continue
+                seen.add(inode)
+                sizes[key] += stat.st_size
+    return dict(sizes)
+
+
+def _is_foreign_pyc(rel_path, cache_tag):
+    return '/__pycache__/' in '/' + rel_path and rel_path.endswith('.pyc') and f'.{cache_tag}.' not in rel_path
+
+
+def prune_site_packages(site_packages, rule_names=DEFAULT_PRUNE_RULES, custom_globs=(), cache_tag=None):
+    """按规则删除 site-packages 中运行时用不到的文件，返回 (删除的文件数, 释放的字节数)。"""
+    patterns = list(custom_globs)
+    for name in rule_names:
+        patterns += PRUNE_RULE_SETS[name]
+    dir_patterns = [p.rstrip('/') for p in patterns if p.endswith('/')]
+    file_patterns = [p for p in patterns if not p.endswith('/')]
+    check_pycache = 'pycache' in rule_names and cache_tag
+
+    removed_files, freed = 0, 0
+    for dirpath, dirnames, filenames in os.walk(site_packages):
+        rel_dir = os.path.relpath(dirpath, site_packages).replace(os.sep, '/')
+        rel_dir = '' if rel_dir == '.' else rel_dir + '/'
+        for dirname in list(dirnames):
+            rel_path = rel_dir + dirname
+            if any(fnmatch.fnmatchcase(rel_path, p) for p in dir_patterns):
+                full_path = os.path.join(dirpath, dirname)
+                for sub_dirpath, _, sub_files in os.walk(full_path):
+                    for sub_name in sub_files:
+                        freed += os.path.getsize(os.path.join(sub_dirpath, sub_name))
+                        removed_files += 1
+                shutil.rmtree(full_path, ignore_errors=True)
+                dirnames.remove(dirname)
+        for filename in filenames:
+            rel_path = rel_dir + filename
+            if any(fnmatch.fnmatchcase(rel_path, p) for p in file_patterns) or (check_pycache and _is_foreign_pyc(rel_path, cache_tag)):
+                full_path = os.path.join(dirpath, filename)
+                freed += os.path.getsize(full_path)
+                removed_files += 1
+                os.remove(full_path)
+    return removed_files, freed
+
+
+def dedupe_binaries(site_packages):
+    """把内容完全相同的 DLL/扩展模块替换为硬链接，返回 (合并的文件数, 节省的字节数)。"""
+    by_size = defaultdict(list)
+    for dirpath, _, filenames in os.walk(site_packages):
+        for name in filenames:
+            if name.lower().endswith(_BINARY_EXTENSIONS):
+                full_path = os.path.join(dirpath, name)
+                by_size[os.path.getsize(full_path)].append(full_path)
+
+    merged, saved = 0, 0
+    for size, paths in by_size.items():
+        if len(paths) < 2 or size == 0:
+            continue
+        by_hash = defaultdict(list)
+        for path in paths:
+            by_hash[hash_file(path)].append(path)
+        for duplicates in by_hash.values():
+            original = duplicates[0]
+            for duplicate in duplicates[1:]:
+                if os.path.samefile(original, duplicate):
+                    continue
+                tmp_path = duplicate + '.pysuitcase-link'
+                try:
+                    os.link(original, tmp_path)
+                except OSError:
+                    continue
+                os.replace(tmp_path, duplicate)
+                merged += 1
+                saved += size
+    return merged, saved
+
+
+def _format_mb(num_bytes):
+    return f"{num_bytes / 1024 / 1024:9.1f} MB"
+
+
+def print_size_report(before, after, limit=25):
+    """打印每个包裁剪前后的大小对比。"""
+    click.echo(f"  {'Package':<32}{'Before':>13}{'After':>13}{'Saved':>13}")
+    rows = sorted(before.items(), key=lambda item: item[1], reverse=True)
+    for package, size_before in rows[:limit]:
+        size_after = after.get(package, 0)
+        click.echo(f"  {package[:31]:<32}{_format_mb(size_before)}{_format_mb(size_after)}{_format_mb(size_before - size_after)}")
+    if len(rows) > limit:
+        click.echo(f"  ... and {len(rows) - limit} smaller packages")
+    total_before, total_after = sum(before.values()), sum(after.values())
+    click.secho(f"  {'TOTAL':<32}{_format_mb(total_before)}{_format_mb(total_after)}{_format_mb(total_before - total_after)}", bold=True)
+
+
+def slim_bundle(site_packages, rule_names=DEFAULT_PRUNE_RULES, custom_globs=(), dedupe=False, python_version=None):
+    """裁剪阶段：删除无用文件、合并重复的二进制文件，并输出每个包的大小报告。"""
+    click.echo("\n-------------------------------------")
+    click.secho("Slimming the bundle...", fg='cyan', bold=True)
+    if not os.path.isdir(site_packages):
+        click.secho(f"Warning: '{site_packages}' not found. Nothing to slim.", fg='yellow')
+        return
+    cache_tag = None
+    if python_version:
+        major, minor = python_version.split('.')[:2]
+        cache_tag = f"cpython-{major}{minor}"
+
+    before = _size_by_package(site_packages)
+    click.echo(f"Rule sets: {', '.join(rule_names) or 'none'}; custom globs: {', '.join(custom_globs) or 'none'}")
+    removed_files, freed = prune_site_packages(site_packages, rule_names, custom_globs, cache_tag)
+    click.echo(f"Removed {removed_files} files ({freed / 1024 / 1024:.1f} MB).")
+    if dedupe:
+        merged, saved = dedupe_binaries(site_packages)
+        click.echo(f"Hardlinked {merged} duplicate binaries ({saved / 1024 / 1024:.1f} MB).")
+    print_size_report(before, _size_by_package(site_packages))
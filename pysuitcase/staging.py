@@ -0,0 +1,108 @@
+import click
+import os
+import shutil
+import subprocess
+import sys
+
+from .installer import install_locked
+from .lockfile import ensure_lock, lock_has_only_wheels
+from .runner import run_command
+from .wheelhouse import BUILD_ESSENTIALS, _mirror_args, cross_platform_args, fill_wheelhouse, get_target_tag, report_missing_wheels
+
+def _stage(site_packages, sources, python_version, arch, mirror, wheelhouse_dir, pip_args=(), quiet=False):
+    """用宿主 pip 把目标平台的 wheel 解包到 site_packages；失败时返回 pip 输出的最后若干行，成功时返回 None。"""
+    command = [
+        sys.executable, "-m", "pip", "install", "--target", site_packages, "--upgrade", "--no-compile",
+        "--disable-pip-version-check",
+    ] + cross_platform_args(python_version, arch) + list(pip_args)
+    if wheelhouse_dir:
+        command += ["--no-index", "--find-links", wheelhouse_dir]
+    else:
+        command += _mirror_args(mirror)
+    command += list(sources)
+    # pip 会把宿主平台的控制台脚本写到 <target>/bin，对 Windows 目标没有用处
+    bin_dir = os.path.join(site_packages, 'bin')
+    had_bin = os.path.isdir(bin_dir)
+    if not quiet:
+        click.echo(f"Running command: {' '.join(command)}")
+    try:
+        run_command(command, label='pip', echo=not quiet)
+        return None
+    except subprocess.CalledProcessError as e:
+        return e.output or ''
+    finally:
+        if not had_bin and os.path.isdir(bin_dir):
+            shutil.rmtree(bin_dir, ignore_errors=True)
+
+
+def _stage_from_wheelhouse(site_packages, sources, python_version, arch, mirror, wheelhouse_dir, offline, pip_args=()):
+    """先只用 wheelhouse 暂存；缺少 wheel 时（非离线模式）用 pip download 补齐后再暂存一次。"""
+    if _stage(site_packages, sources, python_version, arch, mirror, wheelhouse_dir, pip_args, quiet=True) is None:
+        click.echo("Staged entirely from the wheelhouse.")
+        return None
+    if not offline:
+        click.echo("Wheelhouse is missing some wheels. Fetching them once...")
+        requirements_path = sources[1] if sources[0] == "-r" else None
+        packages = () if requirements_path else sources
+        # 补齐失败时仍然暂存一次，由 pip 的报错指出具体缺少哪些 wheel
+        fill_wheelhouse(wheelhouse_dir, python_version, arch, requirements_path, packages, mirror, pip_args=pip_args)
+    return _stage(site_packages, sources, python_version, arch, mirror, wheelhouse_dir, pip_args)
+
+
+def _report_failure(output, python_version, arch, what):
+    if not report_missing_wheels(output, python_version, arch):
+        click.secho(f"Failed to stage {what} for {get_target_tag(python_version, arch)}.", fg='red', bold=True)
+
+
+def stage_dependencies(site_packages, requirements_path, python_version, arch, mirror=None, wheelhouse_dir=None, offline=False,
+                       lock_path=None, relock=False, parallel_install=True, jobs=None):
+    """
+    不运行目标解释器，直接用宿主 pip 按目标平台标签（如 cp311-win_amd64）下载 wheel 并解包到 bundle 的 site-packages。
+    只接受二进制 wheel；某个包只有 sdist 时明确报错并返回 False。
+    有锁文件与 wheelhouse 时（parallel_install）由并行安装器直接解包锁定的 wheel，不能处理时再交给 pip。
+    """
+    os.makedirs(site_packages, exist_ok=True)
+
+    # --- 步骤 1: 构建工具 ---
+    click.echo("\n-------------------------------------")
+    click.secho(f"Step 1/2: Staging build essentials for {get_target_tag(python_version, arch)}...", fg='cyan', bold=True)
+    if wheelhouse_dir:
+        click.echo(f"Using wheelhouse: {wheelhouse_dir}")
+        output = _stage_from_wheelhouse(site_packages, BUILD_ESSENTIALS, python_version, arch, mirror, wheelhouse_dir, offline)
+    else:
+        output = _stage(site_packages, BUILD_ESSENTIALS, python_version, arch, mirror, None)
+    if output is not None:
+        _report_failure(output, python_version, arch, "build essentials")
+        return False
+    click.secho("Build essentials staged successfully.", fg='green')
+
+    if not os.path.exists(requirements_path):
+        click.secho(f"Warning: '{requirements_path}' not found. Skipping dependency installation.", fg='yellow')
+        return True
+
+    # --- 步骤 2: requirements 中的所有包 ---
+    click.echo("\n-------------------------------------")
+    click.secho(f"Step 2/2: Staging packages from {os.path.basename(requirements_path)}...", fg='cyan', bold=True)
+    pip_args = []
+    source = requirements_path
+    if lock_path:
+        if not ensure_lock(None, requirements_path, lock_path, python_version, arch, mirror=mirror,
+                           wheelhouse_dir=wheelhouse_dir, offline=offline, relock=relock, cross=True):
+            return False
+        source = lock_path
+        pip_args = ["--no-deps", "--require-hashes"]
+        if parallel_install and wheelhouse_dir and lock_has_only_wheels(lock_path):
+            runtime_dir = os.path.dirname(os.path.dirname(site_packages))
+            if install_locked(runtime_dir, lock_path, wheelhouse_dir, python_version, arch, mirror=mirror, offline=offline, jobs=jobs):
+                click.secho("Dependencies staged successfully!", fg='green')
+                return True
+
+    if wheelhouse_dir:
+        output = _stage_from_wheelhouse(site_packages, ["-r", source], python_version, arch, mirror, wheelhouse_dir, offline, pip_args)
+    else:
+        output = _stage(site_packages, ["-r", source], python_version, arch, mirror, None, pip_args)
+    if output is not None:
+        _report_failure(output, python_version, arch, "dependencies")
+        return False
+    click.secho("Dependencies staged successfully!", fg='green')
+    return True
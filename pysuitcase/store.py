@@ -0,0 +1,298 @@
+import click
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .cache import get_cache_dir, hash_file, write_json_atomic
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# 运行时中由 pip 写入的目录；仓库记录并恢复的就是这两个目录的内容
+STORE_SUBDIRS = ('Lib/site-packages', 'Scripts')
+# Linux 上的 FICLONE ioctl：在 Btrfs、XFS 等文件系统上创建写时复制的克隆
+_FICLONE = 0x40049409
+
+
+def get_store_dir():
+    """返回内容寻址仓库的目录，可通过 PYSUITCASE_STORE_DIR 放到与项目相同的磁盘上，以便使用硬链接。"""
+    store_dir = os.environ.get('PYSUITCASE_STORE_DIR') or get_cache_dir('store')
+    for name in ('objects', 'trees'):
+        os.makedirs(os.path.join(store_dir, name), exist_ok=True)
+    return os.path.abspath(store_dir)
+
+
+def _object_path(store_dir, digest):
+    return os.path.join(store_dir, 'objects', digest[:2], digest[2:])
+
+
+def _tree_path(store_dir, key):
+    return os.path.join(store_dir, 'trees', f"{key}.json")
+
+
+def _reflink(src, dst):
+    if fcntl is None or not sys.platform.startswith('linux'):
+        return False
+    try:
+        with open(src, 'rb') as s, open(dst, 'wb') as d:
+            fcntl.ioctl(d.fileno(), _FICLONE, s.fileno())
+    except OSError:
+        if os.path.exists(dst):
+            os.remove(dst)
+        return False
+    shutil.copystat(src, dst)
+    return True
+
+
+def place_file(src, dst):
+    """按硬链接、reflink、复制的顺序放置文件，返回实际使用的方式（'link'、'clone' 或 'copy'）。"""
+    try:
+        os.link(src, dst)
+        return 'link'
+    except OSError:
+        # 跨磁盘、文件系统不支持或超过硬链接数上限（NTFS 为 1024）
+        pass
+    if _reflink(src, dst):
+        return 'clone'
+    shutil.copy2(src, dst)
+    return 'copy'
+
+
+def _walk_files(runtime_dir):
+    """返回运行时中 STORE_SUBDIRS 下所有文件的相对路径（/ 分隔）。"""
+    files = []
+    for subdir in STORE_SUBDIRS:
+        for dirpath, _, filenames in os.walk(os.path.join(runtime_dir, subdir)):
+            for name in filenames:
+                files.append(os.path.relpath(os.path.join(dirpath, name), runtime_dir).replace(os.sep, '/'))
+    return files
+
+
+def _has_stats(tree):
+    """目录树 files 的每一项都是 [sha256, 大小, 对象的修改时间（纳秒）]；旧版本记录的项更少，这样的目录树不再使用。"""
+    return all(isinstance(entry, list) and len(entry) == 3 for entry in tree.get('files', {}).values())
+
+
+def _tree_digests(tree):
+    """目录树引用的所有对象。"""
+    return {entry[0] for entry in tree.get('files', {}).values()}
+
+
+def load_tree(key):
+    """读取 key 对应的目录树清单；清单缺失、损坏、缺少文件大小与修改时间（旧版本写入）或有对象已被删除时返回 None。"""
+    store_dir = get_store_dir()
+    try:
+        with open(_tree_path(store_dir, key), 'r', encoding='utf-8') as f:
+            tree = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not _has_stats(tree) or not all(os.path.exists(_object_path(store_dir, digest)) for digest in _tree_digests(tree)):
+        return None
+    return tree
+
+
+def _check_object(store_dir, digest, size, mtime_ns):
+    """
+    对象的大小与修改时间都与目录树记录的一致时视为完好。任一不同说明项目中硬链接到它的文件可能被原地修改过，
+    此时重新哈希：内容未变时返回对象当前的修改时间，供目录树更新记录；内容已变则删除这个对象，
+    使引用它的目录树全部失效，并返回 None。
+    """
+    obj = _object_path(store_dir, digest)
+    try:
+        stat = os.stat(obj)
+        if stat.st_size == size and stat.st_mtime_ns == mtime_ns:
+            return mtime_ns
+        if stat.st_size == size and hash_file(obj) == digest:
+            return stat.st_mtime_ns
+        os.remove(obj)
+    except OSError:
+        pass
+    return None
+
+
+def _ingest_file(store_dir, path):
+    """把一个文件放入仓库并让项目中的文件与仓库对象共享同一份数据。返回 (sha256, 大小, 对象的修改时间, 是否已与对象共享)。"""
+    digest = hash_file(path)
+    size = os.path.getsize(path)
+    obj = _object_path(store_dir, digest)
+    if not os.path.exists(obj):
+        os.makedirs(os.path.dirname(obj), exist_ok=True)
+        tmp = f"{obj}.tmp-{os.getpid()}-{threading.get_ident()}"
+        shared = place_file(path, tmp) == 'link'
+        os.replace(tmp, obj)
+        return digest, size, os.stat(obj).st_mtime_ns, shared
+    if os.path.samefile(path, obj):
+        return digest, size, os.stat(obj).st_mtime_ns, True
+    # 仓库中已有相同内容：把项目中的副本替换为指向对象的硬链接
+    tmp = f"{path}.tmp-store-{os.getpid()}"
+    try:
+        os.link(obj, tmp)
+        os.replace(tmp, path)
+        return digest, size, os.stat(obj).st_mtime_ns, True
+    except OSError:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        return digest, size, os.stat(obj).st_mtime_ns, False
+
+
+def save_tree(runtime_dir, keys, jobs=None):
+    """把刚安装好的依赖去重存入仓库，并以 keys 中的每个键记录目录树清单。"""
+    store_dir = get_store_dir()
+    started = time.perf_counter()
+    files = _walk_files(runtime_dir)
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        results = list(executor.map(lambda rel: _ingest_file(store_dir, os.path.join(runtime_dir, rel)), files))
+
+    now = time.time()
+    tree = {
+        'files': {rel: [digest, size, mtime_ns] for rel, (digest, size, mtime_ns, _) in zip(files, results)},
+        'size': sum(size for _, size, _, _ in results),
+        'created': now,
+        'last_used': now,
+    }
+    for key in dict.fromkeys(keys):
+        write_json_atomic(_tree_path(store_dir, key), tree)
+    shared = sum(size for _, size, _, linked in results if linked)
+    click.secho(f"Stored {len(files)} installed files in {store_dir} ({shared / 1024 / 1024:.1f} of "
+                f"{tree['size'] / 1024 / 1024:.1f} MB shared via hardlinks, {time.perf_counter() - started:.1f}s).", fg='green')
+
+
+def restore_tree(key, runtime_dir, jobs=None):
+    """
+    用仓库中记录的目录树替换运行时中的 site-packages 与 Scripts，不运行 pip。
+    对象缺失或被修改过（大小或修改时间与记录不符，且重新哈希后内容也不同）时删除该目录树并返回 False，此时运行时保持不变。
+    """
+    tree = load_tree(key)
+    if tree is None:
+        return False
+    store_dir = get_store_dir()
+    started = time.perf_counter()
+    objects = {digest: (size, mtime_ns) for digest, size, mtime_ns in tree['files'].values()}
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        mtimes = dict(zip(objects, executor.map(lambda item: _check_object(store_dir, item[0], *item[1]), objects.items())))
+    damaged = sum(mtime_ns is None for mtime_ns in mtimes.values())
+    if damaged:
+        click.secho(f"{damaged} file(s) in the package store were modified in place (a project edited its hardlinked copy).", fg='yellow')
+        os.remove(_tree_path(store_dir, key))
+        return False
+    click.echo("\n-------------------------------------")
+    click.secho(f"Restoring {len(tree['files'])} installed files from the package store...", fg='cyan', bold=True)
+    for subdir in STORE_SUBDIRS:
+        shutil.rmtree(os.path.join(runtime_dir, subdir), ignore_errors=True)
+    os.makedirs(os.path.join(runtime_dir, 'Lib', 'site-packages'), exist_ok=True)
+
+    def _place(item):
+        rel, (digest, _, _) = item
+        dst = os.path.join(runtime_dir, *rel.split('/'))
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        return place_file(_object_path(store_dir, digest), dst)
+
+    try:
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            modes = list(executor.map(_place, tree['files'].items()))
+    except OSError as e:
+        click.secho(f"Failed to restore from the package store: {e}", fg='red', bold=True)
+        os.remove(_tree_path(store_dir, key))
+        return False
+
+    # 内容未变、只是修改时间变了的对象（例如被 touch 过）记录新的时间，下次不必再哈希
+    for entry in tree['files'].values():
+        entry[2] = mtimes[entry[0]]
+    tree['last_used'] = time.time()
+    write_json_atomic(_tree_path(store_dir, key), tree)
+    counts = ', '.join(f"{modes.count(mode)} {label}" for mode, label in (('link', 'hardlinked'), ('clone', 'cloned'), ('copy', 'copied'))
+                       if modes.count(mode))
+    click.secho(f"Dependencies restored from the store ({counts or 'no files'}) in {time.perf_counter() - started:.1f}s.", fg='green')
+    return True
+
+
+def _scan_objects(store_dir):
+    """返回仓库中每个对象的 (路径, sha256, 大小, 硬链接数)。"""
+    objects = []
+    objects_dir = os.path.join(store_dir, 'objects')
+    for prefix in os.listdir(objects_dir):
+        prefix_dir = os.path.join(objects_dir, prefix)
+        if not os.path.isdir(prefix_dir):
+            continue
+        for name in os.listdir(prefix_dir):
+            path = os.path.join(prefix_dir, name)
+            if '.tmp-' in name:
+                continue
+            stat = os.stat(path)
+            objects.append((path, prefix + name, stat.st_size, stat.st_nlink))
+    return objects
+
+
+def _load_trees(store_dir):
+    trees = {}
+    trees_dir = os.path.join(store_dir, 'trees')
+    for name in os.listdir(trees_dir):
+        if not name.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(trees_dir, name), 'r', encoding='utf-8') as f:
+                trees[name[:-len('.json')]] = json.load(f)
+        except (OSError, ValueError):
+            trees[name[:-len('.json')]] = None
+    return trees
+
+
+def store_status():
+    """统计仓库：对象与目录树数量、实际占用、仍被项目硬链接的部分以及节省的空间。"""
+    store_dir = get_store_dir()
+    objects = _scan_objects(store_dir)
+    trees = _load_trees(store_dir)
+    return {
+        'store_dir': store_dir,
+        'objects': len(objects),
+        'trees': len(trees),
+        'size': sum(size for _, _, size, _ in objects),
+        'linked_objects': sum(1 for _, _, _, nlink in objects if nlink > 1),
+        'unlinked_size': sum(size for _, _, size, nlink in objects if nlink <= 1),
+        # 每个额外的硬链接都是一份没有写到磁盘上的副本
+        'saved': sum(size * (nlink - 2) for _, _, size, nlink in objects if nlink > 2),
+    }
+
+
+def gc_store(max_age_days=None, dry_run=False):
+    """
+    清理仓库。硬链接数为 1 的对象已没有任何项目在使用（以复制方式放置的项目无法被识别）。
+    没有对象仍被链接、且超过 max_age_days 天未使用的目录树会被删除；随后删除不再被任何目录树引用、且硬链接数为 1 的对象。
+    返回 (删除的目录树数, 删除的对象数, 释放的字节数)。
+    """
+    store_dir = get_store_dir()
+    objects = _scan_objects(store_dir)
+    nlinks = {digest: nlink for _, digest, _, nlink in objects}
+    cutoff = time.time() - max_age_days * 86400 if max_age_days is not None else None
+
+    removed_trees = []
+    kept = set()
+    for key, tree in _load_trees(store_dir).items():
+        if tree is None or not _has_stats(tree):
+            removed_trees.append(key)
+            continue
+        digests = _tree_digests(tree)
+        in_use = any(nlinks.get(digest, 0) > 1 for digest in digests)
+        stale = cutoff is not None and not in_use and tree.get('last_used', 0) < cutoff
+        if stale:
+            removed_trees.append(key)
+        else:
+            kept.update(digests)
+
+    removed_objects = freed = 0
+    for path, digest, size, nlink in objects:
+        if nlink <= 1 and digest not in kept:
+            removed_objects += 1
+            freed += size
+            if not dry_run:
+                os.remove(path)
+    if not dry_run:
+        for key in removed_trees:
+            os.remove(_tree_path(store_dir, key))
+    return len(removed_trees), removed_objects, freed
@@ -0,0 +1,245 @@
+#include <windows.h>
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <direct.h>
+
+// 预编译的启动器存根：控制台版与无窗口版（定义 PYSUITCASE_NO_WINDOW）由同一份源码编译。
+// 配置块在构建时由 pysuitcase 直接改写 exe 中的字节，因此每次构建都无需重新编译。
+// 格式：魔数（含结尾的 NUL）后跟若干以 NUL 结尾的 "键=值" 字符串，以空字符串结束。
+// 魔数与大小需与 pysuitcase/launcher.py 保持一致；魔数只能在这里出现一次。
+#define CONFIG_MAGIC "PYSUITCASE-LAUNCHER-CFG1"
+#define CONFIG_SIZE 4096
+
+volatile const char pysuitcase_config[CONFIG_SIZE] = CONFIG_MAGIC;
+
+static char config[CONFIG_SIZE];
+static char command[CONFIG_SIZE + 256];
+// 额外留出 Windows 命令行的最大长度，用于转发启动器自身收到的参数
+static wchar_t wide_command[CONFIG_SIZE + 256 + 32768];
+
+static void ShowError(const char *message)
+{
+#ifdef PYSUITCASE_NO_WINDOW
+    MessageBoxA(NULL, message, "PySuitcase Critical Error", MB_OK | MB_ICONERROR);
+#else
+    fprintf(stderr, "PySuitcase Error: %s\n", message);
+#endif
+}
+
+// 返回配置中 key 对应的值，不存在时返回 NULL
+static const char *ConfigValue(const char *key)
+{
+    size_t key_len = strlen(key);
+    const char *entry = config + sizeof(CONFIG_MAGIC);
+    while (entry < config + CONFIG_SIZE && *entry)
+    {
+        if (strncmp(entry, key, key_len) == 0 && entry[key_len] == '=')
+            return entry + key_len + 1;
+        entry += strlen(entry) + 1;
+    }
+    return NULL;
+}
+
+// 应用 "env:名称=值" 形式的环境变量覆盖，子进程会继承它们
+static void ApplyEnvironment(void)
+{
+    char name[256];
+    const char *entry = config + sizeof(CONFIG_MAGIC);
+    while (entry < config + CONFIG_SIZE && *entry)
+    {
+        const char *equals = strchr(entry, '=');
+        if (strncmp(entry, "env:", 4) == 0 && equals && (size_t)(equals - entry - 4) < sizeof(name))
+        {
+            memcpy(name, entry + 4, equals - entry - 4);
+            name[equals - entry - 4] = '\0';
+            _putenv_s(name, equals + 1);
+        }
+        entry += strlen(entry) + 1;
+    }
+}
+
+// 返回启动器自身命令行中程序名之后的部分。命令行不经过 cmd.exe，
+// 原样交给 Python，由它按与启动器相同的规则拆成 sys.argv[1:]，& ^ % 等字符不会被解释
+static const wchar_t *ForwardedArguments(void)
+{
+    const wchar_t *p = GetCommandLineW();
+    if (*p == L'"')
+    {
+        p++;
+        while (*p && *p != L'"')
+            p++;
+        if (*p)
+            p++;
+    }
+    else
+    {
+        while (*p && *p != L' ' && *p != L'\t')
+            p++;
+    }
+    while (*p == L' ' || *p == L'\t')
+        p++;
+    return p;
+}
+
+// 读取配置、切换到 app 目录并拼出要执行的命令行；失败时返回 0
+static int PrepareCommand(void)
+{
+    const char *app_folder, *python, *args, *preload, *module, *function;
+    int i;
+
+    for (i = 0; i < CONFIG_SIZE; i++)
+        config[i] = pysuitcase_config[i];
+    config[CONFIG_SIZE - 1] = '\0';
+
+    app_folder = ConfigValue("app_folder");
+    python = ConfigValue("python");
+    args = ConfigValue("args");
+    preload = ConfigValue("preload");
+    module = ConfigValue("module");
+    function = ConfigValue("function");
+    if (!app_folder || !python || !module || !function)
+    {
+        ShowError("This launcher has not been configured by pysuitcase.");
+        return 0;
+    }
+
+    // 关键步骤：在执行任何操作前，先切换到 app 目录
+    if (_chdir(app_folder) != 0)
+    {
+        ShowError("Could not change directory to app folder.");
+        return 0;
+    }
+    ApplyEnvironment();
+
+    // preload（可选）在导入入口模块之前执行，例如安装 --pack 的导入器或交给 --warm 的预热进程
+    // 截断后的 -c 语句无法正确执行，因此 _snprintf_s 截断（返回 -1）时与下面的转换失败一样报错
+    // 配置以 UTF-8 保存；转成宽字符后接上转发的参数，由 CreateProcessW 直接启动，不经过 shell
+    if (_snprintf_s(command, sizeof(command), _TRUNCATE,
+                    "\"%s\" %s -c \"import os, sys; sys.path.append(os.getcwd()); %s%simport %s; %s.%s()\" ",
+                    python, args ? args : "", preload ? preload : "", preload ? "; " : "", module, module, function) < 0 ||
+        !MultiByteToWideChar(CP_UTF8, 0, command, -1, wide_command, CONFIG_SIZE + 256) ||
+        wcsncat_s(wide_command, sizeof(wide_command) / sizeof(wchar_t), ForwardedArguments(), _TRUNCATE) != 0)
+    {
+        ShowError("The command line is too long.");
+        return 0;
+    }
+    return 1;
+}
+
+// 启动 Python 进程；std_handles 不为 NULL 时把这三个句柄（输入、输出、错误）交给它
+static BOOL StartPython(HANDLE *std_handles, DWORD flags, PROCESS_INFORMATION *pi)
+{
+    STARTUPINFOW si;
+
+    ZeroMemory(&si, sizeof(si));
+    si.cb = sizeof(si);
+    si.dwFlags = STARTF_USESTDHANDLES;
+    if (std_handles)
+    {
+        si.hStdInput = std_handles[0];
+        si.hStdOutput = std_handles[1];
+        si.hStdError = std_handles[2];
+    }
+    ZeroMemory(pi, sizeof(*pi));
+    // CreateProcessW 会在当前目录（我们已经切换好了）执行命令
+    return CreateProcessW(NULL, wide_command, NULL, NULL, std_handles != NULL, flags, NULL, NULL, &si, pi);
+}
+
+// 等待 Python 进程结束并返回它的退出码
+static int WaitForPython(PROCESS_INFORMATION *pi)
+{
+    DWORD exit_code = 1;
+    WaitForSingleObject(pi->hProcess, INFINITE);
+    GetExitCodeProcess(pi->hProcess, &exit_code);
+    CloseHandle(pi->hProcess);
+    CloseHandle(pi->hThread);
+    return (int)exit_code;
+}
+
+#ifdef PYSUITCASE_NO_WINDOW
+
+static HANDLE OpenConsoleHandle(const wchar_t *name, DWORD access)
+{
+    SECURITY_ATTRIBUTES sa;
+    sa.nLength = sizeof(sa);
+    sa.lpSecurityDescriptor = NULL;
+    sa.bInheritHandle = TRUE;
+    return CreateFileW(name, access, FILE_SHARE_READ | FILE_SHARE_WRITE, &sa, OPEN_EXISTING, 0, NULL);
+}
+
+// WinMain 是为 /SUBSYSTEM:WINDOWS 准备的
+int WINAPI WinMain(HINSTANCE hInstance, HINSTANCE hPrevInstance, LPSTR lpCmdLine, int nCmdShow)
+{
+    PROCESS_INFORMATION pi;
+
+    if (!PrepareCommand())
+        return 1;
+
+    // 尝试附加到父进程的控制台，并把它的输入输出交给 Python
+    if (AttachConsole(ATTACH_PARENT_PROCESS))
+    {
+        HANDLE std_handles[3];
+        int exit_code = 1;
+        std_handles[0] = OpenConsoleHandle(L"CONIN$", GENERIC_READ | GENERIC_WRITE);
+        std_handles[1] = OpenConsoleHandle(L"CONOUT$", GENERIC_READ | GENERIC_WRITE);
+        std_handles[2] = std_handles[1];
+        if (StartPython(std_handles, 0, &pi))
+            exit_code = WaitForPython(&pi);
+        else
+            ShowError("Failed to start the Python interpreter.");
+        CloseHandle(std_handles[0]);
+        CloseHandle(std_handles[1]);
+        FreeConsole();
+        return exit_code;
+    }
+
+    // 在后台静默执行命令
+    if (!StartPython(NULL, CREATE_NO_WINDOW, &pi))
+    {
+        ShowError("Failed to create process in hidden mode.");
+        return 1;
+    }
+    CloseHandle(pi.hProcess);
+    CloseHandle(pi.hThread);
+    return 0;
+}
+
+#else
+
+// Ctrl+C 同样会发给 Python 进程；启动器自己忽略它，等待 Python 处理完再以它的退出码退出
+static BOOL WINAPI IgnoreCtrlEvent(DWORD ctrl_type)
+{
+    return ctrl_type == CTRL_C_EVENT || ctrl_type == CTRL_BREAK_EVENT;
+}
+
+// main 函数是为 /SUBSYSTEM:CONSOLE 准备的
+int main()
+{
+    HANDLE std_handles[3];
+    PROCESS_INFORMATION pi;
+    int i;
+
+    if (!PrepareCommand())
+        return 1;
+
+    SetConsoleCtrlHandler(IgnoreCtrlEvent, TRUE);
+    // Python 直接继承启动器的标准输入输出（控制台、管道或重定向的文件）
+    std_handles[0] = GetStdHandle(STD_INPUT_HANDLE);
+    std_handles[1] = GetStdHandle(STD_OUTPUT_HANDLE);
+    std_handles[2] = GetStdHandle(STD_ERROR_HANDLE);
+    for (i = 0; i < 3; i++)
+    {
+        // 只有可继承的句柄才能交给子进程；控制台伪句柄（旧版 Windows）上失败也无妨
+        if (std_handles[i] && std_handles[i] != INVALID_HANDLE_VALUE)
+            SetHandleInformation(std_handles[i], HANDLE_FLAG_INHERIT, HANDLE_FLAG_INHERIT);
+    }
+    if (!StartPython(std_handles, 0, &pi))
+    {
+        ShowError("Failed to start the Python interpreter.");
+        return 1;
+    }
+    return WaitForPython(&pi);
+}
+
+#endif
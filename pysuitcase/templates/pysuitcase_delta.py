@@ -0,0 +1,212 @@
+"""
+PySuitcase 增量更新包的应用脚本，只依赖标准库。
+它以 __main__.py 的形式放在更新包中，用打包好的解释器直接运行即可：
+
+    python-3.11.7-embed-amd64\\python.exe MyApp-update.zip [应用目录]
+
+先把所有新文件写到临时文件名并校验哈希，全部成功后才替换原文件；
+正在运行的 python.exe / DLL 通过先改名再替换的方式更新。
+"""
+import hashlib
+import json
+import os
+import shutil
+import struct
+import sys
+import zipfile
+
+# 以下常量需与 pysuitcase/delta.py 保持一致
+DELTA_FORMAT_VERSION = 1
+DELTA_INDEX_NAME = 'delta.json'
+MANIFEST_NAME = 'pysuitcase-manifest.json'
+PATCH_MAGIC = b'PSDELTA1'
+NEW_SUFFIX = '.pysuitcase-new'
+OLD_SUFFIX = '.pysuitcase-old'
+
+_COPY_BUFFER = 1024 * 1024
+
+
+class DeltaError(Exception):
+    """更新包无法应用到目标目录。"""
+
+
+def _sha256_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(_COPY_BUFFER), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _read_exact(stream, size):
+    data = stream.read(size)
+    if len(data) != size:
+        raise DeltaError("Truncated patch data.")
+    return data
+
+
+def _copy_bytes(source, target, length):
+    while length:
+        data = source.read(min(length, _COPY_BUFFER))
+        if not data:
+            raise DeltaError("Patch refers to data beyond the end of the file.")
+        target.write(data)
+        length -= len(data)
+
+
+def apply_patch(old_path, patch_stream, out_path):
+    """按补丁中的 COPY(旧文件偏移, 长度) / INSERT(数据) 指令由旧文件重建新文件。"""
+    if patch_stream.read(len(PATCH_MAGIC)) != PATCH_MAGIC:
+        raise DeltaError("Not a PySuitcase patch.")
+    with open(old_path, 'rb') as old, open(out_path, 'wb') as out:
+        while True:
+            op = patch_stream.read(1)
+            if op == b'E':
+                return
+            if op == b'C':
+                offset, length = struct.unpack('<QQ', _read_exact(patch_stream, 16))
+                old.seek(offset)
+                _copy_bytes(old, out, length)
+            elif op == b'I':
+                (length,) = struct.unpack('<Q', _read_exact(patch_stream, 8))
+                _copy_bytes(patch_stream, out, length)
+            else:
+                raise DeltaError("Corrupt patch data.")
+
+
+def _target_path(target_dir, rel_path):
+    path = os.path.normpath(os.path.join(target_dir, *rel_path.split('/')))
+    if os.path.commonpath([path, os.path.normpath(target_dir)]) != os.path.normpath(target_dir):
+        raise DeltaError(f"Refusing to write outside the application folder: {rel_path}")
+    return path
+
+
+def _retire(path):
+    """把现有文件改名为 *.pysuitcase-old。Windows 上正在运行的 exe/DLL 不能删除，但可以改名。"""
+    candidate = path + OLD_SUFFIX
+    index = 0
+    while os.path.exists(candidate):
+        try:
+            os.remove(candidate)
+        except OSError:
+            index += 1
+            candidate = f"{path}{OLD_SUFFIX}.{index}"
+    os.replace(path, candidate)
+    return candidate
+
+
+def _remove_retired(target_dir):
+    """删除本次及以往更新留下的旧文件；仍被占用的留到下次更新再删。"""
+    for dirpath, _, filenames in os.walk(target_dir):
+        for name in filenames:
+            if OLD_SUFFIX in name:
+                try:
+                    os.remove(os.path.join(dirpath, name))
+                except OSError:
+                    pass
+
+
+def _remove_empty_parents(path, stop_dir):
+    parent = os.path.dirname(path)
+    while os.path.normpath(parent) != os.path.normpath(stop_dir):
+        try:
+            os.rmdir(parent)
+        except OSError:
+            return
+        parent = os.path.dirname(parent)
+
+
+def apply_delta(delta_path, target_dir, force=False, log=print):
+    """把更新包应用到 target_dir。返回 False 表示目标已经是新版本，无需更新。"""
+    with zipfile.ZipFile(delta_path) as bundle:
+        index = json.loads(bundle.read(DELTA_INDEX_NAME).decode('utf-8'))
+        if index.get('format') != DELTA_FORMAT_VERSION:
+            raise DeltaError("Unsupported update package format.")
+
+        manifest_path = os.path.join(target_dir, MANIFEST_NAME)
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                current = json.load(f).get('digest')
+        except (OSError, ValueError):
+            current = None
+        if current == index['to']:
+            log("The application is already up to date.")
+            return False
+        if current != index['from'] and not force:
+            raise DeltaError(f"This update is for build {index['from'][:12]}, but '{target_dir}' is build "
+                             f"{(current or 'unknown')[:12]}. Use --force to apply it anyway.")
+
+        # 先确认所有要打补丁的文件与生成补丁时一致，此前不修改任何文件
+        for rel_path, entry in index['patched'].items():
+            path = _target_path(target_dir, rel_path)
+            if not os.path.isfile(path) or _sha256_file(path) != entry['from']:
+                raise DeltaError(f"'{rel_path}' differs from the build this update was made for.")
+
+        staged = []
+        try:
+            for rel_path, sha256 in index['files'].items():
+                path = _target_path(target_dir, rel_path)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                staged.append((path, path + NEW_SUFFIX, sha256))
+                with bundle.open('files/' + rel_path) as source, open(path + NEW_SUFFIX, 'wb') as target:
+                    shutil.copyfileobj(source, target, _COPY_BUFFER)
+            for rel_path, entry in index['patched'].items():
+                path = _target_path(target_dir, rel_path)
+                staged.append((path, path + NEW_SUFFIX, entry['to']))
+                with bundle.open(entry['patch']) as patch:
+                    apply_patch(path, patch, path + NEW_SUFFIX)
+            for path, new_path, sha256 in staged:
+                if _sha256_file(new_path) != sha256:
+                    raise DeltaError(f"Verification failed for '{os.path.relpath(path, target_dir)}'.")
+        except BaseException:
+            for _, new_path, _ in staged:
+                if os.path.exists(new_path):
+                    os.remove(new_path)
+            raise
+
+    # 所有新文件已就绪并校验通过，开始替换
+    for path, new_path, _ in staged:
+        if os.path.exists(path):
+            _retire(path)
+        os.replace(new_path, path)
+    for rel_path in index['removed']:
+        path = _target_path(target_dir, rel_path)
+        if os.path.exists(path):
+            _retire(path)
+    with open(manifest_path + NEW_SUFFIX, 'w', encoding='utf-8') as f:
+        json.dump(index['manifest'], f, indent=2, sort_keys=True)
+    os.replace(manifest_path + NEW_SUFFIX, manifest_path)
+
+    _remove_retired(target_dir)
+    for rel_path in index['removed']:
+        _remove_empty_parents(_target_path(target_dir, rel_path), target_dir)
+    log(f"Updated {len(index['files'])} files, patched {len(index['patched'])}, removed {len(index['removed'])}.")
+    return True
+
+
+def _default_target():
+    """应用根目录：打包的解释器位于 <应用目录>/python-<版本>-embed-<架构>/ 中。"""
+    return os.path.dirname(os.path.dirname(os.path.abspath(sys.executable)))
+
+
+def main(argv=None):
+    argv = list(sys.argv[1:] if argv is None else argv)
+    force = '--force' in argv
+    args = [arg for arg in argv if arg != '--force']
+    delta_path = os.path.abspath(sys.argv[0]) if zipfile.is_zipfile(sys.argv[0]) else None
+    if delta_path is None and args:
+        delta_path = args.pop(0)
+    if delta_path is None or len(args) > 1:
+        print("Usage: python.exe UPDATE.zip [APP_DIR] [--force]", file=sys.stderr)
+        return 2
+    target_dir = os.path.abspath(args[0]) if args else _default_target()
+    try:
+        apply_delta(delta_path, target_dir, force=force)
+    except DeltaError as e:
+        print(f"Update failed: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
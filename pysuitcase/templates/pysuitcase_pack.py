@@ -0,0 +1,165 @@
+"""
+PySuitcase 打包资源的导入器，只依赖标准库（且只用启动时已加载或内置的模块）。
+构建时它被复制到嵌入式 Python 目录（该目录在 ._pth 中，因此可直接导入），启动器在导入入口模块前调用：
+
+    import pysuitcase_pack; pysuitcase_pack.install(r'..\\pysuitcase.pack')
+
+包文件通过 mmap 映射，.py/.pyc 都从同一个文件中读取，不再逐个打开 app 目录与 site-packages 中的文件。
+原文件仍保留在磁盘上：模块的 __file__ 指向原位置，依赖 __file__ 读取数据文件的包不受影响；
+扩展模块（.pyd）、数据文件与未打包的模块照常由默认的 PathFinder 加载。包文件缺失时什么也不做。
+"""
+import _imp
+import marshal
+import os
+import sys
+from importlib import machinery
+from importlib._bootstrap_external import MAGIC_NUMBER, decode_source
+
+# 以下常量需与 pysuitcase/packer.py 保持一致
+PACK_MAGIC = b'PSPACK01'
+FOOTER_SIZE = len(PACK_MAGIC) + 16
+
+
+class PackError(Exception):
+    """包文件损坏或不是 PySuitcase 的包文件。"""
+
+
+class PackLoader:
+    """从包中加载一个模块：优先使用包中与当前解释器匹配的 .pyc，否则编译包中的源码。"""
+
+    def __init__(self, pack, fullname, key, path, is_package):
+        self._pack = pack
+        self.name = fullname
+        self._key = key
+        self.path = path
+        self._is_package = is_package
+
+    def create_module(self, spec):
+        return None
+
+    def exec_module(self, module):
+        exec(self.get_code(module.__name__), module.__dict__)
+
+    def is_package(self, fullname):
+        return self._is_package
+
+    def get_filename(self, fullname):
+        return self.path
+
+    def _cached_key(self):
+        directory, _, filename = self._key.rpartition('/')
+        optimize = sys.flags.optimize
+        tag = sys.implementation.cache_tag + (f'.opt-{optimize}' if optimize else '')
+        return f"{directory}/__pycache__/{filename[:-3]}.{tag}.pyc"
+
+    def get_code(self, fullname):
+        bytecode_key = self._key if self._key.endswith('.pyc') else self._cached_key()
+        data = self._pack.read(bytecode_key)
+        if data is not None and data[:4] == MAGIC_NUMBER:
+            # 打包时已丢弃与源码不一致的 .pyc（见 packer._pyc_matches_source），这里无需再校验；与 SourceFileLoader 一样把文件名修正为实际位置
+            code = marshal.loads(memoryview(data)[16:])
+            _imp._fix_co_filename(code, self.path)
+            return code
+        source = self._pack.read(self._key) if self._key.endswith('.py') else None
+        if source is None:
+            raise ImportError(f"No usable code for {fullname!r} in the pack.", name=fullname)
+        return compile(source, self.path, 'exec', dont_inherit=True)
+
+    def get_source(self, fullname):
+        source = self._pack.read(self._key) if self._key.endswith('.py') else None
+        return decode_source(source) if source is not None else None
+
+    def get_data(self, path):
+        with open(path, 'rb') as f:
+            return f.read()
+
+
+class PackFinder:
+    """sys.meta_path 上的查找器：模块在包中时返回 PackLoader，否则交给后续的查找器。"""
+
+    def __init__(self, pack_path):
+        import mmap
+        with open(pack_path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(PACK_MAGIC)] != PACK_MAGIC or self._map[-FOOTER_SIZE:-16] != PACK_MAGIC:
+            raise PackError(f"{pack_path} is not a PySuitcase pack.")
+        offset = int.from_bytes(self._map[-16:-8], 'little')
+        size = int.from_bytes(self._map[-8:], 'little')
+        index = marshal.loads(self._map[offset:offset + size])
+        base = os.path.dirname(os.path.abspath(pack_path))
+        # 按 sys.path 中的先后顺序（site-packages 在 app 目录之前）
+        self._roots = [(name, os.path.normcase(os.path.normpath(os.path.join(base, rel)))) for name, rel in index['roots']]
+        self._entries = index['entries']
+        self._prefixes = {}
+        self._stdlib = getattr(sys, 'stdlib_module_names', ())
+
+    def read(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        offset, size, stored = entry
+        data = self._map[offset:offset + stored]
+        if stored != size:
+            import zlib
+            data = zlib.decompress(data)
+        return data
+
+    def _prefix(self, directory):
+        """把磁盘上的目录映射为包中的键前缀（如 'site/numpy/'），不在任何根目录下时返回 None。"""
+        try:
+            return self._prefixes[directory]
+        except KeyError:
+            pass
+        prefix = None
+        normalized = os.path.normcase(os.path.normpath(os.path.abspath(directory)))
+        for name, root in self._roots:
+            if normalized == root:
+                prefix = (f"{name}/", directory)
+                break
+            if normalized.startswith(root + os.sep):
+                prefix = (f"{name}/{normalized[len(root) + 1:].replace(os.sep, '/')}/", directory)
+                break
+        self._prefixes[directory] = prefix
+        return prefix
+
+    def find_spec(self, fullname, path=None, target=None):
+        if path is None:
+            # 标准库优先于 site-packages 与 app 目录，与默认的 sys.path 顺序一致
+            if fullname in self._stdlib:
+                return None
+            path = [root for _, root in self._roots]
+        tail = fullname.rpartition('.')[2]
+        for directory in path:
+            located = self._prefix(directory)
+            if located is None:
+                continue
+            prefix, disk_dir = located
+            for relative, is_package in ((f"{tail}/__init__", True), (tail, False)):
+                for suffix in ('.py', '.pyc'):
+                    key = prefix + relative + suffix
+                    if key in self._entries:
+                        disk_path = os.path.join(disk_dir, *(relative + suffix).split('/'))
+                        loader = PackLoader(self, fullname, key, disk_path, is_package)
+                        spec = machinery.ModuleSpec(fullname, loader, origin=disk_path, is_package=is_package)
+                        spec.has_location = True
+                        if is_package:
+                            spec.submodule_search_locations = [os.path.dirname(disk_path)]
+                        return spec
+        return None
+
+    def invalidate_caches(self):
+        pass
+
+
+def install(pack_path):
+    """把包的查找器插入到 PathFinder 之前；包文件不存在时返回 None，照常从磁盘加载。"""
+    if not os.path.exists(pack_path):
+        return None
+    finder = PackFinder(pack_path)
+    position = len(sys.meta_path)
+    for index, existing in enumerate(sys.meta_path):
+        if existing is machinery.PathFinder:
+            position = index
+            break
+    sys.meta_path.insert(position, finder)
+    return finder
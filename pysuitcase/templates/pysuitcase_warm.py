@@ -0,0 +1,523 @@
+"""
+PySuitcase 的热启动（--warm），只依赖标准库。构建时被复制到嵌入式 Python 目录，启动器在导入入口模块前调用：
+
+    import pysuitcase_warm; pysuitcase_warm.launch('app', 'run', ('torch',), 600, None)
+
+后台有一个调度进程，它始终保持一个备用的工作进程，该进程已导入入口模块与配置的模块（例如 torch）。
+启动时通过本机 TCP 连接（附带随机令牌）把 argv、当前目录、环境变量与标准输入输出交给备用进程执行 run()，
+每个工作进程只处理一次启动，随后调度进程立即预热下一个，各次启动之间互不影响。
+调度进程在空闲超时后退出；它不可用、正在启动或 app 已被重新构建时，本次启动照常冷启动，并在后台拉起新的调度进程。
+"""
+import hashlib
+import io
+import json
+import os
+import socket
+import struct
+import sys
+import threading
+
+_HEADER = struct.Struct('>cI')
+_HELLO, _WORKER, _NONE = b'H', b'W', b'N'
+_REQUEST, _ACK, _GO = b'R', b'A', b'G'
+_STDIN, _STDIN_EOF, _STDOUT, _STDERR, _EXIT = b'I', b'E', b'O', b'e', b'X'
+_CHUNK = 64 * 1024
+# 调度进程已在启动中（标记文件存在）多久之后视为启动失败
+_STARTING_GRACE = 60
+# 移交给启动器之后，工作进程最多等待连接这么久
+_HANDOFF_TIMEOUT = 30
+# 备用进程预热超过这么久视为挂起：调度进程放弃它并退出，下次启动重新拉起
+_PRELOAD_TIMEOUT = 60
+# 启动器最多等待调度进程交出工作进程这么久，超时后冷启动
+_ACQUIRE_TIMEOUT = _PRELOAD_TIMEOUT + 10
+# 连接、握手与确认的超时
+_CONNECT_TIMEOUT = 5
+# app 目录中这些文件变化（例如重新构建）后，调度进程退出，下次启动重新预热
+_CODE_SUFFIXES = ('.py', '.pyc', '.pyd', '.so', '.dll')
+_PROJECT_SUFFIXES = ('.exe', '.pack', '.json')
+
+
+class ProtocolError(Exception):
+    """连接被关闭或收到了不符合协议的数据。"""
+
+
+# --- 帧：1 字节类型 + 4 字节长度 + 数据 ---
+
+def _send(sock, kind, payload=b''):
+    sock.sendall(_HEADER.pack(kind, len(payload)) + payload)
+
+
+def _recv_exact(sock, size):
+    data = b''
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ProtocolError("Connection closed.")
+        data += chunk
+    return data
+
+
+def _recv(sock):
+    kind, size = _HEADER.unpack(_recv_exact(sock, _HEADER.size))
+    return kind, _recv_exact(sock, size)
+
+
+# --- 状态文件：调度进程的端口与令牌，按 app 目录、解释器与入口区分 ---
+
+def _state_dir():
+    """每个用户一个目录；POSIX 上目录必须属于当前用户且不可被他人访问，否则返回 None（不使用热启动）。"""
+    if os.name == 'nt':
+        base = os.environ.get('LOCALAPPDATA') or os.path.expanduser('~')
+        path = os.path.join(base, 'pysuitcase', 'warm')
+        os.makedirs(path, exist_ok=True)
+        return path
+    path = os.path.join(os.environ.get('XDG_RUNTIME_DIR') or '/tmp', f"pysuitcase-warm-{os.getuid()}")
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    info = os.stat(path)
+    if info.st_uid != os.getuid() or info.st_mode & 0o077:
+        return None
+    return path
+
+
+def _state_paths(config):
+    key = hashlib.sha256(repr((os.getcwd(), sys.executable, sys.flags.optimize, config['module'], config['function'])).encode('utf-8'))
+    directory = _state_dir()
+    if directory is None:
+        return None
+    base = os.path.join(directory, key.hexdigest()[:16])
+    return f"{base}.json", f"{base}.starting"
+
+
+def _write_private(path, data):
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _read_state(state_path):
+    try:
+        with open(state_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _interpreter_args():
+    return [sys.executable] + (['-' + 'O' * sys.flags.optimize] if sys.flags.optimize else [])
+
+
+def _spawn(code, **kwargs):
+    """在 app 目录中以相同的解释器与优化级别启动一个执行 code 的后台进程。"""
+    import subprocess
+    if os.name == 'nt':
+        kwargs['creationflags'] = subprocess.CREATE_NO_WINDOW | kwargs.get('creationflags', 0)
+    kwargs.setdefault('stdin', subprocess.DEVNULL)
+    kwargs.setdefault('stdout', subprocess.DEVNULL)
+    kwargs.setdefault('stderr', subprocess.DEVNULL)
+    bootstrap = f"import os, sys; sys.path.append(os.getcwd()); import pysuitcase_warm; {code}"
+    return subprocess.Popen(_interpreter_args() + ['-c', bootstrap], cwd=os.getcwd(), close_fds=True, **kwargs)
+
+
+# --- 启动器一侧 ---
+
+def _forward_stdin(sock):
+    stream = sys.stdin.buffer if sys.stdin is not None else None
+    try:
+        while stream is not None:
+            data = stream.read1(_CHUNK) if hasattr(stream, 'read1') else stream.read(_CHUNK)
+            if not data:
+                break
+            _send(sock, _STDIN, data)
+        _send(sock, _STDIN_EOF)
+    except (OSError, ValueError):
+        pass
+
+
+def _stream_info(stream):
+    if stream is None:
+        return {'encoding': 'utf-8', 'isatty': False}
+    try:
+        isatty = stream.isatty()
+    except (OSError, ValueError):
+        isatty = False
+    return {'encoding': getattr(stream, 'encoding', None) or 'utf-8', 'isatty': isatty}
+
+
+def _run_warm(config, state):
+    """
+    向调度进程申请一个已预热的工作进程并在其中执行本次启动，返回退出码；没有可用的工作进程时返回 None。
+    工作进程确认请求并收到 _GO 之前，任何一步超时或失败都会抛出异常，由调用方退回冷启动。
+    """
+    with socket.create_connection(('127.0.0.1', state['port']), timeout=_CONNECT_TIMEOUT) as dispatcher:
+        _send(dispatcher, _HELLO, json.dumps({'token': state['token']}).encode('utf-8'))
+        # 备用进程可能仍在预热中，等待它不会比冷启动更慢；但调度进程或工作进程挂起时不能一直等下去
+        dispatcher.settimeout(_ACQUIRE_TIMEOUT)
+        kind, payload = _recv(dispatcher)
+    if kind != _WORKER:
+        return None
+    sock = socket.create_connection(('127.0.0.1', int(payload)), timeout=_CONNECT_TIMEOUT)
+    try:
+        request = {
+            'token': state['token'], 'argv': sys.argv, 'cwd': os.getcwd(), 'env': dict(os.environ),
+            'stdin': _stream_info(sys.stdin), 'stdout': _stream_info(sys.stdout), 'stderr': _stream_info(sys.stderr),
+        }
+        _send(sock, _REQUEST, json.dumps(request).encode('utf-8'))
+        if _recv(sock)[0] != _ACK:
+            raise ProtocolError("The warm interpreter did not acknowledge the request.")
+        # 工作进程只在收到 _GO 后才执行：此后不能再退回冷启动，否则程序会被执行两次
+        _send(sock, _GO)
+        sock.settimeout(None)
+    except BaseException:
+        sock.close()
+        raise
+    threading.Thread(target=_forward_stdin, args=(sock,), daemon=True).start()
+    outputs = {_STDOUT: sys.stdout, _STDERR: sys.stderr}
+    try:
+        while True:
+            kind, payload = _recv(sock)
+            if kind == _EXIT:
+                return int(payload)
+            stream = outputs.get(kind)
+            if stream is not None:
+                stream.flush()
+                stream.buffer.write(payload)
+                stream.buffer.flush()
+    except (OSError, ProtocolError, ValueError):
+        sys.stderr.write("PySuitcase Error: The warm interpreter closed the connection unexpectedly.\n")
+        return 1
+    finally:
+        sock.close()
+
+
+def _start_server(config, paths):
+    """在后台拉起调度进程；已有进程正在启动时什么也不做。"""
+    import time
+    state_path, starting_path = paths
+    try:
+        fd = os.open(starting_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        try:
+            if time.time() - os.path.getmtime(starting_path) < _STARTING_GRACE:
+                return
+            os.remove(starting_path)
+            fd = os.open(starting_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        except OSError:
+            return
+    os.close(fd)
+    kwargs = {'start_new_session': True} if os.name != 'nt' else {'creationflags': 0x00000008 | 0x00000200}  # DETACHED_PROCESS | NEW_PROCESS_GROUP
+    try:
+        _spawn(f"pysuitcase_warm.serve({config!r})", **kwargs)
+    except OSError:
+        os.remove(starting_path)
+
+
+def launch(module, function, modules=(), idle_timeout=600, pack=None):
+    """
+    启动器的入口：由热启动的工作进程执行本次启动并以其退出码退出；不可用时拉起调度进程并返回，由启动器照常冷启动。
+    设置 PYSUITCASE_WARM=0 可在单次启动中关闭热启动。
+    """
+    if os.environ.get('PYSUITCASE_WARM') == '0':
+        return None
+    config = {'module': module, 'function': function, 'modules': list(modules), 'idle_timeout': idle_timeout, 'pack': pack}
+    try:
+        paths = _state_paths(config)
+        if paths is None:
+            return None
+        state = _read_state(paths[0])
+        code = None
+        if state is not None:
+            try:
+                code = _run_warm(config, state)
+            except (OSError, ProtocolError, ValueError):
+                code = None
+        if code is not None:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            # 转发标准输入的守护线程可能仍阻塞在读取上，正常退出时解释器会因无法获得 stdin 的锁而中止；
+            # app 在工作进程中运行，启动器进程本身没有需要清理的状态
+            os._exit(code)
+        _start_server(config, paths)
+    except OSError:
+        pass
+    return None
+
+
+# --- 调度进程 ---
+
+def _snapshot():
+    """app 目录中的代码文件与项目目录中的启动器、包文件、清单的修改时间；重新构建后会变化。"""
+    stamp = []
+    for dirpath, dirnames, filenames in os.walk('.'):
+        dirnames[:] = [name for name in dirnames if name != '__pycache__']
+        for name in filenames:
+            if name.endswith(_CODE_SUFFIXES):
+                info = os.stat(os.path.join(dirpath, name))
+                stamp.append((dirpath, name, info.st_mtime_ns, info.st_size))
+    for entry in os.scandir('..'):
+        if entry.name.endswith(_PROJECT_SUFFIXES) and entry.is_file():
+            info = entry.stat()
+            stamp.append(('..', entry.name, info.st_mtime_ns, info.st_size))
+    return sorted(stamp)
+
+
+class _Spare:
+    """一个正在预热或已就绪的工作进程。"""
+
+    def __init__(self, config, token):
+        import subprocess
+        self._process = _spawn(f"pysuitcase_warm._worker({config!r})", stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        self._process.stdin.write(f"{token}\n".encode('ascii'))
+        self._process.stdin.flush()
+        self._port = None
+        # 在线程中读取就绪行，以便限时等待（Windows 上不能对管道使用 select）
+        self._line = b''
+        self._ready = threading.Event()
+        threading.Thread(target=self._read_ready, daemon=True).start()
+
+    def _read_ready(self):
+        try:
+            self._line = self._process.stdout.readline()
+        except (OSError, ValueError):
+            pass
+        self._ready.set()
+
+    def port(self):
+        """等待预热完成并返回工作进程的端口；预热失败或超过 _PRELOAD_TIMEOUT 秒时返回 None。"""
+        if self._port is None:
+            if not self._ready.wait(_PRELOAD_TIMEOUT):
+                return None
+            line = self._line.decode('ascii', 'replace').split()
+            if len(line) != 2 or line[0] != 'READY':
+                return None
+            self._port = int(line[1])
+        return self._port
+
+    def release(self):
+        """工作进程已交给启动器：不再管理它，它执行完这次启动后自行退出。"""
+        self._process.stdin.close()
+        self._process.stdout.close()
+
+    def kill(self):
+        try:
+            self._process.kill()
+            self._process.wait()
+        except OSError:
+            pass
+
+
+def serve(config):
+    """调度进程：保持一个备用的工作进程，并把它交给前来申请的启动器；空闲 idle_timeout 秒后退出。"""
+    paths = _state_paths(config)
+    if paths is None:
+        return
+    state_path, starting_path = paths
+    token = os.urandom(16).hex()
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.bind(('127.0.0.1', 0))
+    listener.listen(16)
+    listener.settimeout(config['idle_timeout'])
+    snapshot = _snapshot()
+    spare = _Spare(config, token)
+    _write_private(state_path, json.dumps({'pid': os.getpid(), 'port': listener.getsockname()[1], 'token': token}))
+    try:
+        os.remove(starting_path)
+    except OSError:
+        pass
+    try:
+        while True:
+            try:
+                conn, _ = listener.accept()
+            except socket.timeout:
+                break
+            with conn:
+                try:
+                    conn.settimeout(_CONNECT_TIMEOUT)
+                    kind, payload = _recv(conn)
+                    if kind != _HELLO or json.loads(payload).get('token') != token:
+                        continue
+                    if _snapshot() != snapshot:
+                        _send(conn, _NONE, b'rebuilt')
+                        break
+                    port = spare.port()
+                    if port is None:
+                        _send(conn, _NONE, b'preload failed or timed out')
+                        break
+                    _send(conn, _WORKER, str(port).encode('ascii'))
+                except (OSError, ProtocolError, ValueError):
+                    continue
+            spare.release()
+            spare = _Spare(config, token)
+    finally:
+        spare.kill()
+        listener.close()
+        state = _read_state(state_path)
+        if state is not None and state.get('pid') == os.getpid():
+            os.remove(state_path)
+
+
+# --- 工作进程 ---
+
+class _RawFrames(io.RawIOBase):
+    """把写入的字节作为输出帧发给启动器。"""
+
+    def __init__(self, sock, kind, lock, isatty):
+        super().__init__()
+        self._sock, self._kind, self._lock, self._isatty = sock, kind, lock, isatty
+
+    def writable(self):
+        return True
+
+    def isatty(self):
+        return self._isatty
+
+    def write(self, data):
+        with self._lock:
+            _send(self._sock, self._kind, bytes(data))
+        return len(data)
+
+
+def _output_stream(sock, kind, lock, info):
+    raw = _RawFrames(sock, kind, lock, info['isatty'])
+    return io.TextIOWrapper(io.BufferedWriter(raw), encoding=info['encoding'], errors='backslashreplace', line_buffering=True,
+                            write_through=True)
+
+
+def _receive_stdin(sock, write_fd):
+    """把启动器转发来的标准输入写入管道；连接在输入结束前断开说明启动器已退出（例如 Ctrl+C），中断主线程。"""
+    import _thread
+    try:
+        while True:
+            kind, payload = _recv(sock)
+            if kind == _STDIN:
+                os.write(write_fd, payload)
+            elif kind == _STDIN_EOF:
+                return
+    except (OSError, ProtocolError):
+        _thread.interrupt_main()
+    finally:
+        os.close(write_fd)
+
+
+def _accept_request(listener, token, handed_off):
+    """
+    等待带有正确令牌的请求，确认（_ACK）后等启动器回复 _GO 才接受它；启动器已超时放弃时不会回复，继续等待。
+    移交后超过 _HANDOFF_TIMEOUT 秒仍没有请求时返回 (None, None)。
+    """
+    import time
+    listener.settimeout(0.5)
+    deadline = None
+    while True:
+        if deadline is None and handed_off.is_set():
+            deadline = time.monotonic() + _HANDOFF_TIMEOUT
+        if deadline is not None and time.monotonic() > deadline:
+            return None, None
+        try:
+            conn, _ = listener.accept()
+        except socket.timeout:
+            continue
+        try:
+            conn.settimeout(_CONNECT_TIMEOUT)
+            kind, payload = _recv(conn)
+            request = json.loads(payload)
+            if kind == _REQUEST and request.get('token') == token:
+                _send(conn, _ACK)
+                if _recv(conn)[0] == _GO:
+                    conn.settimeout(None)
+                    return conn, request
+        except (OSError, ProtocolError, ValueError):
+            pass
+        conn.close()
+
+
+def _exit_code(error):
+    if error.code is None:
+        return 0
+    if isinstance(error.code, int):
+        return error.code
+    print(error.code, file=sys.stderr)
+    return 1
+
+
+def _worker(config):
+    """工作进程：预热（导入入口模块与配置的模块）后等待一次启动，执行 run() 并回传输出与退出码，然后退出。"""
+    import importlib
+    import traceback
+    token = sys.stdin.buffer.readline().decode('ascii').strip()
+    if config['pack']:
+        import pysuitcase_pack
+        pysuitcase_pack.install(config['pack'])
+    for name in config['modules']:
+        try:
+            importlib.import_module(name)
+        except Exception:
+            pass
+    entry = importlib.import_module(config['module'])
+
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.bind(('127.0.0.1', 0))
+    listener.listen(1)
+    sys.stdout.write(f"READY {listener.getsockname()[1]}\n")
+    sys.stdout.flush()
+    # 调度进程不再读取输出；扩展模块直接写文件描述符的输出也不能阻塞在管道上
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+    os.dup2(devnull, 2)
+    # 标准输入关闭表示已被移交或调度进程已退出
+    handed_off = threading.Event()
+    pipe = sys.stdin.buffer
+    threading.Thread(target=lambda: (pipe.read(), handed_off.set()), daemon=True).start()
+
+    conn, request = _accept_request(listener, token, handed_off)
+    listener.close()
+    if conn is None:
+        return
+    os.chdir(request['cwd'])
+    os.environ.clear()
+    os.environ.update(request['env'])
+    sys.argv = request['argv']
+    lock = threading.Lock()
+    sys.stdout = _output_stream(conn, _STDOUT, lock, request['stdout'])
+    sys.stderr = _output_stream(conn, _STDERR, lock, request['stderr'])
+    read_fd, write_fd = os.pipe()
+    sys.stdin = io.TextIOWrapper(os.fdopen(read_fd, 'rb'), encoding=request['stdin']['encoding'])
+    threading.Thread(target=_receive_stdin, args=(conn, write_fd), daemon=True).start()
+
+    code = 0
+    try:
+        getattr(entry, config['function'])()
+    except SystemExit as e:
+        code = _exit_code(e)
+    except BaseException:
+        # 与冷启动一样从 run() 开始显示回溯，不包含本模块的栈帧
+        error_type, error, tb = sys.exc_info()
+        traceback.print_exception(error_type, error, tb.tb_next)
+        code = 1
+    _finish()
+    try:
+        with lock:
+            _send(conn, _EXIT, str(code).encode('ascii'))
+        conn.close()
+    except OSError:
+        pass
+    # 解释器的正常退出流程已在 _finish 中走过；os._exit 只是跳过对本模块线程与套接字的清理
+    os._exit(code)
+
+
+def _finish():
+    """
+    与冷启动的解释器退出时一样：等待非守护线程结束，执行 app 注册的 atexit 函数，再刷新标准输出与错误，
+    这样它们的输出在发送退出码之前都已交给启动器。
+    """
+    import atexit
+    current = threading.current_thread()
+    for thread in threading.enumerate():
+        if thread is not current and not thread.daemon:
+            thread.join()
+    atexit._run_exitfuncs()
+    for stream in (sys.stdout, sys.stderr):
+        try:
+            stream.flush()
+        except (OSError, ValueError):
+            pass
@@ -0,0 +1,96 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+
+class BuildTrace:
+    """
+    记录构建过程的时间线：阶段起止、子进程退出码、下载字节数。
+    可导出为 Chrome Trace 格式（chrome://tracing 或 Perfetto 可直接打开），便于在 CI 中长期追踪构建耗时。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+        self._wall_origin = time.time()
+        self.events = []
+        self.stages = {}
+        self.commands = []
+        self.bytes_downloaded = 0
+
+    def now_us(self):
+        return (time.perf_counter() - self._origin) * 1e6
+
+    def _append(self, event):
+        event.setdefault('pid', os.getpid())
+        event.setdefault('tid', threading.get_ident())
+        with self._lock:
+            self.events.append(event)
+
+    @contextmanager
+    def span(self, name, category='stage', **args):
+        """记录一段耗时；category 为 'stage' 时同时计入阶段汇总。"""
+        start = self.now_us()
+        status = 'ok'
+        try:
+            yield args
+        except BaseException:
+            status = 'failed'
+            raise
+        finally:
+            duration = self.now_us() - start
+            args['status'] = status
+            self._append({'name': name, 'cat': category, 'ph': 'X', 'ts': start, 'dur': duration, 'args': dict(args)})
+            if category == 'stage':
+                with self._lock:
+                    self.stages[name] = {'start_s': start / 1e6, 'duration_s': duration / 1e6, 'status': status}
+
+    def record_command(self, command, exit_code, start_us, duration_us, label=None):
+        entry = {'command': command, 'exit_code': exit_code, 'duration_s': duration_us / 1e6, 'label': label}
+        with self._lock:
+            self.commands.append(entry)
+        self._append({'name': label or os.path.basename(str(command[0])), 'cat': 'subprocess', 'ph': 'X',
+                      'ts': start_us, 'dur': duration_us, 'args': {'command': ' '.join(map(str, command)), 'exit_code': exit_code}})
+
+    def add_download(self, url, num_bytes):
+        with self._lock:
+            self.bytes_downloaded += num_bytes
+            total = self.bytes_downloaded
+        self._append({'name': 'download', 'cat': 'download', 'ph': 'i', 's': 't', 'ts': self.now_us(),
+                      'args': {'url': url, 'bytes': num_bytes}})
+        self._append({'name': 'bytes_downloaded', 'ph': 'C', 'ts': self.now_us(), 'args': {'bytes': total}})
+
+    def summary(self):
+        with self._lock:
+            return {
+                'started': self._wall_origin,
+                'total_s': (time.perf_counter() - self._origin),
+                'stages': dict(self.stages),
+                'commands': list(self.commands),
+                'bytes_downloaded': self.bytes_downloaded,
+            }
+
+    def write(self, path):
+        """导出 Chrome Trace JSON；汇总信息放在 otherData 中，供脚本直接读取。"""
+        with self._lock:
+            events = list(self.events)
+        data = {'traceEvents': events, 'displayTimeUnit': 'ms', 'otherData': self.summary()}
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=1)
+
+
+_trace = BuildTrace()
+
+
+def get_trace():
+    """返回当前进程的构建追踪对象。"""
+    return _trace
+
+
+def reset_trace():
+    """开始一次新的构建追踪。"""
+    global _trace
+    _trace = BuildTrace()
+    return _trace
@@ -0,0 +1,40 @@
+import os
+
+from .packer import pack_relpath
+
+try:
+    import importlib.resources as pkg_resources
+except ImportError:
+    import importlib_resources as pkg_resources
+
+WARM_CLIENT_NAME = 'pysuitcase_warm.py'
+DEFAULT_IDLE_TIMEOUT = 600
+
+
+def warm_preload(project_dir, app_folder, main_script, modules=(), idle_timeout=None, pack=False):
+    """
+    启动器在导入入口模块前执行的语句：交给后台预热好的解释器执行 run()，不可用时返回并照常冷启动。
+    语句位于启动器命令行的双引号之内，因此只能使用单引号。
+    """
+    module = main_script.replace('.py', '')
+    pack_path = f"r'{pack_relpath(project_dir, app_folder)}'" if pack else 'None'
+    return (f"import pysuitcase_warm; pysuitcase_warm.launch('{module}', 'run', {tuple(modules)!r}, "
+            f"{idle_timeout or DEFAULT_IDLE_TIMEOUT}, {pack_path})")
+
+
+def get_warm_client_path(python_embed_path):
+    return os.path.join(python_embed_path, WARM_CLIENT_NAME)
+
+
+def install_warm_client(python_embed_path):
+    """把热启动模块复制到嵌入式 Python 目录，该目录在 ._pth 中，启动时可直接导入。"""
+    source = (pkg_resources.files('pysuitcase.templates') / WARM_CLIENT_NAME).read_bytes()
+    with open(get_warm_client_path(python_embed_path), 'wb') as f:
+        f.write(source)
+
+
+def remove_warm_client(python_embed_path):
+    """关闭 --warm 后删除上次构建留下的热启动模块。"""
+    path = get_warm_client_path(python_embed_path)
+    if os.path.exists(path):
+        os.remove(path)
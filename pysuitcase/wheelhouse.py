@@ -0,0 +1,201 @@
+import click
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import unquote, urlparse
+
+from .cache import get_cache_dir
+from .runner import run_command
+
+# 构建工具也放进 wheelhouse，这样离线构建时 pip 本身和 setuptools 同样可以安装
+BUILD_ESSENTIALS = ['pip', 'setuptools', 'wheel']
+
+# pip 在 --only-binary 下找不到目标平台 wheel 时的报错
+_MISSING_WHEEL = re.compile(r"No matching distribution found for (\S+)")
+
+_PLATFORM_TAGS = {
+    'amd64': 'win_amd64',
+    'win32': 'win32',
+    'arm64': 'win_arm64',
+}
+
+
+def get_target_tag(python_version, arch):
+    """返回目标环境的标签，例如 cp311-win_amd64，用作 wheelhouse 的键。"""
+    major, minor = python_version.split('.')[:2]
+    return f"cp{major}{minor}-{_PLATFORM_TAGS[arch]}"
+
+
+def get_wheelhouse_dir(python_version, arch, override=None):
+    """返回目标 (python_version, arch) 对应的 wheelhouse 目录；指定 override 时直接使用该本地目录。"""
+    if override:
+        os.makedirs(override, exist_ok=True)
+        return os.path.abspath(override)
+    return get_cache_dir('wheelhouse', get_target_tag(python_version, arch))
+
+
+def _host_matches_target(python_version, arch):
+    if os.name != 'nt':
+        return False
+    host_arch = 'amd64' if sys.maxsize > 2 ** 32 else 'win32'
+    return tuple(int(p) for p in python_version.split('.')[:2]) == sys.version_info[:2] and host_arch == arch
+
+
+def cross_platform_args(python_version, arch):
+    """让宿主 pip 选择目标平台 wheel 的参数；跨平台时无法构建 sdist，因此只接受二进制包。"""
+    major, minor = python_version.split('.')[:2]
+    return [
+        "--only-binary=:all:", "--platform", _PLATFORM_TAGS[arch],
+        "--python-version", f"{major}.{minor}", "--implementation", "cp",
+    ]
+
+
+def report_missing_wheels(output, python_version, arch):
+    """从 pip 的输出中找出没有目标平台 wheel 的包并说明原因；找到时返回 True。"""
+    missing = sorted(set(_MISSING_WHEEL.findall(output or '')))
+    if not missing:
+        return False
+    click.secho(f"Error: No prebuilt {get_target_tag(python_version, arch)} wheel is available for: {', '.join(missing)}", fg='red', bold=True)
+    click.secho("Source distributions cannot be cross-built on this host. Either build on Windows without --stage-deps, "
+                "or build the wheels on a Windows machine and put them into the wheelhouse.", fg='yellow')
+    return True
+
+
+def _mirror_args(mirror):
+    if not mirror:
+        return []
+    return ["-i", mirror, "--trusted-host", urlparse(mirror).hostname]
+
+
+def _run_pip(command, description):
+    """运行一条 pip 命令，失败时打印输出并返回 False。"""
+    click.echo(f"Running command: {' '.join(command)}")
+    try:
+        run_command(command, label='pip')
+        return True
+    except subprocess.CalledProcessError as e:
+        click.secho(f"Failed to {description}! (exit code {e.returncode})", fg='red', bold=True)
+        return False
+
+
+def fill_wheelhouse(wheelhouse_dir, python_version, arch, requirements_path=None, packages=(), mirror=None, python_exe=None, pip_args=()):
+    """把依赖的 wheel 下载（或构建）到 wheelhouse 中，已存在的 wheel 不会重复下载。pip_args 会追加到 pip 命令中。"""
+    sources = list(packages)
+    if requirements_path:
+        sources += ["-r", requirements_path]
+    if not sources:
+        return True
+
+    if python_exe or _host_matches_target(python_version, arch):
+        # 使用目标解释器（或与目标一致的宿主解释器）执行 pip wheel，sdist 也会被构建成 wheel
+        command = [python_exe or sys.executable, "-m", "pip", "wheel", "-w", wheelhouse_dir, "--find-links", wheelhouse_dir]
+    else:
+        # 跨版本/跨平台预填充只能获取现成的二进制 wheel
+        command = [
+            sys.executable, "-m", "pip", "download", "-d", wheelhouse_dir, "--find-links", wheelhouse_dir,
+        ] + cross_platform_args(python_version, arch)
+    command += list(pip_args) + sources + _mirror_args(mirror)
+    return _run_pip(command, "fetch wheels into the wheelhouse")
+
+
+def _touch_installed_wheels(report_path):
+    """根据 pip 的安装报告更新被使用过的 wheel 的时间戳，供 prune 判断是否仍在使用。"""
+    try:
+        with open(report_path, 'r', encoding='utf-8') as f:
+            report = json.load(f)
+    except (OSError, ValueError):
+        return
+    now = time.time()
+    for item in report.get('install', []):
+        url = item.get('download_info', {}).get('url', '')
+        if url.startswith('file:'):
+            path = unquote(urlparse(url).path)
+            if os.name == 'nt' and path.startswith('/'):
+                path = path[1:]
+            if os.path.exists(path):
+                os.utime(path, (now, now))
+
+
+def install_from_wheelhouse(python_exe, wheelhouse_dir, requirements_path=None, packages=(), quiet=False, pip_args=()):
+    """仅使用 wheelhouse 中的 wheel 安装依赖（--no-index），不访问网络。"""
+    sources = list(packages)
+    if requirements_path:
+        sources += ["-r", requirements_path]
+    fd, report_path = tempfile.mkstemp(prefix='pysuitcase-report-', suffix='.json')
+    os.close(fd)
+    command = [
+        python_exe, "-m", "pip", "install", "--no-index", "--find-links", wheelhouse_dir,
+        "--report", report_path,
+    ] + list(pip_args) + sources
+    try:
+        if quiet:
+            ok = run_command(command, label='pip', check=False, echo=False).returncode == 0
+        else:
+            ok = _run_pip(command, "install from the wheelhouse")
+        if ok:
+            _touch_installed_wheels(report_path)
+        return ok
+    finally:
+        os.remove(report_path)
+
+
+def ensure_installed(python_exe, wheelhouse_dir, python_version, arch, requirements_path=None, packages=(), mirror=None, offline=False, pip_args=()):
+    """先尝试只用 wheelhouse 安装；缺少 wheel 时（非离线模式）补齐后再安装。"""
+    if install_from_wheelhouse(python_exe, wheelhouse_dir, requirements_path, packages, quiet=True, pip_args=pip_args):
+        click.secho("Installed entirely from the wheelhouse.", fg='green')
+        return True
+    if offline:
+        click.secho("Error: Some wheels are missing from the wheelhouse and --offline was given.", fg='red', bold=True)
+        click.secho(f"Prefill it with 'pysuitcase wheelhouse prefill' or copy the wheels into {wheelhouse_dir}.", fg='yellow')
+        return False
+    click.echo("Wheelhouse is missing some wheels. Fetching them once...")
+    if not fill_wheelhouse(wheelhouse_dir, python_version, arch, requirements_path, packages, mirror, python_exe=python_exe, pip_args=pip_args):
+        return False
+    return install_from_wheelhouse(python_exe, wheelhouse_dir, requirements_path, packages, pip_args=pip_args)
+
+
+def _wheel_project_name(filename):
+    return filename.split('-')[0].lower().replace('_', '-')
+
+
+def prune_wheelhouse(wheelhouse_dir, max_age_days=None, max_size_mb=None, keep_latest=False):
+    """清理 wheelhouse：删除过旧的 wheel、同一项目的旧版本，并把总大小控制在上限内。返回删除的文件名。"""
+    wheels = []
+    for name in os.listdir(wheelhouse_dir):
+        path = os.path.join(wheelhouse_dir, name)
+        if name.endswith('.whl') and os.path.isfile(path):
+            stat = os.stat(path)
+            wheels.append({'name': name, 'path': path, 'mtime': stat.st_mtime, 'size': stat.st_size})
+
+    removed = set()
+    if max_age_days is not None:
+        cutoff = time.time() - max_age_days * 86400
+        removed.update(w['name'] for w in wheels if w['mtime'] < cutoff)
+
+    if keep_latest:
+        # 同一项目只保留最近使用的那个 wheel（不同平台标签视为不同文件，各自保留）
+        newest = {}
+        for w in sorted(wheels, key=lambda w: w['mtime'], reverse=True):
+            key = (_wheel_project_name(w['name']), tuple(w['name'][:-len('.whl')].split('-')[-3:]))
+            if key in newest:
+                removed.add(w['name'])
+            else:
+                newest[key] = w['name']
+
+    if max_size_mb is not None:
+        remaining = sorted((w for w in wheels if w['name'] not in removed), key=lambda w: w['mtime'])
+        total = sum(w['size'] for w in remaining)
+        for w in remaining:
+            if total <= max_size_mb * 1024 * 1024:
+                break
+            removed.add(w['name'])
+            total -= w['size']
+
+    for w in wheels:
+        if w['name'] in removed:
+            os.remove(w['path'])
+    return sorted(removed)
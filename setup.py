@@ -5,6 +5,10 @@ setup(
     name="pysuitcase",
     version="0.0.1",
     packages=find_packages(),
+    package_data={
+        'pysuitcase': ['stubs/*.exe', 'stubs/SOURCE_DIGEST'],
+        'pysuitcase.templates': ['*.c', '*.rc', '*.ico'],
+    },
     author="Heqi Liu, Liming Gao",
     author_email="heqiliu@stu.cpu.edu.cn, glm@stu.cpu.edu.cn",
     description="A tool to package Python applications into standalone executables on Windows.",
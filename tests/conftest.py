@@ -0,0 +1,98 @@
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """按 server.files 提供文件；可关闭 Range 支持、忽略 Range 请求，或在第一次响应中途断开连接。"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def _respond(self, with_body):
+        server = self.server
+        data = server.files.get(self.path)
+        if data is None:
+            self.send_error(404)
+            return
+        range_header = self.headers.get('Range')
+        with server.lock:
+            server.requests.append((self.command, self.path, range_header))
+            cut = server.cut_after if with_body and server.cut_after is not None and not server.cut_done else None
+            if cut is not None:
+                server.cut_done = True
+        match = re.match(r'^bytes=(\d+)-(\d*)$', range_header or '')
+        if match and server.ranges and not server.ignore_ranges:
+            start = int(match.group(1))
+            end = int(match.group(2)) + 1 if match.group(2) else len(data)
+            body = data[start:end]
+            self.send_response(206)
+            self.send_header('Content-Range', f"bytes {start}-{end - 1}/{len(data)}")
+        else:
+            body = data
+            self.send_response(200)
+        if server.ranges:
+            self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if not with_body:
+            return
+        if cut is not None:
+            # 只发送一部分数据就断开，模拟不稳定的连接
+            self.wfile.write(body[:cut])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+    def do_HEAD(self):
+        self._respond(False)
+
+    def do_GET(self):
+        self._respond(True)
+
+
+class LocalServer:
+    def __init__(self):
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+        self.httpd.files = {}
+        self.httpd.requests = []
+        self.httpd.lock = threading.Lock()
+        self.httpd.ranges = True
+        self.httpd.ignore_ranges = False
+        self.httpd.cut_after = None
+        self.httpd.cut_done = False
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    def __getattr__(self, name):
+        return getattr(self.httpd, name)
+
+    def __setattr__(self, name, value):
+        if name in ('httpd', 'url'):
+            super().__setattr__(name, value)
+        else:
+            setattr(self.httpd, name, value)
+
+    def add(self, path, data):
+        self.httpd.files[path] = data
+        return self.url + path
+
+    def get_ranges(self):
+        return [range_header for command, _, range_header in self.httpd.requests if command == 'GET']
+
+
+@pytest.fixture
+def http_server():
+    """本地 HTTP 服务器，测试中不访问网络。"""
+    server = LocalServer()
+    thread = threading.Thread(target=server.httpd.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.httpd.shutdown()
+        server.httpd.server_close()
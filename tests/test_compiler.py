@@ -0,0 +1,39 @@
+import glob
+import os
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+from pysuitcase.compiler import build_script_source
+
+pytest.importorskip('Cython')
+
+# 以 spawn 方式启动进程池（与 Windows 相同），再把编译脚本作为 __main__ 运行
+SPAWN_RUNNER = textwrap.dedent("""
+    import multiprocessing
+    import runpy
+    import sys
+
+    multiprocessing.set_start_method('spawn')
+    sys.argv = ['pysuitcase_build.py', 'build_ext', '--inplace', '-j', '2']
+    runpy.run_path('pysuitcase_build.py', run_name='__main__')
+""")
+
+
+def test_build_script_survives_spawned_cythonize_workers(tmp_path):
+    modules = []
+    for name in ('alpha', 'beta'):
+        path = tmp_path / f"{name}.py"
+        path.write_text(f"def name():\n    return '{name}'\n", encoding='utf-8')
+        modules.append(str(path))
+    (tmp_path / 'pysuitcase_build.py').write_text(build_script_source(modules, jobs=2), encoding='utf-8')
+    (tmp_path / 'runner.py').write_text(SPAWN_RUNNER, encoding='utf-8')
+
+    result = subprocess.run([sys.executable, 'runner.py'], cwd=tmp_path, capture_output=True, text=True, timeout=600)
+
+    assert result.returncode == 0, result.stdout + result.stderr
+    assert 'BrokenProcessPool' not in result.stderr
+    for name in ('alpha', 'beta'):
+        assert glob.glob(os.path.join(tmp_path, f"{name}.*.so")) + glob.glob(os.path.join(tmp_path, f"{name}.*.pyd"))
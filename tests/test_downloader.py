@@ -0,0 +1,148 @@
+import hashlib
+import os
+
+import pytest
+
+from pysuitcase import downloader
+from pysuitcase.downloader import DownloadError, download_file
+
+DATA = bytes(range(256)) * 4096  # 1 MB
+
+
+@pytest.fixture(autouse=True)
+def _fast(monkeypatch):
+    """不等待退避，并把分段下载的阈值调小，以便用 1 MB 的文件测试。"""
+    monkeypatch.setattr(downloader, 'BACKOFF_SECONDS', 0)
+    monkeypatch.setattr(downloader, 'SEGMENT_THRESHOLD', 256 * 1024)
+    monkeypatch.setattr(downloader, 'MIN_SEGMENT_SIZE', 128 * 1024)
+    monkeypatch.setattr(downloader, 'CHUNK_SIZE', 64 * 1024)
+
+
+def _sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def _leftovers(dest):
+    return [path for path in (dest + '.part', dest + '.part.json') if os.path.exists(path)]
+
+
+def test_download_verifies_checksum(http_server, tmp_path):
+    url = http_server.add('/file.bin', DATA)
+    dest = str(tmp_path / 'file.bin')
+
+    assert download_file(url, dest, sha256=_sha256(DATA), segments=1, quiet=True) == dest
+
+    assert open(dest, 'rb').read() == DATA
+    assert _leftovers(dest) == []
+
+
+def test_checksum_mismatch_removes_download(http_server, tmp_path):
+    url = http_server.add('/file.bin', DATA)
+    dest = str(tmp_path / 'file.bin')
+
+    with pytest.raises(DownloadError, match='Checksum mismatch'):
+        download_file(url, dest, sha256='0' * 64, segments=1, quiet=True)
+
+    assert not os.path.exists(dest)
+    assert _leftovers(dest) == []
+
+
+def test_interrupted_download_resumes_with_range(http_server, tmp_path):
+    url = http_server.add('/file.bin', DATA)
+    http_server.cut_after = 300 * 1024
+    dest = str(tmp_path / 'file.bin')
+
+    download_file(url, dest, sha256=_sha256(DATA), segments=1, quiet=True)
+
+    assert open(dest, 'rb').read() == DATA
+    ranges = http_server.get_ranges()
+    assert ranges[0] is None
+    assert len(ranges) == 2 and ranges[1].startswith('bytes=') and ranges[1] != 'bytes=0-'
+
+
+def test_leftover_part_file_is_resumed(http_server, tmp_path):
+    url = http_server.add('/file.bin', DATA)
+    dest = str(tmp_path / 'file.bin')
+    with open(dest + '.part', 'wb') as f:
+        f.write(DATA[:1000])
+
+    download_file(url, dest, sha256=_sha256(DATA), segments=1, quiet=True)
+
+    assert open(dest, 'rb').read() == DATA
+    assert http_server.get_ranges() == ['bytes=1000-']
+
+
+def test_leftover_part_restarts_without_range_support(http_server, tmp_path):
+    url = http_server.add('/file.bin', DATA)
+    http_server.ranges = False
+    dest = str(tmp_path / 'file.bin')
+    with open(dest + '.part', 'wb') as f:
+        f.write(b'stale bytes from another file')
+
+    download_file(url, dest, sha256=_sha256(DATA), quiet=True)
+
+    assert open(dest, 'rb').read() == DATA
+    assert http_server.get_ranges() == [None]
+
+
+def test_interrupted_download_restarts_without_range_support(http_server, tmp_path):
+    url = http_server.add('/file.bin', DATA)
+    http_server.ranges = False
+    http_server.cut_after = 300 * 1024
+    dest = str(tmp_path / 'file.bin')
+
+    download_file(url, dest, sha256=_sha256(DATA), quiet=True)
+
+    assert open(dest, 'rb').read() == DATA
+    assert http_server.get_ranges() == [None, None]
+
+
+def test_large_file_downloads_in_segments(http_server, tmp_path):
+    url = http_server.add('/file.bin', DATA)
+    dest = str(tmp_path / 'file.bin')
+
+    download_file(url, dest, sha256=_sha256(DATA), segments=4, quiet=True)
+
+    assert open(dest, 'rb').read() == DATA
+    size = len(DATA)
+    expected = {f"bytes={size * i // 4}-{size * (i + 1) // 4 - 1}" for i in range(4)}
+    assert set(http_server.get_ranges()) == expected
+    assert _leftovers(dest) == []
+
+
+def test_interrupted_segment_resumes_its_own_range(http_server, tmp_path):
+    url = http_server.add('/file.bin', DATA)
+    http_server.cut_after = 100 * 1024
+    dest = str(tmp_path / 'file.bin')
+
+    download_file(url, dest, sha256=_sha256(DATA), segments=4, quiet=True)
+
+    assert open(dest, 'rb').read() == DATA
+    assert len(http_server.get_ranges()) == 5
+
+
+def test_segmented_download_falls_back_when_range_is_ignored(http_server, tmp_path):
+    url = http_server.add('/file.bin', DATA)
+    http_server.ignore_ranges = True  # 声明支持 Range，但总是返回 200 与完整内容
+    dest = str(tmp_path / 'file.bin')
+
+    download_file(url, dest, sha256=_sha256(DATA), segments=4, quiet=True)
+
+    assert open(dest, 'rb').read() == DATA
+    assert http_server.get_ranges()[-1] is None
+    assert _leftovers(dest) == []
+
+
+def test_segment_progress_is_resumed_from_state(http_server, tmp_path):
+    url = http_server.add('/file.bin', DATA)
+    dest = str(tmp_path / 'file.bin')
+    size, half = len(DATA), len(DATA) // 2
+    # 上次运行完成了第一段，第二段写了 1000 字节
+    with open(dest + '.part', 'wb') as f:
+        f.write(DATA[:half + 1000].ljust(size, b'\0'))
+    downloader.write_json_atomic(dest + '.part.json', {'url': url, 'size': size, 'segments': [[0, half, half], [half, size, 1000]]})
+
+    download_file(url, dest, sha256=_sha256(DATA), quiet=True)
+
+    assert open(dest, 'rb').read() == DATA
+    assert http_server.get_ranges() == [f"bytes={half + 1000}-{size - 1}"]
@@ -0,0 +1,56 @@
+import base64
+import csv
+import hashlib
+import os
+import zipfile
+
+from pysuitcase.installer import install_wheels
+
+DIST_INFO = 'demo-1.0.dist-info'
+
+
+def make_wheel(path, files):
+    files = dict(files)
+    files[f'{DIST_INFO}/WHEEL'] = b'Wheel-Version: 1.0\nGenerator: test\nRoot-Is-Purelib: true\nTag: py3-none-any\n'
+    files[f'{DIST_INFO}/METADATA'] = b'Metadata-Version: 2.1\nName: demo\nVersion: 1.0\n'
+    with zipfile.ZipFile(path, 'w') as archive:
+        for name, data in files.items():
+            archive.writestr(name, data)
+    return str(path)
+
+
+def _record(runtime_dir):
+    site_packages = os.path.join(runtime_dir, 'Lib', 'site-packages')
+    with open(os.path.join(site_packages, DIST_INFO, 'RECORD'), encoding='utf-8', newline='') as f:
+        return {os.path.normpath(os.path.join(site_packages, row[0])): row[1:] for row in csv.reader(f)}
+
+
+def test_data_scripts_get_the_runtime_interpreter(tmp_path):
+    runtime_dir = str(tmp_path / 'runtime')
+    wheel = make_wheel(tmp_path / 'demo-1.0-py3-none-any.whl', {
+        'demo/__init__.py': b'',
+        'demo-1.0.data/scripts/demo-tool': b'#!python\r\nimport demo\nprint("tool")\n',
+        'demo-1.0.data/scripts/demo-gui': b'#!pythonw\nimport demo\n',
+        'demo-1.0.data/scripts/demo-sh': b'#!/bin/sh\necho demo\n',
+    })
+
+    install_wheels(runtime_dir, [(wheel, None)], 'amd64')
+
+    scripts = os.path.join(runtime_dir, 'Scripts')
+    shebang = b'#!' + os.fsencode(os.path.join(runtime_dir, 'python.exe')) + b'\r\n'
+    with open(os.path.join(scripts, 'demo-tool'), 'rb') as f:
+        assert f.read() == shebang + b'import demo\nprint("tool")\n'
+    with open(os.path.join(scripts, 'demo-gui'), 'rb') as f:
+        assert f.read() == shebang + b'import demo\n'
+    # 不以 #!python 开头的脚本原样复制
+    with open(os.path.join(scripts, 'demo-sh'), 'rb') as f:
+        assert f.read() == b'#!/bin/sh\necho demo\n'
+
+    # RECORD 记录的是改写后的内容
+    record = _record(runtime_dir)
+    for name in ('demo-tool', 'demo-gui', 'demo-sh'):
+        path = os.path.join(scripts, name)
+        with open(path, 'rb') as f:
+            data = f.read()
+        digest = 'sha256=' + base64.urlsafe_b64encode(hashlib.sha256(data).digest()).rstrip(b'=').decode('ascii')
+        assert record[os.path.normpath(path)] == [digest, str(len(data))]
@@ -0,0 +1,111 @@
+import os
+
+import pytest
+
+from pysuitcase.launcher import (CONFIG_MAGIC, CONFIG_SIZE, _stub_name, build_launcher_config, create_launcher, encode_config, get_stub,
+                                 patch_stub, read_config)
+
+ARCHS = ('amd64', 'win32', 'arm64')
+
+
+def make_stub(prefix=b'MZ' + b'\x90' * 500, suffix=b'\xcc' * 700):
+    """与真实存根布局相同的最小替身：前后是任意字节，中间是未配置的配置块。"""
+    return prefix + (CONFIG_MAGIC + b'\0').ljust(CONFIG_SIZE, b'\0') + suffix
+
+
+def sample_config():
+    config = build_launcher_config('app', 'main.py', '3.11.8', 'amd64', optimize=2, environment={'PYTHONUTF8': '1'},
+                                   preload="import pysuitcase_pack; pysuitcase_pack.install(r'..\\x.pack')")
+    config['app_folder'] = 'äpp 文件夹'
+    return config
+
+
+def test_patch_and_read_round_trip():
+    stub = make_stub()
+    config = sample_config()
+
+    patched = patch_stub(stub, config)
+
+    assert read_config(patched) == config
+    assert len(patched) == len(stub)
+    assert patched[:502] == stub[:502] and patched[-700:] == stub[-700:]
+
+
+def test_patching_again_replaces_the_old_config():
+    patched = patch_stub(make_stub(), sample_config())
+
+    repatched = patch_stub(patched, {'module': 'other', 'function': 'run'})
+
+    assert read_config(repatched) == {'module': 'other', 'function': 'run'}
+
+
+def test_unconfigured_stub_reads_as_empty():
+    assert read_config(make_stub()) == {}
+
+
+def test_oversized_config_is_rejected():
+    config = {'preload': 'x' * CONFIG_SIZE}
+
+    with pytest.raises(ValueError, match='the stub reserves'):
+        patch_stub(make_stub(), config)
+
+
+def test_config_that_exactly_fits_is_accepted():
+    # 魔数 + NUL、'k=' + 值 + NUL、结束的 NUL
+    value = 'x' * (CONFIG_SIZE - len(CONFIG_MAGIC) - 1 - 2 - 1 - 1)
+
+    assert read_config(patch_stub(make_stub(), {'k': value})) == {'k': value}
+    with pytest.raises(ValueError):
+        encode_config({'k': value + 'x'})
+
+
+def test_nul_byte_in_a_setting_is_rejected():
+    with pytest.raises(ValueError, match='NUL byte'):
+        encode_config({'module': 'app\0evil'})
+
+
+def test_missing_magic_is_rejected():
+    with pytest.raises(ValueError, match='No launcher config block'):
+        patch_stub(b'MZ' + b'\0' * 8192, {'module': 'app'})
+
+
+def test_duplicated_magic_is_rejected():
+    stub = make_stub() + make_stub()
+
+    with pytest.raises(ValueError, match='more than one config block'):
+        patch_stub(stub, {'module': 'app'})
+    with pytest.raises(ValueError, match='more than one config block'):
+        read_config(stub)
+
+
+def test_truncated_config_block_is_rejected():
+    stub = make_stub(suffix=b'')[:-1]
+
+    with pytest.raises(ValueError, match='truncated'):
+        patch_stub(stub, {'module': 'app'})
+
+
+@pytest.mark.parametrize('arch', ARCHS)
+@pytest.mark.parametrize('no_window', (False, True))
+def test_shipped_stubs_can_be_patched(arch, no_window):
+    stub = get_stub(arch, no_window)
+    assert stub is not None, f"{_stub_name(arch, no_window)} is missing from pysuitcase/stubs/"
+    config = sample_config()
+
+    patched = patch_stub(stub, config)
+
+    assert read_config(patched) == config
+    assert len(patched) == len(stub)
+
+
+def test_create_launcher_writes_a_configured_exe(tmp_path):
+    (tmp_path / 'app').mkdir()
+    (tmp_path / 'app' / 'requirements.txt').write_text('', encoding='utf-8')
+
+    assert create_launcher(str(tmp_path), 'app', 'main.py', '3.11.8', 'amd64', 'requirements.txt', optimize=1)
+
+    with open(os.path.join(tmp_path, f"{tmp_path.name}.exe"), 'rb') as f:
+        config = read_config(f.read())
+    assert config['module'] == 'main' and config['function'] == 'run'
+    assert config['python'] == '..\\python-3.11.8-embed-amd64\\python.exe'
+    assert config['args'] == '-u -O'
@@ -0,0 +1,119 @@
+import io
+import os
+import zipfile
+
+import pytest
+
+from pysuitcase.script_downloader import _patch_pth, get_python_runtime, provision_runtime
+
+VERSION = '3.11.8'
+ARCH = 'amd64'
+# 与官方嵌入式包相同的 ._pth：标准库 zip、当前目录，以及注释掉的 import site
+PTH = 'python311.zip\r\n.\r\n\r\n# Uncomment to run site.main() automatically\r\n#import site\r\n'
+
+
+def make_embed_zip(extra=None, pth=PTH):
+    files = {
+        'python.exe': b'MZ' + b'\0' * 1024,
+        'python311.dll': os.urandom(256 * 1024),
+        'python311.zip': b'PK\5\6' + b'\0' * 18,
+        'DLLs/_socket.pyd': b'MZ' + b'\1' * 2048,
+    }
+    if pth is not None:
+        files['python311._pth'] = pth.encode('utf-8')
+    files.update(extra or {})
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, data in files.items():
+            archive.writestr(name, data)
+    return files, buffer.getvalue()
+
+
+@pytest.fixture
+def mirror(http_server, tmp_path, monkeypatch):
+    """把嵌入式 zip 的下载地址与缓存目录指向测试环境。"""
+    monkeypatch.setenv('PYSUITCASE_PYTHON_MIRROR', http_server.url)
+    monkeypatch.setenv('PYSUITCASE_CACHE_DIR', str(tmp_path / 'cache'))
+
+    def publish(data):
+        http_server.add(f"/{VERSION}/python-{VERSION}-embed-{ARCH}.zip", data)
+    return publish
+
+
+def _read_pth(runtime):
+    with open(os.path.join(runtime, 'python311._pth'), 'rb') as f:
+        return f.read().decode('utf-8')
+
+
+def test_provision_extracts_and_enables_site(mirror, tmp_path):
+    files, data = make_embed_zip()
+    mirror(data)
+    project = tmp_path / 'project'
+    project.mkdir()
+
+    runtime = provision_runtime(VERSION, ARCH, str(project), jobs=4)
+
+    assert runtime == str(project / f"python-{VERSION}-embed-{ARCH}")
+    for name, content in files.items():
+        if not name.endswith('._pth'):
+            with open(os.path.join(runtime, *name.split('/')), 'rb') as f:
+                assert f.read() == content
+    assert _read_pth(runtime) == 'python311.zip\r\n.\r\n\r\n# Uncomment to run site.main() automatically\r\nLib\\site-packages\r\nimport site\r\n'
+    assert os.path.isdir(os.path.join(runtime, 'Lib', 'site-packages'))
+    assert sorted(os.listdir(project)) == [f"python-{VERSION}-embed-{ARCH}"]
+    assert not os.listdir(tmp_path / 'cache' / 'downloads')
+
+
+def test_patch_pth_is_idempotent(tmp_path):
+    (tmp_path / 'python311._pth').write_bytes(PTH.replace('#import site', 'import site').encode('utf-8'))
+
+    _patch_pth(str(tmp_path))
+    first = _read_pth(str(tmp_path))
+    _patch_pth(str(tmp_path))
+
+    assert _read_pth(str(tmp_path)) == first
+    assert first.count('import site') == 1 and first.count('Lib\\site-packages') == 1
+
+
+def test_unsafe_zip_leaves_existing_runtime_alone(mirror, tmp_path):
+    _, data = make_embed_zip(extra={'../escape.txt': b'x'})
+    mirror(data)
+    existing = tmp_path / f"python-{VERSION}-embed-{ARCH}"
+    existing.mkdir()
+    (existing / 'python.exe').write_bytes(b'old')
+
+    with pytest.raises(zipfile.BadZipFile, match='Unsafe path'):
+        provision_runtime(VERSION, ARCH, str(tmp_path))
+
+    assert not (tmp_path / 'escape.txt').exists()
+    assert (existing / 'python.exe').read_bytes() == b'old'
+    assert sorted(os.listdir(tmp_path)) == ['cache', existing.name]
+
+
+def test_zip_without_pth_is_rejected(mirror, tmp_path):
+    _, data = make_embed_zip(pth=None)
+    mirror(data)
+    project = tmp_path / 'project'
+    project.mkdir()
+
+    with pytest.raises(zipfile.BadZipFile, match='no ._pth'):
+        provision_runtime(VERSION, ARCH, str(project))
+
+    assert os.listdir(project) == []
+
+
+def test_runtime_cache_serves_the_second_project(mirror, http_server, tmp_path):
+    files, data = make_embed_zip()
+    mirror(data)
+    first, second = tmp_path / 'first', tmp_path / 'second'
+    first.mkdir()
+    second.mkdir()
+
+    get_python_runtime(VERSION, ARCH, str(first))
+    downloads = len(http_server.get_ranges())
+    runtime = get_python_runtime(VERSION, ARCH, str(second))
+
+    assert len(http_server.get_ranges()) == downloads
+    with open(os.path.join(runtime, 'python311.dll'), 'rb') as f:
+        assert f.read() == files['python311.dll']
+    assert 'import site' in _read_pth(runtime)
@@ -0,0 +1,84 @@
+import json
+import os
+
+import pytest
+
+from pysuitcase.store import _object_path, _tree_path, load_tree, restore_tree, save_tree
+
+FILES = {
+    'Lib/site-packages/pkg/__init__.py': b'VALUE = 1\n',
+    'Lib/site-packages/pkg/data.bin': os.urandom(4096),
+    'Scripts/tool.py': b'print("tool")\n',
+}
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """返回 (仓库目录, 已存入仓库的运行时目录)；运行时中的文件与仓库对象以硬链接共享。"""
+    store_dir = tmp_path / 'store'
+    monkeypatch.setenv('PYSUITCASE_STORE_DIR', str(store_dir))
+    runtime_dir = tmp_path / 'first'
+    for rel, data in FILES.items():
+        path = runtime_dir / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+    save_tree(str(runtime_dir), ['key'])
+    return store_dir, runtime_dir
+
+
+def _restore(tmp_path):
+    runtime_dir = tmp_path / 'second'
+    runtime_dir.mkdir(exist_ok=True)
+    return runtime_dir, restore_tree('key', str(runtime_dir))
+
+
+def test_restore_places_every_file(store, tmp_path):
+    runtime_dir, restored = _restore(tmp_path)
+
+    assert restored
+    for rel, data in FILES.items():
+        assert (runtime_dir / rel).read_bytes() == data
+
+
+def test_same_size_edit_in_place_is_detected(store, tmp_path):
+    store_dir, first = store
+    path = first / 'Lib/site-packages/pkg/__init__.py'
+    digest = load_tree('key')['files']['Lib/site-packages/pkg/__init__.py'][0]
+    # 原地修改硬链接的文件：大小不变，仓库中的对象随之改变
+    with open(path, 'r+b') as f:
+        f.write(b'VALUE = 2\n')
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 10 ** 9))
+
+    runtime_dir, restored = _restore(tmp_path)
+
+    assert not restored
+    assert not os.path.exists(_object_path(str(store_dir), digest))
+    assert not os.path.exists(_tree_path(str(store_dir), 'key'))
+    assert not (runtime_dir / 'Lib').exists()
+
+
+def test_touched_object_is_rehashed_and_kept(store, tmp_path):
+    store_dir, first = store
+    path = first / 'Scripts/tool.py'
+    mtime_ns = os.stat(path).st_mtime_ns + 10 ** 9
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+    runtime_dir, restored = _restore(tmp_path)
+
+    assert restored
+    assert (runtime_dir / 'Scripts/tool.py').read_bytes() == FILES['Scripts/tool.py']
+    # 新的修改时间写回目录树，下次恢复不再重新哈希
+    with open(_tree_path(str(store_dir), 'key'), encoding='utf-8') as f:
+        assert json.load(f)['files']['Scripts/tool.py'][2] == mtime_ns
+
+
+def test_tree_without_modification_times_is_ignored(store):
+    store_dir, _ = store
+    tree_path = _tree_path(str(store_dir), 'key')
+    with open(tree_path, encoding='utf-8') as f:
+        tree = json.load(f)
+    tree['files'] = {rel: entry[:2] for rel, entry in tree['files'].items()}
+    with open(tree_path, 'w', encoding='utf-8') as f:
+        json.dump(tree, f)
+
+    assert load_tree('key') is None
@@ -0,0 +1,127 @@
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import textwrap
+import time
+
+import pytest
+
+import pysuitcase.templates
+
+TEMPLATES_DIR = os.path.dirname(os.path.abspath(pysuitcase.templates.__file__))
+
+pytestmark = pytest.mark.skipif(os.name == 'nt', reason='the test drives the POSIX state directory')
+
+APP = textwrap.dedent("""
+    import atexit
+    import os
+    import sys
+
+
+    def run():
+        atexit.register(lambda: print('atexit ran', flush=False))
+        sys.stdout.write(f"run {os.getpid()} {' '.join(sys.argv[1:])}")
+        sys.exit(int(os.environ.get('APP_EXIT_CODE', '0')))
+""")
+
+# 与启动器的 -c 语句相同：先交给热启动，不可用时照常冷启动
+LAUNCHER = ("import os, sys; sys.path.append(os.getcwd()); print('launcher', os.getpid(), file=sys.stderr); "
+            "import pysuitcase_warm; {setup}pysuitcase_warm.launch('app', 'run', (), 20, None); import app; app.run()")
+
+
+@pytest.fixture
+def project(tmp_path):
+    app_dir = tmp_path / 'app'
+    app_dir.mkdir()
+    (app_dir / 'app.py').write_text(APP, encoding='utf-8')
+    runtime_dir = tmp_path / 'runtime'
+    runtime_dir.mkdir(mode=0o700)
+    env = dict(os.environ, PYTHONPATH=TEMPLATES_DIR, XDG_RUNTIME_DIR=str(runtime_dir))
+    env.pop('PYSUITCASE_WARM', None)
+    yield app_dir, runtime_dir, env
+    for state_file in runtime_dir.rglob('*.json'):
+        try:
+            pid = json.loads(state_file.read_text(encoding='utf-8'))['pid']
+        except (OSError, ValueError, KeyError):
+            continue
+        # pid 为 0 或负数时会把信号发给整个进程组，连同 pytest 一起
+        if isinstance(pid, int) and pid > 0:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except OSError:
+                pass
+
+
+def _launch(app_dir, env, *args, setup='', **extra_env):
+    result = subprocess.run([sys.executable, '-c', LAUNCHER.format(setup=setup)] + list(args), cwd=app_dir, env=dict(env, **extra_env),
+                            stdin=subprocess.DEVNULL, capture_output=True, text=True, timeout=120)
+    launcher_pid = result.stderr.split()[1]
+    run_pid = result.stdout.split()[1]
+    return result, run_pid != launcher_pid
+
+
+def _wait_for_dispatcher(runtime_dir):
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if list(runtime_dir.rglob('*.json')):
+            return
+        time.sleep(0.1)
+    pytest.fail('The warm dispatcher did not start.')
+
+
+def _wait_for_dispatcher_pid(state_path, stale_pid):
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            with open(state_path, encoding='utf-8') as f:
+                if json.load(f)['pid'] != stale_pid:
+                    return
+        except (OSError, ValueError, KeyError):
+            pass
+        time.sleep(0.1)
+
+
+def test_warm_launch_matches_a_cold_launch(project):
+    app_dir, runtime_dir, env = project
+
+    cold, warm = _launch(app_dir, env, 'a', 'b', APP_EXIT_CODE='3')
+    assert not warm
+    _wait_for_dispatcher(runtime_dir)
+    hot, warm = _launch(app_dir, env, 'a', 'b', APP_EXIT_CODE='3')
+
+    assert warm
+    assert cold.returncode == hot.returncode == 3
+    # atexit 函数的输出（未显式刷新）同样出现，且排在 run() 的输出之后
+    assert cold.stdout.split(' ', 2)[2] == hot.stdout.split(' ', 2)[2] == 'a batexit ran\n'
+
+
+def test_hung_dispatcher_falls_back_to_a_cold_start(project):
+    app_dir, runtime_dir, env = project
+    # 只接受连接、从不回复的“调度进程”，状态文件中的 pid 属于一个已退出的子进程
+    stand_in = subprocess.run([sys.executable, '-c', 'import os; print(os.getpid())'], capture_output=True, text=True, check=True)
+    listener = socket.socket()
+    listener.bind(('127.0.0.1', 0))
+    listener.listen(4)
+    state_dir = runtime_dir / f"pysuitcase-warm-{os.getuid()}"
+    state_dir.mkdir(mode=0o700)
+    # 状态文件名由 app 目录、解释器与入口决定，借用真实的计算方式
+    code = ("import os, sys, json; sys.path.insert(0, sys.argv[1]); import pysuitcase_warm as w; "
+            "print(w._state_paths({'module': 'app', 'function': 'run'})[0])")
+    state_path = subprocess.run([sys.executable, '-c', code, TEMPLATES_DIR], cwd=app_dir, env=env, capture_output=True, text=True,
+                                check=True).stdout.strip()
+    with open(state_path, 'w', encoding='utf-8') as f:
+        json.dump({'pid': int(stand_in.stdout), 'port': listener.getsockname()[1], 'token': 'x'}, f)
+
+    started = time.monotonic()
+    result, warm = _launch(app_dir, env, 'x', setup='pysuitcase_warm._ACQUIRE_TIMEOUT = 1; ')
+
+    assert not warm
+    assert result.returncode == 0
+    assert time.monotonic() - started < 30
+    assert result.stdout.split(' ', 2)[2] == 'xatexit ran\n'
+    listener.close()
+    # 回退时启动的真正调度进程会覆盖状态文件，由 fixture 负责结束它
+    _wait_for_dispatcher_pid(state_path, int(stand_in.stdout))
@@ -0,0 +1,108 @@
+"""
+交叉编译随 pysuitcase 发布的启动器存根（pysuitcase/stubs/），可在任意平台上运行，不需要 Visual Studio：
+
+    pip install ziglang==0.17.0
+    python tools/build_stubs.py            # 重新生成 launcher-{amd64,win32,arm64}[-no-window].exe
+    python tools/build_stubs.py --check    # 确认已提交的存根与源码一致（适合放在 CI 中）
+
+编译器是 ziglang 提供的 zig cc（clang + mingw-w64），版本固定、不写入时间戳，同样的源码总是得到同样的字节。
+存根目录中的 SOURCE_DIGEST 记录了编译时的 stub_source_digest()；源码变化而存根未重新生成时，pysuitcase 不会使用这些存根。
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pysuitcase.launcher import _SHIPPED_DIGEST, _STUB_RC, _STUB_SOURCE, _config_offset, _stub_name, stub_source_digest  # noqa: E402
+
+ZIG_VERSION = '0.17.0'
+ZIG_TARGETS = {
+    'amd64': 'x86_64-windows-gnu',
+    'win32': 'x86-windows-gnu',
+    'arm64': 'aarch64-windows-gnu',
+}
+PACKAGE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'pysuitcase')
+TEMPLATES_DIR = os.path.join(PACKAGE_DIR, 'templates')
+STUBS_DIR = os.path.join(PACKAGE_DIR, 'stubs')
+
+
+def _zig_version():
+    try:
+        return subprocess.run([sys.executable, '-m', 'ziglang', 'version'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _read(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def compile_stub(work_dir, arch, no_window):
+    """编译一个存根，返回它的字节。资源脚本与 launcher._compile_stub 相同，默认图标位于中性语言的 1 号图标组。"""
+    output = os.path.join(work_dir, _stub_name(arch, no_window))
+    command = [sys.executable, '-m', 'ziglang', 'cc', '-target', ZIG_TARGETS[arch], '-Os', '-s', '-Wall', '-Werror']
+    if no_window:
+        command += ['-DPYSUITCASE_NO_WINDOW', '-Wl,--subsystem,windows']
+    command += ['-o', output, os.path.join(TEMPLATES_DIR, _STUB_SOURCE), 'stub.rc', '-luser32']
+    subprocess.run(command, cwd=work_dir, check=True)
+    with open(output, 'rb') as f:
+        data = f.read()
+    _config_offset(data)
+    return data
+
+
+def build_stubs(work_dir):
+    """返回 {文件名: 字节}，包括全部架构的控制台版与无窗口版存根。"""
+    with open(os.path.join(TEMPLATES_DIR, 'default.ico'), 'rb') as f:
+        icon = f.read()
+    with open(os.path.join(work_dir, 'app.ico'), 'wb') as f:
+        f.write(icon)
+    with open(os.path.join(work_dir, 'stub.rc'), 'w', encoding='utf-8') as f:
+        f.write(_STUB_RC)
+    stubs = {}
+    for arch in ZIG_TARGETS:
+        for no_window in (False, True):
+            print(f"Compiling {_stub_name(arch, no_window)}...")
+            stubs[_stub_name(arch, no_window)] = compile_stub(work_dir, arch, no_window)
+    return stubs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cross-compile the prebuilt launcher stubs shipped in pysuitcase/stubs/.")
+    parser.add_argument('--check', action='store_true', help='Rebuild into a temporary directory and fail if the committed stubs differ.')
+    args = parser.parse_args()
+
+    version = _zig_version()
+    if version != ZIG_VERSION:
+        sys.exit(f"zig {ZIG_VERSION} is required (found {version or 'none'}); install it with 'pip install ziglang=={ZIG_VERSION}'.")
+
+    with tempfile.TemporaryDirectory(prefix='pysuitcase-stubs-') as work_dir:
+        stubs = build_stubs(work_dir)
+    digest = stub_source_digest()
+
+    if args.check:
+        stale = [name for name, data in stubs.items() if _read(os.path.join(STUBS_DIR, name)) != data]
+        if _read(os.path.join(STUBS_DIR, _SHIPPED_DIGEST)) != f"{digest}\n".encode('ascii'):
+            stale.append(_SHIPPED_DIGEST)
+        if stale:
+            sys.exit(f"Out of date: {', '.join(stale)}. Run 'python tools/build_stubs.py' and commit the result.")
+        print("The shipped launcher stubs match their sources.")
+        return
+
+    os.makedirs(STUBS_DIR, exist_ok=True)
+    for name, data in stubs.items():
+        with open(os.path.join(STUBS_DIR, name), 'wb') as f:
+            f.write(data)
+    with open(os.path.join(STUBS_DIR, _SHIPPED_DIGEST), 'w', encoding='ascii', newline='\n') as f:
+        f.write(f"{digest}\n")
+    print(f"Wrote {len(stubs)} stubs to {STUBS_DIR}")
+
+
+if __name__ == '__main__':
+    main()